@@ -3,7 +3,7 @@
 整合斐波那契計算器、股票訊號儀表板和族群熱度分析功能
 """
 
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, render_template, request, jsonify
 import sys
 import os
 
@@ -22,13 +22,6 @@ app.register_blueprint(fibonacci_bp, url_prefix='/fibonacci')
 app.register_blueprint(signals_bp, url_prefix='/signals')
 app.register_blueprint(theme_analysis_bp, url_prefix='/theme-analysis')
 
-# 載入主頁面模板
-import os
-template_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
-with open(template_path, 'r', encoding='utf-8') as f:
-    HTML_TEMPLATE = f.read()
-
-
 @app.route('/', methods=['GET', 'POST'])
 def index():
     """主頁面"""
@@ -75,7 +68,8 @@ def index():
         except Exception as e:
             context['signal_error'] = f'查詢錯誤: {str(e)}'
     
-    return render_template_string(HTML_TEMPLATE, **context)
+    # 透過 Flask 的模板載入器渲染，編譯後的模板會被快取，不會每次請求都重新解析
+    return render_template('index.html', **context)
 
 
 if __name__ == '__main__':
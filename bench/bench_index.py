@@ -0,0 +1,87 @@
+"""
+首頁渲染基準測試
+比較每次以 render_template_string 重新編譯 templates/index.html（原本的做法）
+與透過 Flask 模板載入器渲染快取的編譯結果，並以多執行緒負載量測 GET / 的延遲與吞吐量。
+
+執行：python bench/bench_index.py [--threads 8] [--requests 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from flask import render_template, render_template_string
+
+from app import app
+
+CONTEXT = {
+    'fibonacci_error': None,
+    'support_levels': None,
+    'resistance_levels': None,
+    'high_price': None,
+    'low_price': None,
+    'range_value': None,
+    'signal_error': None,
+    'stock_signals': None,
+    'active_tab': 'fibonacci',
+}
+
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def load_test(path, threads, total):
+    """以 threads 個執行緒送出 total 個 GET，返回（每秒請求數, 中位數延遲 ms）"""
+    latencies = []
+
+    def worker(count):
+        client = app.test_client()
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.get(path)
+            assert response.status_code == 200
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, [total // threads] * threads))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'templates', 'index.html'), 'r', encoding='utf-8') as f:
+        html_template = f.read()
+
+    # 原本的做法：每次請求都重新解析與編譯模板
+    @app.route('/bench-uncached')
+    def uncached_index():
+        return render_template_string(html_template, **CONTEXT)
+
+    with app.test_request_context('/'):
+        render_template('index.html', **CONTEXT)
+        uncached_ms = timeit(lambda: render_template_string(html_template, **CONTEXT), 20)
+        cached_ms = timeit(lambda: render_template('index.html', **CONTEXT), 200)
+    print(f"單次渲染：render_template_string {uncached_ms:.2f} ms，render_template {cached_ms:.2f} ms")
+
+    for label, path in (("每次編譯", "/bench-uncached"), ("快取模板", "/")):
+        rps, p50 = load_test(path, args.threads, args.requests)
+        print(f"{label} GET {path}：{rps:.0f} req/s，中位數延遲 {p50:.2f} ms（{args.threads} 執行緒）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+數值清洗基準測試
+以合成的全市場上市 Open Data（約 1,100 檔）比較逐格 .apply(clean_numeric)
+與整欄 clean_numeric_series，並量測 get_twse_df 的整體耗時（以假資料取代下載）。
+
+執行：python bench/bench_numeric_cleaning.py
+"""
+
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import scraper
+
+STOCK_COUNT = 1100
+
+
+def synthetic_payload(seed=1):
+    rng = random.Random(seed)
+    price = []
+    capital = []
+    for i in range(STOCK_COUNT):
+        close = rng.uniform(5, 1000)
+        change = rng.uniform(-0.1, 0.1) * close
+        price.append({
+            "Code": f"{1000 + i}",
+            "Name": f"股{i}",
+            "TradeVolume": f"{rng.randint(0, 50_000_000):,}",
+            "ClosingPrice": rng.choice([f"{close:,.2f}", "--", ""]),
+            "Change": f"{change:+.2f}",
+        })
+        capital.append({
+            "公司代號": f"{1000 + i}",
+            "已發行普通股數或TDR原股發行股數": f"{rng.randint(1_000_000, 30_000_000_000):,}",
+        })
+    return price, capital
+
+
+def timeit(func, repeat=30):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    price, capital = synthetic_payload()
+    columns = pd.DataFrame(price)[["TradeVolume", "ClosingPrice"]].assign(
+        IssuedShares=[row["已發行普通股數或TDR原股發行股數"] for row in capital]
+    )
+
+    for col in columns:
+        expected = pd.to_numeric(columns[col].apply(scraper.clean_numeric), errors="coerce")
+        pd.testing.assert_series_equal(scraper.clean_numeric_series(columns[col]), expected, check_dtype=False)
+
+    apply_ms = timeit(lambda: [columns[col].apply(scraper.clean_numeric) for col in columns])
+    series_ms = timeit(lambda: [scraper.clean_numeric_series(columns[col]) for col in columns])
+    print(f"清洗 {STOCK_COUNT} 檔 × {columns.shape[1]} 欄：逐格 apply {apply_ms:.2f} ms，整欄 {series_ms:.2f} ms"
+          f"（{apply_ms / series_ms:.0f}x，結果相同）")
+
+    scraper.fetch_twse_price_json = lambda: price
+    scraper.fetch_twse_capital_json = lambda: capital
+    print(f"get_twse_df（不含下載）：{timeit(scraper.get_twse_df):.2f} ms，{len(scraper.get_twse_df())} 檔")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+證交所逐月抓取基準測試
+以本機假 STOCK_DAY 伺服器（每次回應延遲 --latency 秒）量測 get_twse_stock_data：
+- 單一股票 730 天歷史的延遲：逐月循序（TWSE_MAX_WORKERS=1）與並行抓取
+- 多檔股票同時查詢時的總吞吐量，以及是否維持在限流器的請求額度內
+
+逐月快取寫到暫存目錄，且每次量測使用不同的股票代碼，因此都會實際送出請求。
+
+執行：python bench/bench_twse_fetch.py [--rate 4] [--burst 3] [--latency 0.3] [--tickers 4]
+"""
+
+import argparse
+import calendar
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+os.environ["TWSE_CACHE_DIR"] = tempfile.mkdtemp(prefix="twse-bench-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import routes.stock_signals_routes as signals
+from modules.rate_limiter import TokenBucket
+
+
+class FakeTwseHandler(BaseHTTPRequestHandler):
+    """回應 STOCK_DAY 格式的整月資料"""
+
+    latency = 0.3
+    requests_served = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with FakeTwseHandler.lock:
+            FakeTwseHandler.requests_served += 1
+        query = parse_qs(urlparse(self.path).query)
+        date = query["date"][0]
+        year, month = int(date[:4]), int(date[4:6])
+        time.sleep(self.latency)
+        rows = [
+            [f"{year - 1911}/{month:02d}/{day:02d}", "1,000", "0", "10", "11", "9", "10.5", "0", "1"]
+            for day in range(1, calendar.monthrange(year, month)[1] + 1)
+        ]
+        body = json.dumps({
+            "stat": "OK",
+            "title": f"{year} {query['stockNo'][0]} 測試 個股日成交資訊",
+            "data": rows,
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def fetch(stock_no):
+    start = time.perf_counter()
+    signals.get_twse_stock_data(stock_no, days=730)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=4.0, help="限流器每秒請求數")
+    parser.add_argument("--burst", type=float, default=3, help="限流器突發量")
+    parser.add_argument("--latency", type=float, default=0.3, help="假伺服器回應延遲（秒）")
+    parser.add_argument("--tickers", type=int, default=4, help="同時查詢的股票數")
+    args = parser.parse_args()
+
+    FakeTwseHandler.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTwseHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    signals.TWSE_STOCK_DAY_URL = f"http://127.0.0.1:{server.server_port}/exchangeReport/STOCK_DAY"
+
+    months = 25
+    print(f"原本逐月循序並 sleep(1.0)：約 {months * (args.latency + 1.0):.1f} 秒（{months} 個月 ×（延遲 + 1 秒））")
+    for stock_no, workers in (("1101", 1), ("1102", signals.TWSE_MAX_WORKERS)):
+        signals.TWSE_MAX_WORKERS = workers
+        signals._TWSE_LIMITER = TokenBucket(args.rate, args.burst)
+        FakeTwseHandler.requests_served = 0
+        elapsed = fetch(stock_no)
+        print(f"單檔 730 天，workers={workers}：{elapsed:.2f} 秒，{FakeTwseHandler.requests_served} 個請求")
+
+    signals._TWSE_LIMITER = TokenBucket(args.rate, args.burst)
+    FakeTwseHandler.requests_served = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.tickers) as executor:
+        list(executor.map(lambda n: signals.get_twse_stock_data(str(2000 + n), days=730), range(args.tickers)))
+    elapsed = time.perf_counter() - start
+    served = FakeTwseHandler.requests_served
+    print(f"{args.tickers} 檔同時查詢：{elapsed:.2f} 秒，{served} 個請求，"
+          f"{served / elapsed:.2f} req/s（額度 {args.rate} req/s，突發 {args.burst}）")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
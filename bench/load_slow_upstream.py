@@ -0,0 +1,97 @@
+"""
+慢速上游負載測試
+啟動一個每次回應延遲 --latency 秒的本機上游，以 gunicorn.conf.py 啟動 gunicorn
+（1 個 worker），同時送出 --concurrency 個請求，比較 sync worker 與 gthread worker
+的總耗時：sync 只能一次處理一個請求，gthread 的並行數由 GUNICORN_THREADS 決定。
+
+執行：python bench/load_slow_upstream.py [--latency 2] [--concurrency 16]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 5077
+
+
+class SlowUpstreamHandler(BaseHTTPRequestHandler):
+    latency = 2.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = json.dumps({"stat": "OK"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn 未在時限內啟動")
+
+
+def run(worker_class, threads, concurrency, upstream_url):
+    env = dict(
+        os.environ,
+        PORT=str(PORT),
+        WEB_CONCURRENCY="1",
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_THREADS=str(threads),
+        SLOW_UPSTREAM_URL=upstream_url,
+        MARKET_SNAPSHOT_BACKGROUND_REFRESH="0",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "bench.slow_upstream_app:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(f"http://127.0.0.1:{PORT}/")
+        url = f"http://127.0.0.1:{PORT}/bench/slow-upstream"
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            statuses = list(executor.map(lambda _: urllib.request.urlopen(url, timeout=120).status, range(concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    ok = sum(status == 200 for status in statuses)
+    print(f"{worker_class}（threads={threads}）：{concurrency} 個同時請求 {elapsed:.1f} 秒，成功 {ok}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=2.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    SlowUpstreamHandler.latency = args.latency
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), SlowUpstreamHandler)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    upstream_url = f"http://127.0.0.1:{upstream.server_port}/"
+
+    run("sync", 1, args.concurrency, upstream_url)
+    run("gthread", 16, args.concurrency, upstream_url)
+    upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+負載測試用的應用程式入口（由 bench/load_slow_upstream.py 以 gunicorn 啟動）
+在原本的 app 上加一個透過共用 HTTP 用戶端呼叫慢速上游（SLOW_UPSTREAM_URL）的路由。
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import jsonify
+
+from app import app
+from modules.http_client import get_http_client
+
+
+@app.route('/bench/slow-upstream')
+def slow_upstream():
+    response = get_http_client().get(os.environ["SLOW_UPSTREAM_URL"], profile="json", timeout=30)
+    response.raise_for_status()
+    return jsonify(response.json())
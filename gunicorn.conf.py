@@ -0,0 +1,26 @@
+"""
+gunicorn 設定檔
+預設使用 gthread worker：每個 worker 以多個執行緒處理請求，
+等待 TWSE/TPEx/MoneyDJ/yfinance 回應時不會佔住整個 worker。
+
+可用環境變數調整：
+- GUNICORN_WORKER_CLASS: worker 類型（gthread、gevent、sync），預設 gthread
+  （gevent 需另外安裝 gevent 套件；sync 需同時設定 GUNICORN_THREADS=1，否則 gunicorn 會自動改用 gthread）
+- WEB_CONCURRENCY: worker 行程數，預設 2
+- GUNICORN_THREADS: gthread 每個 worker 的執行緒數，預設 16
+- GUNICORN_WORKER_CONNECTIONS: gevent 每個 worker 的同時連線數，預設 200
+- GUNICORN_TIMEOUT: 單一請求逾時秒數，預設 180（逐月抓取歷史資料可能需要較久）
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 200))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 180))
+graceful_timeout = 30
+keepalive = 5
@@ -0,0 +1,221 @@
+"""
+分析結果暫存模組
+將 /analyze 的結果（族群定義版本與各族群今日成員）以短效的分析 ID 暫存在伺服器端，
+之後查詢族群詳細資訊時只需帶分析 ID，不必再上傳整份股票資料。
+
+結果同時寫入 SQLite（預設 cache/analysis_results.sqlite3），同一台主機上的
+其他 gunicorn worker 行程也能以分析 ID 取回；行程內另有 LRU 快取避免重複讀取。
+"""
+
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 預設保留筆數與存活秒數（可用環境變數覆寫）
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_TTL_SECONDS = 1800
+# 資料庫目錄（可用環境變數覆寫）
+DEFAULT_STORE_DIR = Path(__file__).parent.parent / "cache"
+
+
+class AnalysisResult:
+    """
+    單次分析的暫存結果（唯讀）。
+
+    Attributes:
+        analysis_id: 分析 ID
+        catalog_version: 分析當下使用的族群定義版本
+        catalog: 分析當下使用的族群定義快照（ThemeCatalogSnapshot）；
+            從其他行程寫入的結果只有版本，此欄位為 None
+        today_members: 族群名稱 -> 今日成員列表（today_members_by_theme() 的結果）
+        created_at: 建立時間（epoch 秒）
+    """
+
+    __slots__ = ("analysis_id", "catalog_version", "catalog", "today_members", "created_at")
+
+    def __init__(
+        self,
+        analysis_id: str,
+        catalog_version: str,
+        today_members: Dict[str, List[Dict]],
+        catalog=None,
+        created_at: Optional[float] = None,
+    ):
+        self.analysis_id = analysis_id
+        self.catalog_version = catalog_version
+        self.catalog = catalog
+        self.today_members = today_members
+        self.created_at = time.time() if created_at is None else created_at
+
+
+class AnalysisStore:
+    """
+    分析結果的暫存（執行緒安全，可跨行程共用）。
+
+    行程內以 LRU 保留最多 max_entries 筆；所有結果同時寫入 SQLite，
+    本行程找不到時再從資料庫讀取。超過 ttl 秒的項目視為不存在。
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        store_dir: Optional[str] = None,
+    ):
+        """
+        Args:
+            max_entries: 行程內最多保留筆數，None 時使用 ANALYSIS_STORE_MAX_ENTRIES 環境變數或預設值
+            ttl: 存活秒數，None 時使用 ANALYSIS_STORE_TTL 環境變數或預設值
+            store_dir: 資料庫目錄，None 時使用 ANALYSIS_STORE_DIR 環境變數或預設目錄
+        """
+        if max_entries is None:
+            max_entries = int(os.environ.get("ANALYSIS_STORE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        if ttl is None:
+            ttl = float(os.environ.get("ANALYSIS_STORE_TTL", DEFAULT_TTL_SECONDS))
+        if store_dir is None:
+            store_dir = os.environ.get("ANALYSIS_STORE_DIR", str(DEFAULT_STORE_DIR))
+
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store_dir = Path(store_dir)
+        self.db_path = self.store_dir / "analysis_results.sqlite3"
+        self._entries: "OrderedDict[str, AnalysisResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._enabled = True
+
+        try:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS analysis_results (
+                        analysis_id TEXT PRIMARY KEY,
+                        catalog_version TEXT NOT NULL,
+                        today_members TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_analysis_results_created ON analysis_results (created_at)"
+                )
+        except (OSError, sqlite3.Error) as e:
+            # 資料庫無法使用時仍可在行程內使用（多 worker 時可能查不到其他行程的結果）
+            logger.warning(f"分析結果資料庫停用（{self.db_path}）: {str(e)}")
+            self._enabled = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """開啟連線：區塊正常結束時提交、發生例外時回滾，最後一律關閉連線"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _evict_expired(self, now: float) -> None:
+        # 取用會調整順序，因此逐筆檢查（筆數上限很小）
+        expired = [key for key, result in self._entries.items() if now - result.created_at > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def _remember(self, result: AnalysisResult) -> None:
+        with self._lock:
+            self._evict_expired(time.time())
+            self._entries[result.analysis_id] = result
+            self._entries.move_to_end(result.analysis_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, catalog, today_members: Dict[str, List[Dict]]) -> str:
+        """
+        暫存一次分析結果。
+
+        Args:
+            catalog: 分析時使用的族群定義快照
+            today_members: 族群名稱 -> 今日成員列表
+
+        Returns:
+            分析 ID
+        """
+        analysis_id = secrets.token_urlsafe(12)
+        result = AnalysisResult(analysis_id, catalog.version, today_members, catalog=catalog)
+        self._remember(result)
+
+        if self._enabled:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "DELETE FROM analysis_results WHERE created_at < ?",
+                        (result.created_at - self.ttl,),
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO analysis_results (analysis_id, catalog_version, today_members, created_at)"
+                        " VALUES (?, ?, ?, ?)",
+                        (analysis_id, catalog.version, json.dumps(today_members, ensure_ascii=False), result.created_at),
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"寫入分析結果失敗: {str(e)}")
+        return analysis_id
+
+    def get(self, analysis_id: str) -> Optional[AnalysisResult]:
+        """
+        取得暫存的分析結果（先查行程內快取，再查資料庫）。
+
+        Args:
+            analysis_id: 分析 ID
+
+        Returns:
+            AnalysisResult，不存在或已過期時返回 None
+        """
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            result = self._entries.get(analysis_id)
+            if result is not None:
+                self._entries.move_to_end(analysis_id)
+                return result
+
+        if not self._enabled:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT catalog_version, today_members, created_at FROM analysis_results"
+                    " WHERE analysis_id = ? AND created_at >= ?",
+                    (analysis_id, now - self.ttl),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"讀取分析結果失敗: {str(e)}")
+            return None
+        if row is None:
+            return None
+
+        catalog_version, today_members, created_at = row
+        result = AnalysisResult(analysis_id, catalog_version, json.loads(today_members), created_at=created_at)
+        self._remember(result)
+        return result
+
+
+_store: Optional[AnalysisStore] = None
+_store_lock = threading.Lock()
+
+
+def get_analysis_store() -> AnalysisStore:
+    """取得行程層級共用的 AnalysisStore 實例"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AnalysisStore()
+        return _store
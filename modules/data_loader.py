@@ -11,21 +11,59 @@ from typing import Dict, List, Optional
 import pandas as pd
 import sys
 import os
-# 添加當前目錄到路徑
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-import scraper
+# 添加父目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import scraper
+from modules.market_snapshot import get_market_snapshot_store
+from modules.turnover_rank import sort_by_turnover
+
+
+def resolve_supply_chain_path() -> Path:
+    """
+    取得預設的族群定義檔路徑。
+
+    優先順序：
+    1. themes_new.json
+    2. ../小工具/themes_new.json
+    3. all_themes_supply_chain.json
+    4. data/themes_supply_chain.json
+
+    Returns:
+        族群定義檔路徑（不保證存在）
+    """
+    # 使用相對路徑，從 final 資料夾出發
+    # __file__ 是 final/modules/data_loader.py
+    # parent.parent 是 final 資料夾
+    base_path = Path(__file__).parent.parent
+    
+    # 優先讀取 themes_new.json（在 final 資料夾中）
+    themes_new_path = base_path / "themes_new.json"
+    if themes_new_path.exists():
+        return themes_new_path
+
+    # 其次嘗試從小工具資料夾找
+    themes_new_path = base_path.parent / "小工具" / "themes_new.json"
+    if themes_new_path.exists():
+        return themes_new_path
+
+    # 最後嘗試其他可能的路徑
+    all_themes_path = base_path / "all_themes_supply_chain.json"
+    if all_themes_path.exists():
+        return all_themes_path
+    return base_path / "data" / "themes_supply_chain.json"
 
 
 def load_supply_chain_json(json_path: Optional[str] = None, use_session_state: bool = True) -> Dict:
     """
     載入族群供應鏈 JSON 定義檔。
 
+    每次呼叫都會重新讀取檔案；Web 路由請改用 theme_catalog.get_theme_catalog()，
+    只在檔案變更時才重新載入。
+
     優先順序：
     1. Session State 中的自訂族群資料（如果 use_session_state=True）
     2. 指定的 json_path（如果提供）
-    3. themes_new.json
-    4. all_themes_supply_chain.json
-    5. data/themes_supply_chain.json
+    3. 預設路徑（見 resolve_supply_chain_path()）
 
     Args:
         json_path: JSON 檔案路徑，若為 None 則使用預設路徑
@@ -38,28 +76,7 @@ def load_supply_chain_json(json_path: Optional[str] = None, use_session_state: b
     # 系統只使用 themes_new.json（唯讀）
     
     if json_path is None:
-        # 使用相對路徑，從 final 資料夾出發
-        # __file__ 是 final/modules/data_loader.py
-        # parent.parent 是 final 資料夾
-        base_path = Path(__file__).parent.parent
-        
-        # 優先讀取 themes_new.json（在 final 資料夾中）
-        themes_new_path = base_path / "themes_new.json"
-        if themes_new_path.exists():
-            json_path = themes_new_path
-        else:
-            # 其次嘗試從小工具資料夾找
-            parent_path = base_path.parent
-            themes_new_path = parent_path / "小工具" / "themes_new.json"
-            if themes_new_path.exists():
-                json_path = themes_new_path
-            else:
-                # 最後嘗試其他可能的路徑
-                all_themes_path = base_path / "all_themes_supply_chain.json"
-            if all_themes_path.exists():
-                json_path = all_themes_path
-            else:
-                json_path = base_path / "data" / "themes_supply_chain.json"
+        json_path = resolve_supply_chain_path()
 
     json_path = Path(json_path)
     if not json_path.exists():
@@ -175,7 +192,7 @@ def load_today_topN_from_csv(csv_path: str, top_n: int = 50) -> pd.DataFrame:
     df["turnover"] = pd.to_numeric(df["turnover"], errors="coerce")
 
     # 按週轉率排序，取 Top N
-    df = df.sort_values("turnover", ascending=False).head(top_n).reset_index(drop=True)
+    df = sort_by_turnover(df, top_n)
 
     # 確保有 close 和 chg_pct 欄位（若不存在則設為 NaN）
     if "close" not in df.columns:
@@ -196,7 +213,8 @@ def load_today_topN(top_n: Optional[int] = None, source: str = "paste", pasted_t
     目前支援：
     - "paste": 從貼上的文字解析資料（推薦）
     - "web": 自動從網路抓取（玩股網）
-    - "api": 從 TWSE 和 TPEx 官方 API 抓取並計算週轉率（推薦，最準確）
+    - "api": 從 TWSE 和 TPEx 官方 API 抓取並計算週轉率（推薦，最準確）；
+             讀取每日市場快照，同一交易日內不會重複下載
     - "mock": 產生假資料（用於測試）
 
     Args:
@@ -216,7 +234,7 @@ def load_today_topN(top_n: Optional[int] = None, source: str = "paste", pasted_t
     elif source == "web":
         return scraper.fetch_turnover_rank_data(top_n)
     elif source == "api":
-        return scraper.fetch_turnover_from_api(top_n if top_n else 50)
+        return get_market_snapshot_store().get_top_n(top_n if top_n else 50)
     else:
         return _generate_mock_data(top_n if top_n else 50)
 
@@ -351,7 +369,7 @@ def _parse_pasted_data(pasted_text: str, top_n: Optional[int] = None) -> pd.Data
             if not code_text or not code_text.isdigit() or len(code_text) != 4:
                 continue
             
-            # 轉換資料格式
+            # 轉換資料格式（逐值以 float() 轉換，維持既有的格式檢查：無法轉換的行直接跳過）
             try:
                 turnover = float(turnover_text) if turnover_text else 0.0
                 close = float(close_text) if close_text else None
@@ -375,19 +393,12 @@ def _parse_pasted_data(pasted_text: str, top_n: Optional[int] = None) -> pd.Data
     if not data:
         raise Exception("無法從貼上的資料中提取股票資訊。請確認資料格式是否正確。")
     
-    # 轉換為 DataFrame
-    df = pd.DataFrame(data)
-    df["code"] = df["code"].astype(str).str.zfill(4)
-    df["turnover"] = pd.to_numeric(df["turnover"], errors="coerce")
-    df["close"] = pd.to_numeric(df["close"], errors="coerce")
-    df["chg_pct"] = pd.to_numeric(df["chg_pct"], errors="coerce")
-    
-    # 按週轉率排序
-    df = df.sort_values("turnover", ascending=False).reset_index(drop=True)
+    df = pd.DataFrame(data, columns=["code", "name", "turnover", "close", "chg_pct"])
+    for col in ["turnover", "close", "chg_pct"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
     
-    # 如果指定了 top_n，才限制數量
-    if top_n is not None and top_n > 0:
-        df = df.head(top_n)
+    # 按週轉率排序；如果指定了 top_n，才限制數量
+    df = sort_by_turnover(df, top_n if top_n is not None and top_n > 0 else None)
     
     return df[["code", "name", "turnover", "close", "chg_pct"]]
 
@@ -520,6 +531,4 @@ def _generate_mock_data(top_n: int = 50) -> pd.DataFrame:
     df = pd.DataFrame(data)
 
     # 按週轉率排序
-    df = df.sort_values("turnover", ascending=False).reset_index(drop=True)
-
-    return df
+    return sort_by_turnover(df)
@@ -0,0 +1,634 @@
+"""
+族群熱度歷史模組
+每個交易日將全市場快照與族群熱度排行寫入 SQLite，
+排名變化與連續上榜天數在寫入時預先計算，趨勢查詢只需讀取彙總表。
+"""
+
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 添加父目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.theme_engine import (
+    ThemeHeatAccumulator,
+    ThemeHeatAccumulatorCache,
+    as_theme_index,
+    diff_theme_members,
+)
+
+logger = logging.getLogger(__name__)
+
+# 歷史資料目錄（可用環境變數覆寫）
+DEFAULT_HISTORY_DIR = Path(__file__).parent.parent / "cache"
+# 每日熱度以週轉率前 N 名計算（與 /analyze 預設相同）
+DEFAULT_HEAT_TOP_N = 50
+# 計算個股週轉率 z 分數時至少需要的歷史天數
+MIN_BASELINE_DAYS = 5
+# 行程內保留熱度累加器的交易日數（族群定義變更時這些交易日只套用差異）
+DEFAULT_ACCUMULATOR_DAYS = 250
+
+UNIVERSE_COLUMNS = ["code", "name", "close", "turnover", "chg_pct", "market", "volume"]
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS universe_daily (
+        trading_date TEXT NOT NULL,
+        code TEXT NOT NULL,
+        name TEXT,
+        close REAL,
+        turnover REAL,
+        chg_pct REAL,
+        market TEXT,
+        volume REAL,
+        turnover_rank INTEGER,
+        PRIMARY KEY (trading_date, code)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_universe_code ON universe_daily (code, trading_date)",
+    """
+    CREATE TABLE IF NOT EXISTS heat_days (
+        trading_date TEXT PRIMARY KEY,
+        top_n INTEGER NOT NULL,
+        catalog_version TEXT,
+        theme_count INTEGER NOT NULL,
+        recorded_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS theme_heat_daily (
+        theme_name TEXT NOT NULL,
+        trading_date TEXT NOT NULL,
+        count_in_topN INTEGER NOT NULL,
+        avg_turnover REAL,
+        avg_chg_pct REAL,
+        heat_rank INTEGER NOT NULL,
+        rank_change INTEGER,
+        streak_days INTEGER NOT NULL DEFAULT 1,
+        rising_days INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (theme_name, trading_date)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_heat_date_rank ON theme_heat_daily (trading_date, heat_rank)",
+]
+
+
+def _nullable(value):
+    """NaN 轉為 None（寫入 SQLite 為 NULL）"""
+    return None if pd.isna(value) else value
+
+
+class HeatHistoryStore:
+    """
+    族群熱度歷史（執行緒安全）。
+
+    - universe_daily: 每日全市場快照
+    - heat_days: 已記錄的交易日（含計算時的 Top N 與族群定義版本）
+    - theme_heat_daily: 每日族群熱度排行，附帶預先計算的
+      rank_change（與前一個記錄日相比，正數代表排名上升）、
+      streak_days（連續上榜天數）、rising_days（排名連續上升天數）
+
+    行程內另保留最近記錄（或重算）交易日的 ThemeHeatAccumulator，
+    族群定義變更時這些交易日只重算成分股有變動的族群。
+    """
+
+    def __init__(self, history_dir: Optional[str] = None, top_n: Optional[int] = None):
+        """
+        Args:
+            history_dir: 資料目錄，None 時使用 HEAT_HISTORY_DIR 環境變數或預設目錄
+            top_n: 每日熱度計算的 Top N，None 時使用 HEAT_HISTORY_TOP_N 環境變數或預設值
+        """
+        if history_dir is None:
+            history_dir = os.environ.get("HEAT_HISTORY_DIR", str(DEFAULT_HISTORY_DIR))
+        if top_n is None:
+            top_n = int(os.environ.get("HEAT_HISTORY_TOP_N", DEFAULT_HEAT_TOP_N))
+
+        self.history_dir = Path(history_dir)
+        self.db_path = self.history_dir / "theme_heat_history.sqlite3"
+        self.top_n = top_n
+
+        self._lock = threading.Lock()
+        self._enabled = True
+        # 最近一次計算的週轉率基準（同一交易日內重複使用）
+        self._baseline_cache = (None, None)
+        # 交易日 -> 當日 Top N 的熱度累加器
+        self._accumulators = ThemeHeatAccumulatorCache(
+            max_entries=int(os.environ.get("HEAT_HISTORY_ACCUMULATOR_DAYS", DEFAULT_ACCUMULATOR_DAYS))
+        )
+
+        try:
+            self.history_dir.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                # 較早建立的資料庫沒有 turnover_rank 欄位
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(universe_daily)")}
+                if "turnover_rank" not in columns:
+                    conn.execute("ALTER TABLE universe_daily ADD COLUMN turnover_rank INTEGER")
+        except (OSError, sqlite3.Error) as e:
+            # 無法寫入時不影響主流程，只是不保留歷史
+            logger.warning(f"族群熱度歷史停用（{self.db_path}）: {str(e)}")
+            self._enabled = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """開啟連線：區塊正常結束時提交、發生例外時回滾，最後一律關閉連線"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def day_version(self, trading_date: str) -> Optional[str]:
+        """
+        取得某交易日記錄時使用的族群定義版本。
+
+        Returns:
+            族群定義版本，尚未記錄（或版本不明）時返回 None
+        """
+        if not self._enabled:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT catalog_version FROM heat_days WHERE trading_date = ?", (trading_date,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"讀取族群熱度歷史失敗: {str(e)}")
+            return None
+        return row[0] if row else None
+
+    def has_day(self, trading_date: str) -> bool:
+        """某交易日是否已記錄"""
+        if not self._enabled:
+            return False
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT 1 FROM heat_days WHERE trading_date = ?", (trading_date,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"讀取族群熱度歷史失敗: {str(e)}")
+            return False
+        return row is not None
+
+    def has_other_versions(self, catalog_version: str) -> bool:
+        """是否有交易日是以其他（或不明）族群定義版本記錄的"""
+        if not self._enabled:
+            return False
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT 1 FROM heat_days WHERE catalog_version IS NULL OR catalog_version != ? LIMIT 1",
+                    (catalog_version,),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"讀取族群熱度歷史失敗: {str(e)}")
+            return False
+        return row is not None
+
+    def sync_day(self, trading_date: str, universe_df: pd.DataFrame, themes_data, catalog_version: str) -> bool:
+        """
+        市場快照更新時呼叫：先讓既有歷史與目前的族群定義一致，再記錄當日（已記錄時略過）。
+
+        族群定義可能在行程停止期間修改，此時沒有變更通知；只要有任何交易日以其他版本記錄，
+        就先以目前的定義重算這些交易日，避免新舊定義混用而算錯排名變化與連續天數。
+
+        Args:
+            trading_date: 交易日（資料本身的日期）
+            universe_df: 全市場 DataFrame（依週轉率由高到低排序）
+            themes_data: 目前的族群資料（或 ThemeIndex）
+            catalog_version: 目前的族群定義版本
+
+        Returns:
+            是否寫入了當日資料
+        """
+        if self.has_other_versions(catalog_version):
+            # 不知道舊版定義，以目前的定義重新計算以其他版本記錄的交易日
+            self.rebase_catalog(themes_data, themes_data, None, catalog_version)
+        return self.record_day(trading_date, universe_df, themes_data, catalog_version)
+
+    def record_day(
+        self,
+        trading_date: str,
+        universe_df: pd.DataFrame,
+        themes_data,
+        catalog_version: Optional[str] = None,
+    ) -> bool:
+        """
+        記錄一個交易日的全市場快照與族群熱度。
+
+        交易日應取自上游資料本身的日期；同一交易日已記錄時不再寫入
+        （避免假日時以前一個交易日的資料重複記錄，族群定義變更則由 rebase_catalog() 處理）。
+
+        Args:
+            trading_date: 交易日（YYYY-MM-DD）
+            universe_df: 全市場 DataFrame（依週轉率由高到低排序）
+            themes_data: 族群資料（load_supply_chain_json() 的結果或 ThemeIndex）
+            catalog_version: 族群定義版本（用於判斷是否需要重新計算）
+
+        Returns:
+            是否寫入成功（該交易日已記錄時為 False）
+        """
+        if not self._enabled or universe_df is None or universe_df.empty:
+            return False
+        if self.has_day(trading_date):
+            return False
+
+        top_df = universe_df.head(self.top_n)
+        accumulator = ThemeHeatAccumulator(top_df, themes_data)
+        heat_df = accumulator.heat_frame()
+
+        universe = universe_df.reindex(columns=UNIVERSE_COLUMNS)
+        universe = universe.astype(object).where(universe.notna(), None)
+        # turnover_rank 保存快照中的順序，重算歷史時可精確取回當日的 Top N
+        universe_rows = [
+            (trading_date, *row, rank)
+            for rank, row in enumerate(universe.itertuples(index=False, name=None), start=1)
+        ]
+        heat_rows = [
+            (
+                row.theme_name, trading_date, int(row.count_in_topN),
+                _nullable(row.avg_turnover), _nullable(row.avg_chg_pct), rank,
+            )
+            for rank, row in enumerate(heat_df.itertuples(index=False), start=1)
+        ]
+
+        try:
+            with self._lock, self._connect() as conn:
+                # 計算期間可能已由其他 worker 寫入
+                if conn.execute("SELECT 1 FROM heat_days WHERE trading_date = ?", (trading_date,)).fetchone():
+                    return False
+                conn.execute("DELETE FROM universe_daily WHERE trading_date = ?", (trading_date,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO universe_daily "
+                    "(trading_date, code, name, close, turnover, chg_pct, market, volume, turnover_rank) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    universe_rows,
+                )
+                conn.execute("DELETE FROM theme_heat_daily WHERE trading_date = ?", (trading_date,))
+                conn.executemany(
+                    "INSERT INTO theme_heat_daily "
+                    "(theme_name, trading_date, count_in_topN, avg_turnover, avg_chg_pct, heat_rank) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    heat_rows,
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO heat_days "
+                    "(trading_date, top_n, catalog_version, theme_count, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                    (trading_date, self.top_n, catalog_version, len(heat_rows), time.time()),
+                )
+                self._update_derived(conn, trading_date)
+        except sqlite3.Error as e:
+            logger.warning(f"寫入族群熱度歷史失敗（{trading_date}）: {str(e)}")
+            return False
+
+        self._accumulators.put(trading_date, accumulator)
+        logger.info(f"族群熱度歷史已記錄（{trading_date}），{len(heat_rows)} 個族群")
+        return True
+
+    def rebase_catalog(self, old_data, new_data, old_version: Optional[str], new_version: str) -> Dict:
+        """
+        族群定義變更後更新歷史熱度。
+
+        以新舊定義的成分股差異判斷每個記錄日是否受影響：
+        Top N 中沒有任何變動股票的交易日只更新版本；受影響的交易日（及以其他版本記錄的交易日）
+        若行程內有當日的累加器，只以差異重算有變動的族群，否則以新定義建立累加器（之後的變更即可增量套用）；
+        只改寫數值或排名有變動的族群列，最後從最早變動的日期起重算排名變化與連續天數。
+
+        Args:
+            old_data: 舊版族群資料（或 ThemeIndex）
+            new_data: 新版族群資料（或 ThemeIndex）
+            old_version: 舊版族群定義版本
+            new_version: 新版族群定義版本
+
+        Returns:
+            字典，包含 days_checked, days_updated, rows_written
+        """
+        result = {"days_checked": 0, "days_updated": 0, "rows_written": 0}
+        if not self._enabled:
+            return result
+
+        old_index = as_theme_index(old_data)
+        new_index = as_theme_index(new_data)
+        changes = diff_theme_members(old_index, new_index)
+        changed_tickers = set()
+        for added, removed in changes.values():
+            changed_tickers |= added | removed
+        # 族群順序只影響同分時的排名；順序改變時每天都需要重新排名
+        common = set(old_index.theme_to_members) & set(new_index.theme_to_members)
+        reordered = (
+            [t for t in old_index.theme_to_members if t in common]
+            != [t for t in new_index.theme_to_members if t in common]
+        )
+
+        try:
+            with self._lock, self._connect() as conn:
+                days = conn.execute(
+                    "SELECT trading_date, top_n, catalog_version FROM heat_days "
+                    "WHERE catalog_version IS NULL OR catalog_version != ? ORDER BY trading_date",
+                    (new_version,),
+                ).fetchall()
+                first_changed = None
+                for trading_date, top_n, day_version in days:
+                    result["days_checked"] += 1
+                    accumulator = self._accumulators.get(trading_date)
+                    if accumulator is None:
+                        top_df = pd.read_sql_query(
+                            "SELECT code, turnover, chg_pct FROM universe_daily WHERE trading_date = ? "
+                            "ORDER BY turnover_rank IS NULL, turnover_rank, turnover DESC LIMIT ?",
+                            conn, params=(trading_date, top_n),
+                        )
+                        top_codes = set(top_df["code"].astype(str).str.zfill(4))
+                    else:
+                        top_codes = accumulator.codes
+
+                    # 以舊版記錄且 Top N 不含變動股票時，新定義的熱度與現有記錄相同
+                    from_old_version = day_version is not None and day_version == old_version
+                    if from_old_version and not reordered and not changed_tickers.intersection(top_codes):
+                        if accumulator is not None and accumulator.index is old_index:
+                            accumulator.apply_catalog_change(new_index, changes)
+                        conn.execute(
+                            "UPDATE heat_days SET catalog_version = ? WHERE trading_date = ?",
+                            (new_version, trading_date),
+                        )
+                        continue
+
+                    if accumulator is None:
+                        accumulator = ThemeHeatAccumulator(top_df, new_index)
+                        self._accumulators.put(trading_date, accumulator)
+                    else:
+                        # 累加器以舊版定義建立時可直接使用這次的差異，否則由累加器自行比對
+                        accumulator.apply_catalog_change(
+                            new_index, changes if accumulator.index is old_index else None
+                        )
+                    heat_df = accumulator.heat_frame()
+                    written = self._write_heat_diff(conn, trading_date, heat_df)
+                    conn.execute(
+                        "UPDATE heat_days SET catalog_version = ?, theme_count = "
+                        "(SELECT COUNT(*) FROM theme_heat_daily WHERE trading_date = ?) WHERE trading_date = ?",
+                        (new_version, trading_date, trading_date),
+                    )
+                    if written:
+                        result["days_updated"] += 1
+                        result["rows_written"] += written
+                        if first_changed is None:
+                            first_changed = trading_date
+
+                if first_changed is not None:
+                    self._update_derived(conn, first_changed)
+        except sqlite3.Error as e:
+            logger.warning(f"更新族群熱度歷史失敗: {str(e)}")
+            return result
+
+        logger.info(
+            f"族群定義變更（{old_version} -> {new_version}），"
+            f"檢查 {result['days_checked']} 天，更新 {result['days_updated']} 天、{result['rows_written']} 列"
+        )
+        return result
+
+    def _write_heat_diff(self, conn: sqlite3.Connection, trading_date: str, heat_df: pd.DataFrame) -> int:
+        """只寫入與現有記錄不同的族群列，返回寫入（含刪除）的列數"""
+        existing = {
+            theme_name: (count, avg_turnover, avg_chg_pct, rank)
+            for theme_name, count, avg_turnover, avg_chg_pct, rank in conn.execute(
+                "SELECT theme_name, count_in_topN, avg_turnover, avg_chg_pct, heat_rank "
+                "FROM theme_heat_daily WHERE trading_date = ?",
+                (trading_date,),
+            )
+        }
+        rows = {
+            row.theme_name: (int(row.count_in_topN), _nullable(row.avg_turnover), _nullable(row.avg_chg_pct), rank)
+            for rank, row in enumerate(heat_df.itertuples(index=False), start=1)
+        }
+
+        removed = [(theme_name, trading_date) for theme_name in existing if theme_name not in rows]
+        upserts = [
+            (theme_name, trading_date, *values)
+            for theme_name, values in rows.items()
+            if existing.get(theme_name) != values
+        ]
+        conn.executemany("DELETE FROM theme_heat_daily WHERE theme_name = ? AND trading_date = ?", removed)
+        conn.executemany(
+            "INSERT OR REPLACE INTO theme_heat_daily "
+            "(theme_name, trading_date, count_in_topN, avg_turnover, avg_chg_pct, heat_rank) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            upserts,
+        )
+        return len(removed) + len(upserts)
+
+    def _update_derived(self, conn: sqlite3.Connection, start_date: str) -> None:
+        """
+        從 start_date 起依序重算 rank_change / streak_days / rising_days。
+        通常只有最新一天需要計算；補記較早的交易日時才會連帶更新之後的日期。
+        """
+        prev_row = conn.execute(
+            "SELECT MAX(trading_date) FROM heat_days WHERE trading_date < ?", (start_date,)
+        ).fetchone()
+        prev_date = prev_row[0] if prev_row else None
+
+        prev: Dict[str, tuple] = {}
+        if prev_date is not None:
+            for theme_name, rank, streak, rising in conn.execute(
+                "SELECT theme_name, heat_rank, streak_days, rising_days FROM theme_heat_daily WHERE trading_date = ?",
+                (prev_date,),
+            ):
+                prev[theme_name] = (rank, streak, rising)
+
+        dates = [
+            row[0] for row in conn.execute(
+                "SELECT trading_date FROM heat_days WHERE trading_date >= ? ORDER BY trading_date", (start_date,)
+            )
+        ]
+        for trading_date in dates:
+            current = {}
+            updates = []
+            for theme_name, rank in conn.execute(
+                "SELECT theme_name, heat_rank FROM theme_heat_daily WHERE trading_date = ?", (trading_date,)
+            ):
+                if theme_name in prev:
+                    prev_rank, prev_streak, prev_rising = prev[theme_name]
+                    rank_change = prev_rank - rank
+                    streak = prev_streak + 1
+                    rising = prev_rising + 1 if rank_change > 0 else 0
+                else:
+                    rank_change, streak, rising = None, 1, 0
+                current[theme_name] = (rank, streak, rising)
+                updates.append((rank_change, streak, rising, theme_name, trading_date))
+            conn.executemany(
+                "UPDATE theme_heat_daily SET rank_change = ?, streak_days = ?, rising_days = ? "
+                "WHERE theme_name = ? AND trading_date = ?",
+                updates,
+            )
+            prev = current
+
+    def turnover_baseline(self, before_date: str, days: int = 60) -> pd.DataFrame:
+        """
+        取得各股在指定日期之前最近 N 個記錄日的週轉率平均與標準差。
+
+        Args:
+            before_date: 只使用此日期之前（不含）的資料
+            days: 最近幾個記錄日
+
+        Returns:
+            DataFrame，index 為補零後的股票代碼，欄位 mean, std, days；
+            歷史天數不足 MIN_BASELINE_DAYS 的股票不包含在內
+        """
+        empty = pd.DataFrame(columns=["mean", "std", "days"])
+        if not self._enabled:
+            return empty
+
+        key = (before_date, days)
+        cached_key, cached = self._baseline_cache
+        if cached_key == key:
+            return cached
+
+        try:
+            with self._connect() as conn:
+                dates = [
+                    row[0] for row in conn.execute(
+                        "SELECT trading_date FROM heat_days WHERE trading_date < ? "
+                        "ORDER BY trading_date DESC LIMIT ?",
+                        (before_date, days),
+                    )
+                ]
+                if len(dates) < MIN_BASELINE_DAYS:
+                    return empty
+                df = pd.read_sql_query(
+                    "SELECT code, COUNT(turnover) AS n, AVG(turnover) AS mean, "
+                    "AVG(turnover * turnover) AS mean_sq FROM universe_daily "
+                    "WHERE trading_date >= ? AND trading_date < ? GROUP BY code",
+                    conn, params=(dates[-1], before_date),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"讀取週轉率歷史失敗: {str(e)}")
+            return empty
+
+        df = df[df["n"] >= MIN_BASELINE_DAYS]
+        n = df["n"].to_numpy(dtype=float)
+        # 樣本標準差（由平方平均換算）
+        variance = np.clip(df["mean_sq"].to_numpy() - df["mean"].to_numpy() ** 2, 0, None) * n / (n - 1)
+        baseline = pd.DataFrame(
+            {"mean": df["mean"].to_numpy(), "std": np.sqrt(variance), "days": df["n"].to_numpy()},
+            index=pd.Index(df["code"].astype(str).str.zfill(4), name="code"),
+        )
+        baseline = baseline[~baseline.index.duplicated()]
+        self._baseline_cache = (key, baseline)
+        return baseline
+
+    def get_trend(
+        self,
+        days: int = 20,
+        themes: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> Dict:
+        """
+        取得最近 N 個記錄日的族群熱度趨勢。
+
+        Args:
+            days: 最近幾個交易日
+            themes: 只取指定族群（None 表示全部）
+            limit: 最多返回幾個族群（依最新排名排序）
+
+        Returns:
+            字典，包含：
+            - dates: 交易日列表（由舊到新）
+            - themes: 每個族群的 series（與 dates 對齊，未上榜為 None）、latest_rank、
+              rank_change（與前一記錄日相比）、period_rank_change（期間首次上榜到最新）、
+              streak_days、rising_days
+        """
+        empty = {"dates": [], "themes": []}
+        if not self._enabled:
+            return empty
+
+        try:
+            with self._connect() as conn:
+                dates = [
+                    row[0] for row in conn.execute(
+                        "SELECT trading_date FROM heat_days ORDER BY trading_date DESC LIMIT ?", (days,)
+                    )
+                ][::-1]
+                if not dates:
+                    return empty
+
+                sql = (
+                    "SELECT theme_name, trading_date, count_in_topN, avg_turnover, avg_chg_pct, "
+                    "heat_rank, rank_change, streak_days, rising_days "
+                    "FROM theme_heat_daily WHERE trading_date >= ?"
+                )
+                params: list = [dates[0]]
+                if themes:
+                    sql += f" AND theme_name IN ({','.join('?' * len(themes))})"
+                    params.extend(themes)
+                rows = conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"讀取族群熱度歷史失敗: {str(e)}")
+            return empty
+
+        date_pos = {d: i for i, d in enumerate(dates)}
+        latest_date = dates[-1]
+        by_theme: Dict[str, Dict] = {}
+        for theme_name, trading_date, count, avg_turnover, avg_chg_pct, rank, rank_change, streak, rising in rows:
+            entry = by_theme.get(theme_name)
+            if entry is None:
+                entry = by_theme[theme_name] = {
+                    "theme_name": theme_name,
+                    "series": [None] * len(dates),
+                    "latest_rank": None,
+                    "rank_change": None,
+                    "period_rank_change": None,
+                    "streak_days": 0,
+                    "rising_days": 0,
+                }
+            entry["series"][date_pos[trading_date]] = {
+                "trading_date": trading_date,
+                "count_in_topN": count,
+                "avg_turnover": avg_turnover,
+                "avg_chg_pct": avg_chg_pct,
+                "heat_rank": rank,
+                "rank_change": rank_change,
+            }
+            if trading_date == latest_date:
+                entry["latest_rank"] = rank
+                entry["rank_change"] = rank_change
+                entry["streak_days"] = streak
+                entry["rising_days"] = rising
+
+        for entry in by_theme.values():
+            first_rank = next(point["heat_rank"] for point in entry["series"] if point is not None)
+            if entry["latest_rank"] is not None:
+                entry["period_rank_change"] = first_rank - entry["latest_rank"]
+
+        # 最新一天有上榜的依排名在前，其餘依名稱
+        result = sorted(
+            by_theme.values(),
+            key=lambda e: (e["latest_rank"] is None, e["latest_rank"] or 0, e["theme_name"]),
+        )
+        if limit:
+            result = result[:limit]
+        return {"dates": dates, "themes": result}
+
+
+_history: Optional[HeatHistoryStore] = None
+_history_lock = threading.Lock()
+
+
+def get_heat_history() -> HeatHistoryStore:
+    """取得行程層級共用的 HeatHistoryStore 實例"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = HeatHistoryStore()
+        return _history
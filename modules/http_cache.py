@@ -0,0 +1,128 @@
+"""
+預先計算回應模組
+將很少變動的 JSON 回應序列化一次，同時準備 gzip（及 brotli）壓縮版本與強 ETag，
+請求時只需比對 If-None-Match 並挑選編碼，不再重複序列化與壓縮。
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from flask import Response, request
+
+logger = logging.getLogger(__name__)
+
+# brotli 為選用套件，未安裝時只提供 gzip
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# 小於此大小的內容不壓縮（壓縮後反而可能更大）
+MIN_COMPRESS_SIZE = 512
+
+
+class PrecomputedResponse:
+    """
+    預先序列化與壓縮好的 JSON 回應（建立後唯讀）。
+
+    每種編碼各有自己的強 ETag（內容雜湊加上編碼後綴），
+    任一版本的 ETag 出現在 If-None-Match 中都視為內容未變更。
+    """
+
+    def __init__(self, payload, cache_control: str = "public, no-cache"):
+        """
+        Args:
+            payload: 可序列化為 JSON 的資料
+            cache_control: Cache-Control 標頭
+        """
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha1(body).hexdigest()
+        self.cache_control = cache_control
+        self.bodies: Dict[str, bytes] = {"identity": body}
+        self.etags: Dict[str, str] = {"identity": digest}
+
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.bodies["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            self.etags["gzip"] = f"{digest}-gzip"
+            if BROTLI_AVAILABLE:
+                self.bodies["br"] = brotli.compress(body)
+                self.etags["br"] = f"{digest}-br"
+
+    def _choose_encoding(self) -> str:
+        accepted = request.accept_encodings
+        for encoding in ("br", "gzip"):
+            if encoding in self.bodies and accepted[encoding]:
+                return encoding
+        return "identity"
+
+    def to_response(self) -> Response:
+        """
+        依目前請求產生回應：ETag 相符時返回 304，否則依 Accept-Encoding 返回對應版本。
+
+        Returns:
+            Flask Response
+        """
+        encoding = self._choose_encoding()
+        etag = self.etags[encoding]
+
+        if any(request.if_none_match.contains_weak(tag) for tag in self.etags.values()):
+            response = Response(status=304)
+        else:
+            response = Response(self.bodies[encoding], mimetype="application/json")
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = self.cache_control
+        response.vary.add("Accept-Encoding")
+        return response
+
+
+class PrecomputedResponseCache:
+    """
+    PrecomputedResponse 的 LRU 快取（執行緒安全）。
+
+    鍵應包含所有會影響內容的版本資訊（例如族群定義版本、快照交易日），
+    版本變更時自然產生新的鍵，舊的項目由 LRU 淘汰。
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, PrecomputedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[PrecomputedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], PrecomputedResponse]) -> PrecomputedResponse:
+        """
+        取得快取項目，不存在時呼叫 builder 建立並存入。
+
+        Args:
+            key: 快取鍵
+            builder: 建立 PrecomputedResponse 的函式
+
+        Returns:
+            PrecomputedResponse
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        entry = builder()
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
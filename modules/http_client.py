@@ -0,0 +1,260 @@
+"""
+共用 HTTP 用戶端模組
+所有上游來源（證交所、櫃買中心、MoneyDJ、玩股網）共用同一個 keep-alive Session，
+每個主機各自有連線池，並統一重試／退避策略、逾時與請求標頭設定，
+同時記錄各主機的請求延遲與連線重用次數。
+
+requests/urllib3 只支援 HTTP/1.1，因此以持久連線避免重複的 TCP+TLS 握手。
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 預設設定（可用環境變數覆寫）
+DEFAULT_POOL_CONNECTIONS = 16     # 保留連線池的主機數
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5             # 重試間隔：0.5 秒、1 秒、2 秒...
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 15.0
+
+# 需要重試的 HTTP 狀態碼
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# 請求標頭設定檔
+HEADER_PROFILES: Dict[str, Dict[str, str]] = {
+    "browser": {
+        "User-Agent": _BROWSER_USER_AGENT,
+        "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.8",
+    },
+    "json": {
+        "User-Agent": _BROWSER_USER_AGENT,
+        "Accept": "application/json",
+        "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.8",
+    },
+    "twse": {
+        "User-Agent": _BROWSER_USER_AGENT,
+        "Accept": "application/json",
+        "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.8",
+        "Referer": "https://www.twse.com.tw/",
+    },
+}
+
+
+def _default_pool_maxsize() -> int:
+    """
+    每個主機保留的連線數預設值：依同一主機可能同時送出的請求數決定。
+
+    gunicorn 每個 worker 有 GUNICORN_THREADS 個請求執行緒（預設 16），
+    批次訊號查詢以 SIGNALS_BATCH_WORKERS（預設 8）個執行緒各自以 TWSE_MAX_WORKERS（預設 4）
+    個執行緒逐月抓取證交所資料；連線數低於並行數時多出的連線用完即關閉，無法重用。
+    """
+    threads = int(os.environ.get("GUNICORN_THREADS", 16))
+    batch_workers = int(os.environ.get("SIGNALS_BATCH_WORKERS", 8))
+    twse_workers = int(os.environ.get("TWSE_MAX_WORKERS", 4))
+    return max(threads, batch_workers * twse_workers)
+
+
+class HttpClient:
+    """
+    行程層級共用的 HTTP 用戶端（執行緒安全）。
+
+    以單一 requests.Session 送出所有請求，urllib3 依主機維護連線池；
+    傳輸層錯誤與 RETRY_STATUS_CODES 依指數退避自動重試（僅 GET）。
+    受限流器控制的請求應以 retry=False 送出，由呼叫端在取得下一個額度後再重試，
+    否則傳輸層的重試不會計入額度（429 時立即重送更會違反上游的請求限制）。
+    """
+
+    def __init__(
+        self,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: Optional[int] = None,
+        retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+    ):
+        """
+        Args:
+            pool_connections: 保留連線池的主機數，None 時使用 HTTP_POOL_CONNECTIONS 環境變數或預設值
+            pool_maxsize: 每個主機的連線數，None 時使用 HTTP_POOL_MAXSIZE 環境變數或依並行設定計算的預設值
+            retries: 重試次數，None 時使用 HTTP_RETRIES 環境變數或預設值
+            backoff: 退避係數（秒），None 時使用 HTTP_BACKOFF 環境變數或預設值
+            connect_timeout: 連線逾時秒數，None 時使用 HTTP_CONNECT_TIMEOUT 環境變數或預設值
+            read_timeout: 預設讀取逾時秒數，None 時使用 HTTP_READ_TIMEOUT 環境變數或預設值
+        """
+        if pool_connections is None:
+            pool_connections = int(os.environ.get("HTTP_POOL_CONNECTIONS", DEFAULT_POOL_CONNECTIONS))
+        if pool_maxsize is None:
+            pool_maxsize = int(os.environ.get("HTTP_POOL_MAXSIZE", _default_pool_maxsize()))
+        if retries is None:
+            retries = int(os.environ.get("HTTP_RETRIES", DEFAULT_RETRIES))
+        if backoff is None:
+            backoff = float(os.environ.get("HTTP_BACKOFF", DEFAULT_BACKOFF))
+        if connect_timeout is None:
+            connect_timeout = float(os.environ.get("HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT))
+        if read_timeout is None:
+            read_timeout = float(os.environ.get("HTTP_READ_TIMEOUT", DEFAULT_READ_TIMEOUT))
+
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        retry_strategy = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+            # 重試用盡時返回最後的回應，由呼叫端 raise_for_status() 取得實際狀態碼
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry_strategy,
+            pool_block=False,
+        )
+        self._session = requests.Session()
+        self._session.mount("https://", self._adapter)
+        self._session.mount("http://", self._adapter)
+
+        # 不重試的請求（受限流器控制）使用另一組連線池
+        self._no_retry_adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(total=0, raise_on_status=False),
+            pool_block=False,
+        )
+        self._no_retry_session = requests.Session()
+        self._no_retry_session.mount("https://", self._no_retry_adapter)
+        self._no_retry_session.mount("http://", self._no_retry_adapter)
+
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _host_stats(self, host: str) -> Dict:
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = {"requests": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0}
+            self._stats[host] = stats
+        return stats
+
+    def _record(self, host: str, elapsed: float, response: Optional[requests.Response]) -> None:
+        elapsed_ms = elapsed * 1000
+        retries = 0
+        if response is not None:
+            history = getattr(getattr(response.raw, "retries", None), "history", None)
+            retries = len(history) if history else 0
+        with self._lock:
+            stats = self._host_stats(host)
+            stats["requests"] += 1
+            stats["retries"] += retries
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            if response is None or response.status_code >= 400:
+                stats["errors"] += 1
+
+    def get(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        profile: str = "browser",
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        retry: bool = True,
+    ) -> requests.Response:
+        """
+        送出 GET 請求。
+
+        Args:
+            url: 請求網址
+            params: 查詢參數
+            profile: 標頭設定檔名稱（HEADER_PROFILES 的 key）
+            headers: 額外的標頭（覆寫設定檔中的同名標頭）
+            timeout: 讀取逾時秒數，None 時使用預設值（連線逾時固定為 connect_timeout）
+            retry: 是否在傳輸層自動重試；受限流器控制的請求應設為 False，由呼叫端取得額度後重試
+
+        Returns:
+            requests.Response（狀態碼由呼叫端檢查）
+
+        Raises:
+            requests.RequestException: 連線失敗、逾時或重試用盡
+        """
+        request_headers = dict(HEADER_PROFILES[profile])
+        if headers:
+            request_headers.update(headers)
+        read_timeout = self.read_timeout if timeout is None else timeout
+
+        host = urlparse(url).netloc
+        response = None
+        start = time.perf_counter()
+        try:
+            session = self._session if retry else self._no_retry_session
+            response = session.get(
+                url,
+                params=params,
+                headers=request_headers,
+                timeout=(self.connect_timeout, read_timeout),
+            )
+            return response
+        finally:
+            self._record(host, time.perf_counter() - start, response)
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        取得各主機的請求統計。
+
+        Returns:
+            字典，key 為主機名稱，value 包含 requests, errors, retries, avg_ms, max_ms,
+            new_connections（建立的連線數）, reused（重用既有連線的請求數）
+        """
+        # urllib3 的連線池記錄了建立的連線數與送出的請求數（含重試）
+        connections: Dict[str, Dict[str, int]] = {}
+        for adapter in (self._adapter, self._no_retry_adapter):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+                entry = connections.setdefault(host, {"new_connections": 0, "attempts": 0})
+                entry["new_connections"] += pool.num_connections
+                entry["attempts"] += pool.num_requests
+
+        with self._lock:
+            snapshot = {host: dict(stats) for host, stats in self._stats.items()}
+
+        result = {}
+        for host, stats in snapshot.items():
+            total_ms = stats.pop("total_ms")
+            stats["avg_ms"] = round(total_ms / stats["requests"], 1) if stats["requests"] else None
+            stats["max_ms"] = round(stats["max_ms"], 1)
+            pool_stats = connections.get(host, {"new_connections": 0, "attempts": 0})
+            stats["new_connections"] = pool_stats["new_connections"]
+            stats["reused"] = max(pool_stats["attempts"] - pool_stats["new_connections"], 0)
+            result[host] = stats
+        return result
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """取得行程層級共用的 HttpClient 實例"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,417 @@
+"""
+每日市場快照模組
+以交易日為鍵，保存合併後的上市/上櫃全市場資料（已計算週轉率並排序）。
+請求直接從記憶體讀取，盤後由背景執行緒更新，並寫入磁碟以便重啟後沿用。
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+# 添加父目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import scraper
+from modules.turnover_rank import add_rank_columns, market_positions
+
+logger = logging.getLogger(__name__)
+
+TAIPEI_TZ = ZoneInfo("Asia/Taipei")
+
+# 快照檔路徑（可用環境變數覆寫）
+DEFAULT_SNAPSHOT_PATH = Path(__file__).parent.parent / "cache" / "market_snapshot.json"
+# 盤後資料通常在此時間（台北時間）之後才會更新完成
+DEFAULT_REFRESH_AFTER = "15:00"
+# 快照過期（更新失敗或上游尚未發布新資料）時，至少間隔此秒數才再次嘗試
+REFRESH_RETRY_SECONDS = 300
+# 盤後排程更新取得的仍是舊資料時，在此秒數內持續重試（超過後等下一次盤後更新，例如國定假日）
+REFRESH_RETRY_WINDOW = 4 * 3600
+
+SNAPSHOT_COLUMNS = ["code", "name", "close", "turnover", "chg_pct", "market", "volume"]
+# get_top_n() 等切片返回的欄位（與現有系統格式一致）
+TOP_N_COLUMNS = ["code", "name", "turnover", "close", "chg_pct"]
+
+
+def _refresh_after_time():
+    hour, minute = os.environ.get("MARKET_SNAPSHOT_REFRESH_AFTER", DEFAULT_REFRESH_AFTER).split(":")
+    return int(hour), int(minute)
+
+
+def expected_trading_date(now: Optional[datetime] = None) -> str:
+    """
+    取得目前應該使用的快照交易日。
+
+    平日超過盤後更新時間時為當天，否則往前找最近一個平日。
+    國定假日無法從時鐘判斷，快照實際的交易日以資料本身的日期為準（見 MarketSnapshotStore.refresh）。
+
+    Args:
+        now: 目前時間（預設為台北時間現在）
+
+    Returns:
+        交易日字串（YYYY-MM-DD）
+    """
+    if now is None:
+        now = datetime.now(TAIPEI_TZ)
+    hour, minute = _refresh_after_time()
+    day = now.date()
+    if (now.hour, now.minute) < (hour, minute):
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.isoformat()
+
+
+def retry_window_passed(trading_date: str, now: Optional[datetime] = None) -> bool:
+    """
+    某交易日的盤後更新重試時限（盤後更新時間 + REFRESH_RETRY_WINDOW）是否已過。
+
+    時限過後上游仍沒有該日資料時，視為該日沒有開盤（國定假日），不再持續重試。
+
+    Args:
+        trading_date: 預期的交易日（YYYY-MM-DD）
+        now: 目前時間（預設為台北時間現在）
+    """
+    if now is None:
+        now = datetime.now(TAIPEI_TZ)
+    hour, minute = _refresh_after_time()
+    day = datetime.strptime(trading_date, "%Y-%m-%d")
+    refresh_at = datetime(day.year, day.month, day.day, hour, minute, tzinfo=TAIPEI_TZ)
+    return now >= refresh_at + timedelta(seconds=REFRESH_RETRY_WINDOW)
+
+
+def next_refresh_time(now: Optional[datetime] = None) -> datetime:
+    """取得下一次盤後更新的時間（台北時間，平日）"""
+    if now is None:
+        now = datetime.now(TAIPEI_TZ)
+    hour, minute = _refresh_after_time()
+    candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+class MarketSnapshotStore:
+    """
+    每日市場快照（執行緒安全）。
+
+    快照的交易日取自上游資料本身的日期。快照不早於 expected_trading_date() 時直接從記憶體返回；
+    過期時若已有舊快照則先返回舊資料並在背景更新，完全沒有快照時才同步抓取。
+    上游尚未發布新資料時保留原本的快照與交易日，之後再重試；超過重試時限仍沒有新資料時
+    （國定假日）該預期交易日視為已更新，當天不再於背景重新抓取。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 快照 JSON 路徑，None 時使用 MARKET_SNAPSHOT_PATH 環境變數或預設路徑
+        """
+        if path is None:
+            path = os.environ.get("MARKET_SNAPSHOT_PATH", str(DEFAULT_SNAPSHOT_PATH))
+        self.path = Path(path)
+        self._df: Optional[pd.DataFrame] = None
+        self._market_positions: Dict[str, np.ndarray] = {}
+        self._trading_date: Optional[str] = None
+        # 交易日是否取自資料本身（舊版快照檔以時鐘推算，同一天的新資料仍可取代）
+        self._date_from_payload = False
+        # 重試時限過後上游仍沒有新資料的預期交易日（國定假日），當天不再視為過期
+        self._settled_date: Optional[str] = None
+        self._fetched_at: Optional[float] = None
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._scheduler: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[str, pd.DataFrame], None]] = []
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            df = pd.DataFrame(data.get("records", []), columns=SNAPSHOT_COLUMNS)
+            df["code"] = df["code"].astype(str)
+            self._df = add_rank_columns(df)
+            self._market_positions = market_positions(self._df)
+            self._trading_date = data.get("trading_date")
+            self._date_from_payload = bool(data.get("date_from_payload"))
+            self._fetched_at = data.get("fetched_at")
+        except (OSError, ValueError) as e:
+            logger.warning(f"讀取市場快照失敗（{self.path}）: {str(e)}")
+
+    def _save(self, df: pd.DataFrame, trading_date: str, fetched_at: float, date_from_payload: bool) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            payload = {
+                "trading_date": trading_date,
+                "date_from_payload": date_from_payload,
+                "fetched_at": fetched_at,
+                "records": json.loads(df[SNAPSHOT_COLUMNS].to_json(orient="records", force_ascii=False)),
+            }
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"寫入市場快照失敗（{self.path}）: {str(e)}")
+
+    def _is_fresh(self) -> bool:
+        if self._trading_date is None:
+            return False
+        expected = expected_trading_date()
+        return self._trading_date >= expected or self._settled_date == expected
+
+    def refresh(self) -> pd.DataFrame:
+        """
+        重新抓取全市場資料並更新快照（同一時間只會有一個更新在進行）。
+
+        快照的交易日取自資料本身的日期；資料日期不比目前快照新時（上游尚未更新或假日）
+        不會取代快照，也不會通知監聽者。
+
+        Returns:
+            更新後的全市場 DataFrame（沒有新資料時為原本的快照）
+        """
+        return self._refresh()[0]
+
+    def _current(self) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        with self._lock:
+            return self._df, self._trading_date
+
+    def _refresh(self) -> Tuple[pd.DataFrame, str]:
+        with self._refresh_lock:
+            self._last_attempt = time.time()
+            # 等待鎖的期間可能已由其他執行緒更新完成
+            if self._df is not None and self._is_fresh():
+                return self._current()
+
+            universe = scraper.fetch_market_universe()
+            trading_date = universe.attrs.get("trading_date")
+            date_from_payload = trading_date is not None
+            if not date_from_payload:
+                trading_date = expected_trading_date()
+                logger.warning(f"市場資料沒有日期欄位，以 {trading_date} 作為快照交易日")
+            if self._df is not None and self._trading_date is not None and (
+                trading_date < self._trading_date
+                or (trading_date == self._trading_date and self._date_from_payload)
+            ):
+                expected = expected_trading_date()
+                if retry_window_passed(expected):
+                    # 國定假日：當天不再重試，下一個交易日的盤後更新時才會再次抓取
+                    self._settled_date = expected
+                    logger.info(f"上游資料仍為 {trading_date}，{expected} 應為休市日，保留現有快照")
+                else:
+                    logger.info(f"上游資料仍為 {trading_date}，保留現有快照（{self._trading_date}），稍後重試")
+                return self._current()
+
+            # 排名、百分位數與市場內相對指標在更新時計算一次，之後的查詢都只是切片
+            df = add_rank_columns(universe[SNAPSHOT_COLUMNS])
+            positions = market_positions(df)
+            fetched_at = time.time()
+            with self._lock:
+                self._df = df
+                self._market_positions = positions
+                self._trading_date = trading_date
+                self._date_from_payload = date_from_payload
+                self._fetched_at = fetched_at
+            self._save(df, trading_date, fetched_at, date_from_payload)
+            logger.info(f"市場快照已更新（{trading_date}），共 {len(df)} 檔")
+            # 以時鐘推算的日期可能是沒有開盤的日子，不通知監聽者（例如不寫入熱度歷史）
+            if date_from_payload:
+                self._notify(trading_date, df)
+            return df, trading_date
+
+    def _notify(self, trading_date: str, df: pd.DataFrame) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback(trading_date, df)
+            except Exception as e:
+                logger.warning(f"市場快照更新通知失敗: {str(e)}")
+
+    def add_refresh_listener(self, callback: Callable[[str, pd.DataFrame], None], replay: bool = True) -> None:
+        """
+        註冊快照更新後的回呼函式（在更新的執行緒中呼叫，失敗只記錄警告）。
+        只有交易日取自資料本身的快照才會通知，trading_date 一定是實際的交易日。
+
+        Args:
+            callback: callback(trading_date, universe_df)；呼叫端不應修改 universe_df
+            replay: 是否立即以目前已有的快照呼叫一次
+        """
+        with self._lock:
+            self._listeners.append(callback)
+            df, trading_date = self._df, self._trading_date
+            date_from_payload = self._date_from_payload
+        if replay and df is not None and trading_date and date_from_payload:
+            try:
+                callback(trading_date, df)
+            except Exception as e:
+                logger.warning(f"市場快照更新通知失敗: {str(e)}")
+
+    def _refresh_in_background(self) -> None:
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"背景更新市場快照失敗: {str(e)}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get_universe_with_date(self) -> Tuple[pd.DataFrame, str]:
+        """
+        取得目前的全市場快照與其交易日（同一次讀取，兩者必定對應）。
+
+        以交易日作為快取鍵時應使用此方法，避免讀取資料與交易日之間剛好遇到背景更新。
+
+        Returns:
+            (全市場 DataFrame, 交易日字串)；DataFrame 的內容同 get_universe()
+        """
+        self.start_scheduler()
+        with self._lock:
+            df, trading_date = self._df, self._trading_date
+            is_fresh = self._is_fresh()
+
+        if df is None:
+            return self._refresh()
+        if (
+            not is_fresh
+            and not self._refresh_lock.locked()
+            and time.time() - self._last_attempt > REFRESH_RETRY_SECONDS
+        ):
+            self._last_attempt = time.time()
+            self._refresh_in_background()
+        return df, trading_date
+
+    def get_universe(self) -> pd.DataFrame:
+        """
+        取得目前的全市場快照（依週轉率由高到低排序）。
+
+        Returns:
+            DataFrame，包含 code, name, close, turnover, chg_pct, market, volume（成交股數）欄位，
+            以及 turnover_rank, turnover_pct, market_rank, market_pct, turnover_vs_market
+            （見 turnover_rank.add_rank_columns）；呼叫端不應修改返回的 DataFrame
+        """
+        return self.get_universe_with_date()[0]
+
+    def get_top_n_with_date(self, top_n: Optional[int] = None) -> Tuple[pd.DataFrame, str]:
+        """
+        取得週轉率前 N 名與其快照交易日（同一次讀取，兩者必定對應）。
+
+        Args:
+            top_n: 取前 N 檔，None 表示全部
+
+        Returns:
+            (DataFrame（code, name, turnover, close, chg_pct 欄位）, 交易日字串)
+        """
+        df, trading_date = self.get_universe_with_date()
+        if top_n:
+            df = df.head(top_n)
+        return df[TOP_N_COLUMNS].copy(), trading_date
+
+    def get_top_n(self, top_n: Optional[int] = None) -> pd.DataFrame:
+        """
+        取得週轉率前 N 名（從同一份快照切片）。
+
+        Args:
+            top_n: 取前 N 檔，None 表示全部
+
+        Returns:
+            DataFrame，包含 code, name, turnover, close, chg_pct 欄位
+        """
+        return self.get_top_n_with_date(top_n)[0]
+
+    def get_top_percentile(self, min_pct: float) -> pd.DataFrame:
+        """
+        取得週轉率全市場百分位數不低於門檻的股票（快照已排序，以二分搜尋找出切點）。
+
+        Args:
+            min_pct: 百分位數門檻（0-100）
+
+        Returns:
+            DataFrame，包含 code, name, turnover, close, chg_pct, turnover_pct 欄位
+        """
+        df = self.get_universe()
+        # turnover_pct 隨排名遞減，取負值後為遞增（缺值在最後）
+        count = int(np.searchsorted(-df["turnover_pct"].to_numpy(dtype=float), -min_pct, side="right"))
+        return df.iloc[:count][TOP_N_COLUMNS + ["turnover_pct"]].copy()
+
+    def get_market_top_n(self, market: str, top_n: Optional[int] = None) -> pd.DataFrame:
+        """
+        取得單一市場（上市/上櫃）的週轉率前 N 名。
+
+        Args:
+            market: 市場名稱（"上市" 或 "上櫃"）
+            top_n: 取前 N 檔，None 表示全部
+
+        Returns:
+            DataFrame，包含 code, name, turnover, close, chg_pct 欄位
+        """
+        df = self.get_universe()
+        with self._lock:
+            # 取得快照後可能剛好更新，位置需與同一份快照對應
+            positions_by_market = self._market_positions if self._df is df else None
+        if positions_by_market is None:
+            positions_by_market = market_positions(df)
+        positions = positions_by_market.get(market)
+        if positions is None or len(positions) == 0:
+            return pd.DataFrame(columns=TOP_N_COLUMNS)
+        if top_n:
+            positions = positions[:top_n]
+        return df.iloc[positions][TOP_N_COLUMNS].reset_index(drop=True)
+
+    def info(self) -> dict:
+        """取得快照狀態（交易日、抓取時間、檔數）"""
+        with self._lock:
+            return {
+                "trading_date": self._trading_date,
+                "fetched_at": self._fetched_at,
+                "total_stocks": len(self._df) if self._df is not None else 0,
+            }
+
+    def start_scheduler(self) -> None:
+        """啟動盤後自動更新的背景執行緒（每個行程只會啟動一次）"""
+        if os.environ.get("MARKET_SNAPSHOT_BACKGROUND_REFRESH", "1") == "0":
+            return
+        with self._lock:
+            if self._scheduler is not None:
+                return
+
+            def loop():
+                while True:
+                    wait = (next_refresh_time() - datetime.now(TAIPEI_TZ)).total_seconds()
+                    time.sleep(max(wait, 1))
+                    # 上游可能晚於排程時間才發布；取得的仍是舊資料或失敗時在時限內重試
+                    deadline = time.time() + REFRESH_RETRY_WINDOW
+                    while True:
+                        try:
+                            self.refresh()
+                        except Exception as e:
+                            logger.warning(f"盤後更新市場快照失敗: {str(e)}")
+                        if self._is_fresh() or time.time() + REFRESH_RETRY_SECONDS > deadline:
+                            break
+                        time.sleep(REFRESH_RETRY_SECONDS)
+
+            self._scheduler = threading.Thread(target=loop, daemon=True)
+            self._scheduler.start()
+
+
+_store: Optional[MarketSnapshotStore] = None
+_store_lock = threading.Lock()
+
+
+def get_market_snapshot_store() -> MarketSnapshotStore:
+    """取得行程層級共用的 MarketSnapshotStore 實例"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MarketSnapshotStore()
+        return _store
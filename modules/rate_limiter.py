@@ -0,0 +1,84 @@
+"""
+請求頻率限制模組
+提供行程（process）層級共用的 Token Bucket 限流器，讓多個執行緒共同遵守上游 API 的請求額度。
+"""
+
+import threading
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """
+    執行緒安全的 Token Bucket 限流器。
+
+    以固定速率補充 token，最多累積 capacity 個；每次送出請求前呼叫 acquire()
+    取得一個 token，token 不足時阻塞等待，因此長期平均速率不會超過 rate。
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Args:
+            rate: 每秒補充的 token 數（平均每秒允許的請求數）
+            capacity: 最多可累積的 token 數（允許的瞬間突發請求數）
+        """
+        if rate <= 0:
+            raise ValueError("rate 必須大於 0")
+        self.rate = float(rate)
+        self.capacity = max(float(capacity), 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        取得 token，不足時阻塞直到補足。
+
+        Args:
+            tokens: 要取得的 token 數
+
+        Returns:
+            實際等待的秒數
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+# 行程層級的限流器登錄表（以名稱區分，例如上游主機名稱）
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, rate: float, capacity: float = 1.0) -> TokenBucket:
+    """
+    取得（或建立）指定名稱的共用限流器。
+
+    同一名稱在整個行程中只會有一個實例，第一次建立時的 rate/capacity 為準。
+
+    Args:
+        name: 限流器名稱
+        rate: 每秒允許的請求數
+        capacity: 允許的瞬間突發請求數
+
+    Returns:
+        TokenBucket 實例
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = TokenBucket(rate, capacity)
+            _limiters[name] = limiter
+        return limiter
@@ -9,9 +9,9 @@ import pandas as pd
 
 import sys
 import os
-# 添加當前目錄到路徑
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from theme_engine import get_stocks_in_theme, get_all_members_of_theme, get_today_members_of_theme
+# 添加父目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.theme_engine import as_theme_index, group_stocks_by_theme, get_today_members_of_theme
 
 
 def build_theme_report(
@@ -27,65 +27,30 @@ def build_theme_report(
         stocks_df: 股票 DataFrame
         theme_heat_df: 從 calc_theme_heat() 得到的熱度 DataFrame
         stock_to_themes: 從 map_stock_to_themes() 得到的對應關係
-        themes_data: 從 load_supply_chain_json() 載入的族群資料
+        themes_data: 族群資料（load_supply_chain_json() 的結果或 ThemeIndex）
 
     Returns:
         字典，包含：
         - summary: 摘要資訊
         - theme_heat_ranking: 族群熱度排行榜（DataFrame）
         - theme_details: 各族群的詳細資訊
+        - theme_stocks: 各族群在 Top N 中出現的股票（族群名稱 -> records 列表）
     """
     # 建立族群詳細資訊
     theme_details = {}
 
-    # 判斷是新格式還是舊格式
-    # 支援四種格式：
-    # 1. themes_new.json 格式（物件，有 themes 鍵）
-    # 2. 新格式（物件，有 popular_sectors 鍵）
-    # 3. 直接陣列格式（陣列，每個元素是族群物件）
-    # 4. 舊格式（物件，有 族群清單 鍵）
-    
-    sectors_list = None
-    if isinstance(themes_data, list):
-        # 直接陣列格式
-        sectors_list = themes_data
-    elif "themes" in themes_data:
-        # themes_new.json 格式（物件，有 themes 鍵）
-        themes_list = themes_data.get("themes", [])
-        # 轉換格式：將 theme 欄位轉為 sector_name，intro 轉為 description
-        sectors_list = []
-        for theme_info in themes_list:
-            if not isinstance(theme_info, dict):
-                continue
-            sector_info = {
-                "sector_name": theme_info.get("theme", ""),
-                "description": theme_info.get("description", ""),
-                "stocks": []
-            }
-            # 轉換 stocks：將 intro 轉為 description
-            stocks = theme_info.get("stocks", [])
-            if isinstance(stocks, list):
-                for stock in stocks:
-                    if isinstance(stock, dict):
-                        sector_info["stocks"].append({
-                            "ticker": stock.get("ticker", ""),
-                            "name": stock.get("name", ""),
-                            "description": stock.get("intro", "")  # intro 轉為 description
-                        })
-            sectors_list.append(sector_info)
-    elif "popular_sectors" in themes_data:
-        # 新格式（物件，有 popular_sectors 鍵）
-        sectors_list = themes_data.get("popular_sectors", [])
+    # 一次分組取得所有族群在 Top N 中實際出現的股票
+    theme_stocks_map = group_stocks_by_theme(stocks_df, stock_to_themes)
+
+    # 族群格式已由 ThemeIndex 正規化（見 theme_engine.normalize_sectors）
+    index = as_theme_index(themes_data)
     
-    if sectors_list is not None:
+    if not index.is_legacy:
         # 新格式或直接陣列格式
-        for sector_info in sectors_list:
+        for sector_info in index.sectors:
             sector_name = sector_info.get("sector_name", "")
             description = sector_info.get("description", "")
 
-            # 取得該族群在 Top N 中實際出現的股票
-            theme_stocks = get_stocks_in_theme(stocks_df, stock_to_themes, sector_name)
-
             # 整理供應鏈結構
             supply_chain = {}
             
@@ -136,23 +101,20 @@ def build_theme_report(
             theme_details[sector_name] = {
                 "description": description,
                 "supply_chain": supply_chain,
-                "stocks_in_topN": theme_stocks.to_dict("records") if not theme_stocks.empty else [],
+                "stocks_in_topN": theme_stocks_map.get(sector_name, []),
             }
     else:
         # 舊格式
-        for theme_info in themes_data.get("族群清單", []):
+        for theme_info in index.themes_data.get("族群清單", []):
             theme_name = theme_info.get("族群名稱", "")
 
-            # 取得該族群在 Top N 中實際出現的股票
-            theme_stocks = get_stocks_in_theme(stocks_df, stock_to_themes, theme_name)
-
             theme_details[theme_name] = {
                 "supply_chain": {
                     "上游": theme_info.get("上游", {}),
                     "中游": theme_info.get("中游", {}),
                     "下游": theme_info.get("下游", {}),
                 },
-                "stocks_in_topN": theme_stocks.to_dict("records") if not theme_stocks.empty else [],
+                "stocks_in_topN": theme_stocks_map.get(theme_name, []),
             }
 
     return {
@@ -162,6 +124,7 @@ def build_theme_report(
         },
         "theme_heat_ranking": theme_heat_df,
         "theme_details": theme_details,
+        "theme_stocks": theme_stocks_map,
     }
 
 
@@ -183,67 +146,55 @@ def get_theme_detail_for_display(
     Args:
         theme_name: 族群名稱
         today_df: 今日股票資料 DataFrame
-        themes_data: 從 load_supply_chain_json() 載入的族群資料
+        themes_data: 族群資料（load_supply_chain_json() 的結果或 ThemeIndex）
         stock_to_themes: 從 map_stock_to_themes() 得到的對應關係
 
     Returns:
         族群詳細資訊字典，若不存在則返回 None
     """
-    # 判斷格式
-    sectors_list = None
-    if isinstance(themes_data, list):
-        sectors_list = themes_data
-    elif "themes" in themes_data:
-        # themes_new.json 格式（物件，有 themes 鍵）
-        themes_list = themes_data.get("themes", [])
-        # 轉換格式：將 theme 欄位轉為 sector_name，intro 轉為 description
-        sectors_list = []
-        for theme_info in themes_list:
-            if not isinstance(theme_info, dict):
-                continue
-            sector_info = {
-                "sector_name": theme_info.get("theme", ""),
-                "description": theme_info.get("description", ""),
-                "stocks": []
-            }
-            # 轉換 stocks：將 intro 轉為 description
-            stocks = theme_info.get("stocks", [])
-            if isinstance(stocks, list):
-                for stock in stocks:
-                    if isinstance(stock, dict):
-                        sector_info["stocks"].append({
-                            "ticker": stock.get("ticker", ""),
-                            "name": stock.get("name", ""),
-                            "description": stock.get("intro", "")  # intro 轉為 description
-                        })
-            sectors_list.append(sector_info)
-    elif "popular_sectors" in themes_data:
-        sectors_list = themes_data.get("popular_sectors", [])
-    else:
+    index = as_theme_index(themes_data)
+    if index.is_legacy or not index.get_sector(theme_name):
+        # 舊格式不支援，或族群不存在
+        return None
+    
+    # 取得今日出現的股票
+    today_members = get_today_members_of_theme(theme_name, today_df, stock_to_themes)
+    
+    return build_theme_detail(theme_name, index, today_members)
+
+
+def build_theme_detail(
+    theme_name: str,
+    themes_data: Dict,
+    today_members: List[Dict],
+) -> Optional[Dict]:
+    """
+    以已整理好的今日成員組成族群詳細資訊（格式同 get_theme_detail_for_display）。
+
+    Args:
+        theme_name: 族群名稱
+        themes_data: 族群資料（load_supply_chain_json() 的結果或 ThemeIndex）
+        today_members: 該族群今日出現的股票（get_today_members_of_theme() 或
+            today_members_by_theme() 的結果）
+
+    Returns:
+        族群詳細資訊字典，若不存在則返回 None
+    """
+    index = as_theme_index(themes_data)
+    if index.is_legacy:
         # 舊格式，不支援
         return None
     
     # 尋找對應的族群
-    selected_sector = None
-    for sector_info in sectors_list:
-        if not isinstance(sector_info, dict):
-            continue
-        sector_name = sector_info.get("sector_name", "")
-        if sector_name == theme_name:
-            selected_sector = sector_info
-            break
-    
+    selected_sector = index.get_sector(theme_name)
     if not selected_sector:
         return None
     
     # 取得族群說明
     description = selected_sector.get("description", "")
     
-    # 取得今日出現的股票
-    today_members = get_today_members_of_theme(theme_name, today_df, stock_to_themes)
-    
     # 取得該族群所有股票
-    all_members = get_all_members_of_theme(theme_name, themes_data)
+    all_members = index.all_members(theme_name)
     
     return {
         "sector_name": theme_name,
@@ -251,4 +202,3 @@ def get_theme_detail_for_display(
         "today_members": today_members,
         "all_members": all_members
     }
-
@@ -1,9 +1,23 @@
+import json
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
 import re
-import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
+from urllib.parse import urlparse
+import sys
+import os
+
+# 添加父目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.http_client import get_http_client
+from modules.rate_limiter import get_rate_limiter
+from modules.turnover_rank import sort_by_turnover
+
+# 排行網頁數值欄位中需要移除的符號
+RANKING_NUMERIC_NOISE = ("%", ",", "+", "▲", "▼")
 
 def fetch_turnover_rank_data(top_n: Optional[int] = None) -> pd.DataFrame:
     """
@@ -11,12 +25,8 @@ def fetch_turnover_rank_data(top_n: Optional[int] = None) -> pd.DataFrame:
     URL: https://www.wantgoo.com/stock/ranking/turnover-rate
     """
     url = "https://www.wantgoo.com/stock/ranking/turnover-rate"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = get_http_client().get(url, timeout=15)
         response.raise_for_status()
         
         from io import StringIO
@@ -77,34 +87,21 @@ def fetch_turnover_rank_data(top_n: Optional[int] = None) -> pd.DataFrame:
         # 1. 代碼轉為 4 位字串
         df['code'] = df['code'].astype(str).str.zfill(4)
         
-        # 2. 數值欄位清理 (移除 %, ,, +, ▲, ▼)
-        def clean_numeric(val):
-            if pd.isna(val): return val
-            s = str(val)
-            s = s.replace('%', '').replace(',', '').replace('+', '')
-            s = s.replace('▲', '').replace('▼', '')
-            try:
-                return float(s)
-            except:
-                return 0.0
-
-        df['turnover'] = df['turnover'].apply(clean_numeric)
+        # 2. 數值欄位清理 (移除 %, ,, +, ▲, ▼；無法轉換的值視為 0)
+        df['turnover'] = clean_numeric_series(df['turnover'], remove=RANKING_NUMERIC_NOISE, invalid=0.0)
         
         if 'close' in df.columns:
-            df['close'] = df['close'].apply(clean_numeric)
+            df['close'] = clean_numeric_series(df['close'], remove=RANKING_NUMERIC_NOISE, invalid=0.0)
         else:
             df['close'] = 0.0
             
         if 'chg_pct' in df.columns:
-            df['chg_pct'] = df['chg_pct'].apply(clean_numeric)
+            df['chg_pct'] = clean_numeric_series(df['chg_pct'], remove=RANKING_NUMERIC_NOISE, invalid=0.0)
         else:
             df['chg_pct'] = 0.0
             
-        # 排序與篩選
-        df = df.sort_values('turnover', ascending=False).reset_index(drop=True)
-        
-        if top_n:
-            df = df.head(top_n)
+        # 排序與篩選（只取前 N 名時不需排序整份排行）
+        df = sort_by_turnover(df, top_n)
             
         return df[['code', 'name', 'turnover', 'close', 'chg_pct']]
 
@@ -121,12 +118,8 @@ def fetch_attention_stock_data() -> pd.DataFrame:
         DataFrame，包含 code, name, detail 欄位
     """
     url = "https://www.moneydj.com/Z/ZE/ZEV/ZEV.djhtm"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = get_http_client().get(url, timeout=15)
         response.raise_for_status()
         
         stocks = []
@@ -212,6 +205,103 @@ def fetch_attention_stock_data() -> pd.DataFrame:
         raise Exception(f"抓取注意股資料失敗: {str(e)}")
 
 
+# 官方 Open Data 來源
+TWSE_PRICE_URL = "https://openapi.twse.com.tw/v1/exchangeReport/STOCK_DAY_ALL"
+TWSE_CAPITAL_URL = "https://openapi.twse.com.tw/v1/opendata/t187ap03_L"
+TPEX_QUOTES_URL = "https://www.tpex.org.tw/web/stock/aftertrading/daily_close_quotes/stk_quote_result.php?l=zh-tw&o=json"
+
+# 每個 Open Data 主機的請求額度：平均每秒請求數與允許的瞬間突發量
+OPEN_DATA_RATE_LIMIT = float(os.environ.get("OPEN_DATA_RATE_LIMIT", 2.0))
+OPEN_DATA_RATE_BURST = float(os.environ.get("OPEN_DATA_RATE_BURST", 2))
+
+
+def _open_data_get_json(url: str):
+    """依主機取得請求額度後，透過共用 HTTP 用戶端抓取 JSON（不在傳輸層重試，每次請求都計入額度）"""
+    host = urlparse(url).netloc
+    get_rate_limiter(host, OPEN_DATA_RATE_LIMIT, OPEN_DATA_RATE_BURST).acquire()
+    response = get_http_client().get(url, profile="json", timeout=15, retry=False)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_twse_price_json() -> list:
+    """抓取上市股票當日股價與成交量（STOCK_DAY_ALL）原始 JSON"""
+    return _open_data_get_json(TWSE_PRICE_URL)
+
+
+def fetch_twse_capital_json() -> list:
+    """抓取上市公司基本資料（t187ap03_L，含已發行股數）原始 JSON"""
+    return _open_data_get_json(TWSE_CAPITAL_URL)
+
+
+def fetch_tpex_quotes_json() -> dict:
+    """抓取上櫃股票當日收盤行情（含成交量與發行股數）原始 JSON"""
+    return _open_data_get_json(TPEX_QUOTES_URL)
+
+
+def extract_tpex_rows(data: dict) -> list:
+    """
+    從 TPEx 收盤行情 JSON 取出資料列。
+    
+    支援兩種格式：tables[0]['data'] 或 aaData
+    """
+    if "tables" in data and len(data["tables"]) > 0 and "data" in data["tables"][0]:
+        return data["tables"][0]["data"]
+    elif "aaData" in data:
+        return data["aaData"]
+    else:
+        raise Exception("無法解析 TPEx API 資料結構")
+
+
+def parse_report_date(value) -> Optional[str]:
+    """
+    將 API 回傳的資料日期轉為 YYYY-MM-DD。
+
+    支援民國年（1131017、113/10/17）與西元年（20241017、2024/10/17、2024-10-17）格式。
+
+    Args:
+        value: 日期字串
+
+    Returns:
+        YYYY-MM-DD 字串，無法解析時返回 None
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    parts = re.split(r"[/\-]", text)
+    if len(parts) == 3 and all(part.isdigit() for part in parts):
+        year, month, day = (int(part) for part in parts)
+    elif text.isdigit() and len(text) in (7, 8):
+        year, month, day = int(text[:-4]), int(text[-4:-2]), int(text[-2:])
+    else:
+        return None
+    if year < 1911:
+        year += 1911
+    try:
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def extract_twse_trading_date(price_data: list) -> Optional[str]:
+    """從 STOCK_DAY_ALL 資料列的 Date 欄位取得資料日期（取最新的一天），沒有日期時返回 None"""
+    dates = {parse_report_date(row.get("Date")) for row in price_data if isinstance(row, dict)}
+    dates.discard(None)
+    return max(dates) if dates else None
+
+
+def extract_tpex_trading_date(data: dict) -> Optional[str]:
+    """從 TPEx 收盤行情 JSON 取得資料日期（date、tables[0].date 或 reportDate），沒有日期時返回 None"""
+    candidates = [data.get("date"), data.get("reportDate")]
+    if data.get("tables"):
+        candidates.insert(0, data["tables"][0].get("date"))
+    for value in candidates:
+        trading_date = parse_report_date(value)
+        if trading_date:
+            return trading_date
+    return None
+
+
 def clean_numeric(value):
     """
     嚴格清洗數值函式，確保數值轉換正確。
@@ -235,6 +325,54 @@ def clean_numeric(value):
         return None
 
 
+def clean_numeric_series(values, remove=(",", "--"), invalid=None) -> pd.Series:
+    """
+    整欄清洗數值（clean_numeric 的向量化版本）。
+
+    以 .str.replace 依序移除指定字元後，整欄交給 pd.to_numeric 轉換，
+    避免逐列呼叫 Python 函式。
+
+    Args:
+        values: Series 或可轉為 Series 的序列
+        remove: 依序移除的字串（預設與 clean_numeric 相同：逗號與 "--"）
+        invalid: 非空值但無法轉換時的填補值，None 表示保留 NaN
+
+    Returns:
+        數值 Series（原本的空值與無法轉換的值為 NaN，或以 invalid 填補）
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+
+    missing = series.isna()
+    text = series.astype(str)
+    for token in remove:
+        text = text.str.replace(token, "", regex=False)
+    result = pd.to_numeric(text.str.strip(), errors="coerce").mask(missing)
+
+    if invalid is not None:
+        result = result.mask(result.isna() & ~missing, invalid)
+    return result
+
+
+def calc_chg_pct(close: pd.Series, change: pd.Series) -> pd.Series:
+    """
+    由收盤價與漲跌價差計算漲跌幅（%）。
+
+    漲跌幅 = 漲跌 / (收盤價 - 漲跌) × 100，分母為前一日收盤價；
+    漲跌或收盤價缺值、前一日收盤價不為正數時為 NaN。
+
+    Args:
+        close: 收盤價 Series
+        change: 漲跌價差 Series（已清洗為數值）
+
+    Returns:
+        漲跌幅 Series
+    """
+    previous_close = close - change
+    return (change / previous_close * 100).where(previous_close > 0)
+
+
 def get_twse_df() -> pd.DataFrame:
     """
     獲取上市 (TWSE) 股票的週轉率資料。
@@ -246,21 +384,18 @@ def get_twse_df() -> pd.DataFrame:
     4. 計算週轉率
     
     Returns:
-        DataFrame，包含 code, name, turnover, close, chg_pct, market 欄位
+        DataFrame，包含 code, name, turnover, close, chg_pct, market, volume 欄位
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    }
-    
     # 標準欄位
-    STANDARD_COLUMNS = ['code', 'name', 'close', 'turnover', 'chg_pct', 'market']
+    STANDARD_COLUMNS = ['code', 'name', 'close', 'turnover', 'chg_pct', 'market', 'volume']
     
     try:
-        # 1. 抓取股價與成交量資料
-        price_url = "https://openapi.twse.com.tw/v1/exchangeReport/STOCK_DAY_ALL"
-        price_response = requests.get(price_url, headers=headers, timeout=15)
-        price_response.raise_for_status()
-        price_data = price_response.json()
+        # 1、2. 同時抓取股價/成交量與股本資料（兩個獨立的下載）
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            price_future = executor.submit(fetch_twse_price_json)
+            capital_future = executor.submit(fetch_twse_capital_json)
+            price_data = price_future.result()
+            capital_data = capital_future.result()
         
         if not price_data:
             raise Exception("無法從 TWSE API 取得股價資料")
@@ -277,14 +412,14 @@ def get_twse_df() -> pd.DataFrame:
         
         # 資料清洗
         price_df["code"] = price_df["code"].astype(str).str.strip().str.zfill(4)
-        price_df["TradeVolume"] = price_df["TradeVolume"].apply(clean_numeric)
-        price_df["ClosingPrice"] = price_df["ClosingPrice"].apply(clean_numeric)
-        
-        # 2. 抓取股本資料
-        capital_url = "https://openapi.twse.com.tw/v1/opendata/t187ap03_L"
-        capital_response = requests.get(capital_url, headers=headers, timeout=15)
-        capital_response.raise_for_status()
-        capital_data = capital_response.json()
+        price_df["TradeVolume"] = clean_numeric_series(price_df["TradeVolume"])
+        price_df["ClosingPrice"] = clean_numeric_series(price_df["ClosingPrice"])
+        # 漲跌價差（如 "+5.0000"、"-0.5000"）；"X" 開頭為除權息等非一般漲跌，與空值同樣視為缺值
+        if "Change" in price_df.columns:
+            change = clean_numeric_series(price_df["Change"], remove=(",", "+"))
+        else:
+            change = pd.Series(float("nan"), index=price_df.index)
+        price_df["chg_pct"] = calc_chg_pct(price_df["ClosingPrice"], change)
         
         if not capital_data:
             raise Exception("無法從 TWSE API 取得股本資料")
@@ -299,14 +434,14 @@ def get_twse_df() -> pd.DataFrame:
         
         # 資料清洗
         capital_df["code"] = capital_df["code"].astype(str).str.strip().str.zfill(4)
-        capital_df["IssuedShares"] = capital_df["IssuedShares"].apply(clean_numeric)
+        capital_df["IssuedShares"] = clean_numeric_series(capital_df["IssuedShares"])
         
         # 去重（保留第一筆）
         capital_df = capital_df.drop_duplicates(subset=["code"], keep="first")
         
         # 3. 合併資料
         merged_df = pd.merge(
-            price_df[["code", "name", "TradeVolume", "ClosingPrice"]],
+            price_df[["code", "name", "TradeVolume", "ClosingPrice", "chg_pct"]],
             capital_df[["code", "IssuedShares"]],
             on="code",
             how="inner"
@@ -337,11 +472,15 @@ def get_twse_df() -> pd.DataFrame:
             "name": merged_df["name"],
             "close": merged_df["ClosingPrice"],
             "turnover": merged_df["turnover"],
-            "chg_pct": None,  # TWSE API 沒有漲跌幅，設為 None
-            "market": "上市"
+            "chg_pct": merged_df["chg_pct"],
+            "market": "上市",
+            "volume": merged_df["TradeVolume"]  # 成交股數
         })
         
-        return result_df[STANDARD_COLUMNS]
+        result_df = result_df[STANDARD_COLUMNS]
+        # 資料本身的交易日（假日或尚未更新時為前一交易日）
+        result_df.attrs["trading_date"] = extract_twse_trading_date(price_data)
+        return result_df
         
     except requests.RequestException as e:
         raise Exception(f"TWSE API 連線錯誤: {str(e)}")
@@ -349,7 +488,7 @@ def get_twse_df() -> pd.DataFrame:
         raise Exception(f"處理 TWSE 資料時發生錯誤: {str(e)}")
 
 
-def get_tpex_df() -> pd.DataFrame:
+def get_tpex_df(payload=None) -> pd.DataFrame:
     """
     獲取上櫃 (TPEx) 股票的週轉率資料。
     
@@ -358,92 +497,86 @@ def get_tpex_df() -> pd.DataFrame:
     2. 資料清洗
     3. 計算週轉率
     
+    Args:
+        payload: 已取得的收盤行情（bytes/str 原始 JSON 或已解析的 dict），
+                 None 時從 TPEx API 抓取；可用於以錄製的資料離線測試
+    
     Returns:
-        DataFrame，包含 code, name, turnover, close, chg_pct, market 欄位
+        DataFrame，包含 code, name, turnover, close, chg_pct, market, volume 欄位
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    }
-    
     # 標準欄位
-    STANDARD_COLUMNS = ['code', 'name', 'close', 'turnover', 'chg_pct', 'market']
+    STANDARD_COLUMNS = ['code', 'name', 'close', 'turnover', 'chg_pct', 'market', 'volume']
     
     try:
         # 抓取資料
-        url = "https://www.tpex.org.tw/web/stock/aftertrading/daily_close_quotes/stk_quote_result.php?l=zh-tw&o=json"
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        data = response.json()
+        if payload is None:
+            data = fetch_tpex_quotes_json()
+        elif isinstance(payload, (bytes, bytearray, str)):
+            data = json.loads(payload)
+        else:
+            data = payload
         
         if not data:
             raise Exception("無法從 TPEx API 取得資料")
         
-        # 解析 JSON 結構
-        # 支援兩種格式：tables[0]['data'] 或 aaData
-        if "tables" in data and len(data["tables"]) > 0 and "data" in data["tables"][0]:
-            rows = data["tables"][0]["data"]
-        elif "aaData" in data:
-            rows = data["aaData"]
-        else:
-            raise Exception("無法解析 TPEx API 資料結構")
+        rows = extract_tpex_rows(data)
         
         if not rows:
             raise Exception("TPEx API 回傳的資料為空")
         
-        # 解析資料
-        stocks = []
-        for row in rows:
-            if not row or len(row) < 16:
-                continue
-            
-            # 索引對應：
-            # Index 0: 股票代號
-            # Index 1: 股票名稱
-            # Index 2: 收盤價
-            # Index 8: 成交量（股數）
-            # Index 15: 發行股數（股數）
-            
-            code = str(row[0]).strip()
-            name = str(row[1]).strip()
-            
-            # 只保留 4 碼代號
-            if len(code) != 4 or not code.isdigit():
-                continue
-            
-            # 移除 HTML 標籤（如果有）
-            name = re.sub(r'<[^>]+>', '', name)
-            
-            # 數值清洗
-            close = clean_numeric(row[2])
-            volume = clean_numeric(row[8])
-            issued_shares = clean_numeric(row[15])
-            
-            # 過濾條件：成交量 >= 500,000 股（500 張）
-            if volume is None or volume < 500000:
-                continue
-            
-            # 計算週轉率
-            if issued_shares and issued_shares > 0:
-                turnover = (volume / issued_shares) * 100
-                
-                # 移除無效的週轉率
-                if pd.isna(turnover) or turnover == float('inf') or turnover < 0:
-                    continue
-                
-                stocks.append({
-                    "code": code.zfill(4),
-                    "name": name,
-                    "close": close,
-                    "turnover": turnover,
-                    "chg_pct": None,  # TPEx API 沒有漲跌幅，設為 None
-                    "market": "上櫃"
-                })
+        # 直接載入為 DataFrame，以欄位運算解析（欄數不足的列會補上空值）
+        # 索引對應：
+        # Index 0: 股票代號
+        # Index 1: 股票名稱
+        # Index 2: 收盤價
+        # Index 3: 漲跌（價差）
+        # Index 8: 成交量（股數）
+        # Index 15: 發行股數（股數）
+        raw_df = pd.DataFrame(rows)
+        if raw_df.shape[1] < 16:
+            raise Exception("無法從 TPEx API 資料中提取有效股票")
         
-        if not stocks:
+        # 過濾條件：只保留 4 碼代號、成交量 >= 500,000 股（500 張）
+        # （先以代號與成交量縮小範圍，其餘欄位只清洗留下的列）
+        code = raw_df[0].astype(str).str.strip()
+        raw_df = raw_df[code.str.fullmatch(r"\d{4}")]
+        volume = clean_numeric_series(raw_df[8])
+        raw_df = raw_df[volume >= 500000]
+        volume = volume[raw_df.index]
+        
+        # 計算週轉率
+        issued_shares = clean_numeric_series(raw_df[15])
+        turnover = (volume / issued_shares) * 100
+        
+        # 移除無效的週轉率
+        valid = (
+            (issued_shares > 0)
+            & turnover.notna()
+            & (turnover != float('inf'))
+            & (turnover >= 0)
+        )
+        raw_df = raw_df[valid]
+        
+        if raw_df.empty:
             raise Exception("無法從 TPEx API 資料中提取有效股票")
         
-        result_df = pd.DataFrame(stocks)
-        return result_df[STANDARD_COLUMNS]
+        close = clean_numeric_series(raw_df[2])
+        # 漲跌價差（如 "+0.50"、"-1.20"；"除息" 等非數值視為缺值）
+        change = clean_numeric_series(raw_df[3], remove=(",", "+"))
+        result_df = pd.DataFrame({
+            "code": code[raw_df.index],
+            # 移除 HTML 標籤（如果有）
+            "name": raw_df[1].astype(str).str.strip().str.replace(r'<[^>]+>', '', regex=True),
+            "close": close,
+            "turnover": turnover[raw_df.index],
+            "chg_pct": calc_chg_pct(close, change),
+            "market": "上櫃",
+            "volume": volume[raw_df.index]  # 成交股數
+        }).reset_index(drop=True)
+        result_df = result_df[STANDARD_COLUMNS]
+        # 資料本身的交易日（假日或尚未更新時為前一交易日）
+        result_df.attrs["trading_date"] = extract_tpex_trading_date(data)
+        return result_df
         
     except requests.RequestException as e:
         raise Exception(f"TPEx API 連線錯誤: {str(e)}")
@@ -451,39 +584,35 @@ def get_tpex_df() -> pd.DataFrame:
         raise Exception(f"處理 TPEx 資料時發生錯誤: {str(e)}")
 
 
-def fetch_turnover_from_api(top_n: Optional[int] = 50) -> pd.DataFrame:
+def fetch_market_universe() -> pd.DataFrame:
     """
-    從 TWSE 和 TPEx API 抓取資料並計算週轉率，合併後返回排名前 N 名。
+    從 TWSE 和 TPEx API 抓取當日全市場資料並計算週轉率。
     
-    這是主要的入口函式，會：
-    1. 獲取上市資料
-    2. 獲取上櫃資料
-    3. 合併兩個市場的資料
-    4. 排序並取前 N 名
-    
-    Args:
-        top_n: 要返回的前 N 名（預設 50）
+    會同時獲取上市與上櫃資料、合併後依週轉率由高到低排序。
     
     Returns:
-        DataFrame，包含 code, name, turnover, close, chg_pct, market 欄位
+        DataFrame，包含 code, name, close, turnover, chg_pct, market, volume 欄位（全市場，已排序）；
+        attrs["trading_date"] 為資料本身的交易日（兩個市場日期不同時取較舊者，都沒有日期時為 None）
     """
     twse_df = None
     tpex_df = None
     
-    # 獲取上市資料
-    try:
-        twse_df = get_twse_df()
-    except Exception as e:
-        print(f"⚠️ 獲取上市資料失敗: {str(e)}")
-    
-    # 延遲 1 秒，避免 API 請求過於頻繁
-    time.sleep(1)
-    
-    # 獲取上櫃資料
-    try:
-        tpex_df = get_tpex_df()
-    except Exception as e:
-        print(f"⚠️ 獲取上櫃資料失敗: {str(e)}")
+    # 上市與上櫃資料來自不同主機，同時抓取（請求頻率由各主機的限流器控制）
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        twse_future = executor.submit(get_twse_df)
+        tpex_future = executor.submit(get_tpex_df)
+        
+        # 獲取上市資料
+        try:
+            twse_df = twse_future.result()
+        except Exception as e:
+            print(f"⚠️ 獲取上市資料失敗: {str(e)}")
+        
+        # 獲取上櫃資料
+        try:
+            tpex_df = tpex_future.result()
+        except Exception as e:
+            print(f"⚠️ 獲取上櫃資料失敗: {str(e)}")
     
     # 合併資料
     if twse_df is not None and tpex_df is not None:
@@ -495,8 +624,30 @@ def fetch_turnover_from_api(top_n: Optional[int] = 50) -> pd.DataFrame:
     else:
         raise Exception("無法從 TWSE 或 TPEx API 取得任何資料")
     
-    # 排序與篩選
-    combined_df = combined_df.sort_values("turnover", ascending=False).reset_index(drop=True)
+    # 排序
+    dates = [df.attrs.get("trading_date") for df in (twse_df, tpex_df) if df is not None]
+    dates = [trading_date for trading_date in dates if trading_date]
+    result_df = sort_by_turnover(combined_df)
+    # 其中一個市場尚未更新時以較舊的日期為準，之後重新抓取時才會視為新的交易日
+    result_df.attrs["trading_date"] = min(dates) if dates else None
+    return result_df
+
+
+def fetch_turnover_from_api(top_n: Optional[int] = 50) -> pd.DataFrame:
+    """
+    從 TWSE 和 TPEx API 抓取資料並計算週轉率，合併後返回排名前 N 名。
+    
+    這是主要的入口函式，會：
+    1. 獲取上市與上櫃資料並合併（fetch_market_universe）
+    2. 取前 N 名
+    
+    Args:
+        top_n: 要返回的前 N 名（預設 50）
+    
+    Returns:
+        DataFrame，包含 code, name, turnover, close, chg_pct 欄位
+    """
+    combined_df = fetch_market_universe()
     
     if top_n:
         combined_df = combined_df.head(top_n)
@@ -0,0 +1,217 @@
+"""
+證券主檔模組
+由 TWSE/TPEx 官方 Open Data 建立「股票代碼 → 市場、名稱、發行股數」索引，
+每日更新一次並持久化到磁碟，讓各數據源第一次就能找到正確的市場與股票名稱。
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, Optional
+
+import pandas as pd
+
+# 添加父目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import scraper
+
+logger = logging.getLogger(__name__)
+
+# 主檔路徑（可用環境變數覆寫）
+DEFAULT_SECURITY_MASTER_PATH = Path(__file__).parent.parent / "cache" / "security_master.json"
+
+MARKET_TWSE = "上市"
+MARKET_TPEX = "上櫃"
+
+# 各市場對應的 yfinance 代碼後綴
+YFINANCE_SUFFIXES = {MARKET_TWSE: ".TW", MARKET_TPEX: ".TWO"}
+
+
+def _parse_shares(value) -> Optional[int]:
+    shares = scraper.clean_numeric(value)
+    if shares is None or pd.isna(shares):
+        return None
+    return int(shares)
+
+
+def build_security_records() -> Dict[str, Dict]:
+    """
+    從 TWSE/TPEx Open Data 建立證券主檔資料。
+
+    Returns:
+        字典，key 為股票代碼，value 為 {"market", "name", "issued_shares"}
+
+    Raises:
+        Exception: 兩個市場都無法取得資料時
+    """
+    records: Dict[str, Dict] = {}
+    errors = []
+
+    # 上市：STOCK_DAY_ALL 提供代碼與名稱，t187ap03_L 提供已發行股數
+    try:
+        shares_by_code = {}
+        for item in scraper.fetch_twse_capital_json() or []:
+            code = str(item.get("公司代號", "")).strip()
+            if code:
+                shares_by_code.setdefault(code, _parse_shares(item.get("已發行普通股數或TDR原股發行股數")))
+
+        for item in scraper.fetch_twse_price_json() or []:
+            code = str(item.get("Code", "")).strip()
+            if not code:
+                continue
+            records[code] = {
+                "market": MARKET_TWSE,
+                "name": str(item.get("Name", "")).strip(),
+                "issued_shares": shares_by_code.get(code),
+            }
+    except Exception as e:
+        errors.append(f"TWSE: {str(e)}")
+
+    # 上櫃：收盤行情同時包含代碼、名稱與發行股數
+    try:
+        for row in scraper.extract_tpex_rows(scraper.fetch_tpex_quotes_json()):
+            if not row or len(row) < 16:
+                continue
+            code = str(row[0]).strip()
+            if not code or code in records:
+                continue
+            records[code] = {
+                "market": MARKET_TPEX,
+                "name": re.sub(r"<[^>]+>", "", str(row[1])).strip(),
+                "issued_shares": _parse_shares(row[15]),
+            }
+    except Exception as e:
+        errors.append(f"TPEx: {str(e)}")
+
+    if not records:
+        raise Exception(f"無法建立證券主檔: {'; '.join(errors)}")
+
+    return records
+
+
+class SecurityMaster:
+    """
+    證券主檔（執行緒安全）。
+
+    建立時從磁碟載入；查詢時若資料不是今天建立的，就在背景執行緒重新從 Open Data 建立並寫回磁碟，
+    查詢本身不等待重建，直接使用既有資料（重建完成前查不到的代碼由呼叫端自行退回原本的嘗試流程）。
+    重建失敗時沿用既有資料。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 主檔 JSON 路徑，None 時使用 SECURITY_MASTER_PATH 環境變數或預設路徑
+        """
+        if path is None:
+            path = os.environ.get("SECURITY_MASTER_PATH", str(DEFAULT_SECURITY_MASTER_PATH))
+        self.path = Path(path)
+        self._records: Dict[str, Dict] = {}
+        self._built_date: Optional[str] = None
+        self._attempted_date: Optional[str] = None
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._records = data.get("records", {})
+            self._built_date = data.get("built_date")
+        except (OSError, ValueError) as e:
+            logger.warning(f"讀取證券主檔失敗（{self.path}）: {str(e)}")
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"built_date": self._built_date, "records": self._records}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"寫入證券主檔失敗（{self.path}）: {str(e)}")
+
+    def refresh(self) -> None:
+        """重新從 Open Data 建立主檔並寫回磁碟"""
+        records = build_security_records()
+        with self._lock:
+            self._records = records
+            self._built_date = date.today().isoformat()
+        self._save()
+        logger.info(f"證券主檔已更新，共 {len(records)} 檔")
+
+    def _ensure_fresh(self) -> None:
+        today = date.today().isoformat()
+        if self._built_date == today or self._attempted_date == today:
+            return
+        with self._lock:
+            if self._built_date == today or self._attempted_date == today:
+                return
+            # 每天只嘗試重建一次，避免上游故障時每次查詢都重試
+            self._attempted_date = today
+
+            # 重建需下載三份 Open Data，在背景進行，不阻塞發出查詢的請求
+            def run():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"更新證券主檔失敗，沿用既有資料: {str(e)}")
+
+            self._refresh_thread = threading.Thread(target=run, daemon=True)
+            self._refresh_thread.start()
+
+    def lookup(self, code: str) -> Optional[Dict]:
+        """
+        查詢股票代碼。
+
+        Args:
+            code: 股票代碼
+
+        Returns:
+            {"market", "name", "issued_shares"}，查無資料（或主檔尚未建立）時返回 None
+        """
+        self._ensure_fresh()
+        return self._records.get(str(code).strip())
+
+    def get_market(self, code: str) -> Optional[str]:
+        """取得股票所屬市場（"上市" / "上櫃"），查無資料時返回 None"""
+        record = self.lookup(code)
+        return record["market"] if record else None
+
+    def get_name(self, code: str) -> Optional[str]:
+        """取得股票名稱，查無資料時返回 None"""
+        record = self.lookup(code)
+        return record["name"] if record and record.get("name") else None
+
+    def get_yfinance_suffixes(self, code: str) -> list:
+        """
+        取得 yfinance 應嘗試的代碼後綴。
+
+        Returns:
+            已知市場時只有一個後綴；查無資料時返回 ['.TW', '.TWO']
+        """
+        market = self.get_market(code)
+        if market in YFINANCE_SUFFIXES:
+            return [YFINANCE_SUFFIXES[market]]
+        return [".TW", ".TWO"]
+
+
+_master: Optional[SecurityMaster] = None
+_master_lock = threading.Lock()
+
+
+def get_security_master() -> SecurityMaster:
+    """取得行程層級共用的 SecurityMaster 實例"""
+    global _master
+    with _master_lock:
+        if _master is None:
+            _master = SecurityMaster()
+        return _master
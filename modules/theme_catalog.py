@@ -0,0 +1,172 @@
+"""
+族群定義目錄模組
+將族群定義檔（themes_new.json）載入並正規化一次後常駐記憶體，
+每次取用時比對檔案修改時間，檔案變更才重新載入並整份替換。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# 添加父目錄到路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.data_loader import resolve_supply_chain_path
+from modules.theme_engine import ThemeIndex
+
+logger = logging.getLogger(__name__)
+
+
+class ThemeCatalogSnapshot:
+    """
+    某一版本的族群定義（唯讀）。
+
+    重新載入時會建立新的快照並整份替換，既有快照不會被修改，
+    因此同一個請求內取得的資料前後一致；呼叫端不應修改 data 內容。
+    """
+
+    __slots__ = ("_data", "_index", "_version", "_path", "_loaded_at")
+
+    def __init__(self, data, path: Path, version: str):
+        self._data = data
+        self._index = ThemeIndex(data)
+        self._version = version
+        self._path = path
+        self._loaded_at = time.time()
+
+    @property
+    def data(self):
+        """原始族群資料（與 load_supply_chain_json() 相同格式）"""
+        return self._data
+
+    @property
+    def index(self) -> ThemeIndex:
+        """已建立的族群成分股索引"""
+        return self._index
+
+    @property
+    def version(self) -> str:
+        """檔案內容的雜湊值，內容不變時版本相同"""
+        return self._version
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def loaded_at(self) -> float:
+        return self._loaded_at
+
+    @property
+    def sectors(self) -> List[Dict]:
+        """統一格式的 sector 清單（舊格式時為空）"""
+        return self._index.sectors
+
+
+class ThemeCatalog:
+    """
+    族群定義目錄（執行緒安全）。
+
+    第一次取用時載入；之後每次 current() 只做一次 stat，
+    修改時間或檔案大小改變才重新讀取。重新載入失敗（例如檔案寫到一半）時沿用前一版。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 族群定義檔路徑，None 時使用 THEME_CATALOG_PATH 環境變數或預設路徑
+        """
+        if path is None:
+            path = os.environ.get("THEME_CATALOG_PATH") or resolve_supply_chain_path()
+        self.path = Path(path)
+        self._snapshot: Optional[ThemeCatalogSnapshot] = None
+        self._stat_key = None
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[ThemeCatalogSnapshot, ThemeCatalogSnapshot], None]] = []
+
+    def add_change_listener(self, callback: Callable[[ThemeCatalogSnapshot, ThemeCatalogSnapshot], None]) -> None:
+        """
+        註冊族群定義內容變更時的回呼函式（第一次載入不會呼叫）。
+
+        Args:
+            callback: callback(old_snapshot, new_snapshot)，在觸發重新載入的執行緒中呼叫，失敗只記錄警告
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self) -> ThemeCatalogSnapshot:
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw.decode("utf-8"))
+        return ThemeCatalogSnapshot(data, self.path, hashlib.sha1(raw).hexdigest()[:16])
+
+    def current(self) -> ThemeCatalogSnapshot:
+        """
+        取得目前的族群定義快照。
+
+        Returns:
+            ThemeCatalogSnapshot
+
+        Raises:
+            FileNotFoundError: 定義檔不存在且尚未載入過任何版本
+            ValueError: 第一次載入時 JSON 格式錯誤
+        """
+        try:
+            stat_key = self._stat()
+        except OSError:
+            if self._snapshot is not None:
+                return self._snapshot
+            raise FileNotFoundError(f"找不到族群定義檔: {self.path}")
+
+        snapshot = self._snapshot
+        if snapshot is not None and stat_key == self._stat_key:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and stat_key == self._stat_key:
+                return self._snapshot
+            try:
+                snapshot = self._load()
+            except (OSError, ValueError) as e:
+                if self._snapshot is None:
+                    raise
+                logger.warning(f"重新載入族群定義失敗，沿用前一版（{self.path}）: {str(e)}")
+                self._stat_key = stat_key
+                return self._snapshot
+
+            previous = self._snapshot
+            self._snapshot = snapshot
+            self._stat_key = stat_key
+            listeners = list(self._listeners)
+            logger.info(f"族群定義已載入（{self.path}，版本 {snapshot.version}）")
+
+        # 只有內容真的改變時才通知（僅修改時間變動時版本相同）
+        if previous is not None and previous.version != snapshot.version:
+            for callback in listeners:
+                try:
+                    callback(previous, snapshot)
+                except Exception as e:
+                    logger.warning(f"族群定義變更通知失敗: {str(e)}")
+        return snapshot
+
+
+_catalog: Optional[ThemeCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_theme_catalog() -> ThemeCatalog:
+    """取得行程層級共用的 ThemeCatalog 實例"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ThemeCatalog()
+        return _catalog
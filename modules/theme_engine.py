@@ -4,8 +4,12 @@
 """
 
 import re
-from typing import Dict, List, Set, Tuple
+import threading
+from collections import OrderedDict
+from itertools import chain
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
 
 
@@ -30,39 +34,31 @@ def extract_stock_code_from_company_name(company_str: str) -> Set[str]:
     return set(matches)
 
 
-def map_stock_to_themes(
-    stocks_df: pd.DataFrame, themes_data: Dict
-) -> Dict[str, List[str]]:
+def _is_tw_ticker(ticker) -> bool:
+    """是否為台股代碼（4 位數字字串）"""
+    return bool(ticker) and isinstance(ticker, str) and ticker.isdigit() and len(ticker) == 4
+
+
+def normalize_sectors(themes_data) -> Optional[List[Dict]]:
     """
-    將股票列表對應到其所屬的族群（一檔股票可能屬於多個族群）。
+    將族群資料轉為統一的 sector 清單格式。
 
-    支援兩種 JSON 格式：
-    1. 舊格式：{"族群清單": [{"族群名稱": "...", "上游": {"代表公司": [...]}, ...}]}
-    2. 新格式：{"popular_sectors": [{"sector_name": "...", "upstream": [{"stocks": [...]}], ...}]}
+    支援四種格式：
+    1. themes_new.json 格式（物件，有 themes 鍵，每個主題有 theme 欄位）
+    2. 新格式（物件，有 popular_sectors 鍵）
+    3. 直接陣列格式（陣列，每個元素是族群物件）
+    4. 舊格式（物件，有 族群清單 鍵）
 
     Args:
-        stocks_df: 股票 DataFrame，需包含 code 欄位
         themes_data: 從 load_supply_chain_json() 載入的族群資料
 
     Returns:
-        字典，key 為股票代碼，value 為該股票所屬的族群名稱列表
+        sector 清單（每個元素含 sector_name, description 及 stocks 或 upstream/midstream/downstream）；
+        舊格式返回 None
     """
-    stock_to_themes: Dict[str, List[str]] = {}
-
-    # 建立「股票代碼 -> 族群名稱」的對應表
-    theme_to_stocks: Dict[str, Set[str]] = {}
-
-    # 判斷是新格式還是舊格式
-    # 支援四種格式：
-    # 1. themes_new.json 格式（物件，有 themes 鍵，每個主題有 theme 欄位）
-    # 2. 新格式（物件，有 popular_sectors 鍵）
-    # 3. 直接陣列格式（陣列，每個元素是族群物件）
-    # 4. 舊格式（物件，有 族群清單 鍵）
-    
-    sectors_list = None
     if isinstance(themes_data, list):
         # 直接陣列格式
-        sectors_list = themes_data
+        return themes_data
     elif "themes" in themes_data:
         # themes_new.json 格式（物件，有 themes 鍵）
         themes_list = themes_data.get("themes", [])
@@ -87,85 +83,233 @@ def map_stock_to_themes(
                             "description": stock.get("intro", "")  # intro 轉為 description
                         })
             sectors_list.append(sector_info)
+        return sectors_list
     elif "popular_sectors" in themes_data:
         # 新格式（物件，有 popular_sectors 鍵）
-        sectors_list = themes_data.get("popular_sectors", [])
+        return themes_data.get("popular_sectors", [])
     else:
         # 舊格式（物件，有 族群清單 鍵）
-        for theme_info in themes_data.get("族群清單", []):
-            theme_name = theme_info.get("族群名稱", "")
-            theme_to_stocks[theme_name] = set()
-
-            # 遍歷上中下游的所有代表公司
-            for stage in ["上游", "中游", "下游"]:
-                if stage in theme_info:
-                    companies = theme_info[stage].get("代表公司", [])
-                    for company_str in companies:
-                        codes = extract_stock_code_from_company_name(company_str)
-                        theme_to_stocks[theme_name].update(codes)
-        # 舊格式處理完畢，直接返回
-        # 對每檔股票，找出它屬於哪些族群
-        for _, row in stocks_df.iterrows():
-            stock_code = str(row["code"]).zfill(4)
-            matching_themes = []
-
-            for theme_name, theme_stocks in theme_to_stocks.items():
-                if stock_code in theme_stocks:
-                    matching_themes.append(theme_name)
-
-            stock_to_themes[stock_code] = matching_themes
-
-        return stock_to_themes
-    
-    # 處理新格式或直接陣列格式
-    if sectors_list is not None:
-        for sector_info in sectors_list:
-            sector_name = sector_info.get("sector_name", "")
-            theme_to_stocks[sector_name] = set()
-
-            # 優先檢查是否有扁平化的 stocks 陣列（頂層）
-            if "stocks" in sector_info:
-                stocks = sector_info.get("stocks", [])
-                if isinstance(stocks, list):
-                    for stock in stocks:
-                        if isinstance(stock, dict):
-                            ticker = stock.get("ticker", "")
-                            # 只處理台股代碼（4位數字），跳過 note 等其他欄位
-                            if ticker and isinstance(ticker, str) and ticker.isdigit() and len(ticker) == 4:
-                                theme_to_stocks[sector_name].add(ticker)
-            else:
-                # 如果沒有扁平化的 stocks，則從 upstream/midstream/downstream 讀取
-                for stage in ["upstream", "midstream", "downstream"]:
-                    if stage in sector_info:
-                        categories = sector_info[stage]
-                        if isinstance(categories, list):
-                            for category_info in categories:
-                                if isinstance(category_info, dict):
-                                    stocks = category_info.get("stocks", [])
-                                    if isinstance(stocks, list):
-                                        for stock in stocks:
-                                            if isinstance(stock, dict):
-                                                ticker = stock.get("ticker", "")
-                                                # 只處理台股代碼（4位數字），跳過 note 等其他欄位
-                                                if ticker and isinstance(ticker, str) and ticker.isdigit() and len(ticker) == 4:
-                                                    theme_to_stocks[sector_name].add(ticker)
-
-    # 對每檔股票，找出它屬於哪些族群
-    for _, row in stocks_df.iterrows():
-        stock_code = str(row["code"]).zfill(4)
-        matching_themes = []
+        return None
 
-        for theme_name, theme_stocks in theme_to_stocks.items():
-            if stock_code in theme_stocks:
-                matching_themes.append(theme_name)
 
-        stock_to_themes[stock_code] = matching_themes
+def _sector_stocks(sector_info: Dict) -> List[Dict]:
+    """
+    取得族群中所有台股個股（保留原順序）。
 
-    return stock_to_themes
+    優先使用扁平化的 stocks 陣列；沒有時從 upstream/midstream/downstream 讀取並去除重複代碼。
+    """
+    if "stocks" in sector_info:
+        stocks = sector_info.get("stocks", [])
+        if not isinstance(stocks, list):
+            return []
+        return [stock for stock in stocks if isinstance(stock, dict) and _is_tw_ticker(stock.get("ticker", ""))]
 
+    result = []
+    seen = set()
+    for stage in ["upstream", "midstream", "downstream"]:
+        categories = sector_info.get(stage)
+        if not isinstance(categories, list):
+            continue
+        for category_info in categories:
+            if not isinstance(category_info, dict):
+                continue
+            stocks = category_info.get("stocks", [])
+            if not isinstance(stocks, list):
+                continue
+            for stock in stocks:
+                # 只處理台股代碼（4位數字），跳過 note 等其他欄位
+                if isinstance(stock, dict) and _is_tw_ticker(stock.get("ticker", "")):
+                    # 避免重複（同一檔股票可能出現在多個階段）
+                    if stock["ticker"] not in seen:
+                        seen.add(stock["ticker"])
+                        result.append(stock)
+    return result
 
-def calc_theme_heat(
+
+class ThemeIndex:
+    """
+    族群成分股索引（建立後唯讀，可跨請求共用）。
+
+    由 load_supply_chain_json() 的結果建立一次，包含：
+    - sectors: 統一格式的 sector 清單（舊格式時為空）
+    - theme_to_members: 族群名稱 -> 成分股代碼列表
+    - ticker_to_themes: 股票代碼 -> 所屬族群名稱列表（依族群定義順序）
+
+    對應 N 檔股票只需要 N 次字典查詢。
+    """
+
+    def __init__(self, themes_data):
+        """
+        Args:
+            themes_data: 從 load_supply_chain_json() 載入的族群資料
+        """
+        self.themes_data = themes_data
+        self.sectors: List[Dict] = []
+        self.theme_to_members: Dict[str, List[str]] = {}
+        self._sector_by_name: Dict[str, Dict] = {}
+        self._all_members: Dict[str, List[Dict]] = {}
+
+        sectors_list = normalize_sectors(themes_data)
+        # 舊格式（族群清單）沒有 sector 結構
+        self.is_legacy = sectors_list is None
+        if sectors_list is None:
+            # 舊格式：從上中下游的代表公司字串中提取代碼
+            for theme_info in themes_data.get("族群清單", []):
+                theme_name = theme_info.get("族群名稱", "")
+                codes: Set[str] = set()
+                for stage in ["上游", "中游", "下游"]:
+                    if stage in theme_info:
+                        for company_str in theme_info[stage].get("代表公司", []):
+                            codes.update(extract_stock_code_from_company_name(company_str))
+                self.theme_to_members[theme_name] = sorted(codes)
+        else:
+            self.sectors = sectors_list
+            for sector_info in sectors_list:
+                if not isinstance(sector_info, dict):
+                    continue
+                sector_name = sector_info.get("sector_name", "")
+                stocks = _sector_stocks(sector_info)
+                # 同名族群以最後一筆的成分股為準（與逐一比對的結果一致）
+                self.theme_to_members[sector_name] = list(dict.fromkeys(stock["ticker"] for stock in stocks))
+                # 族群說明與完整成分股以第一筆同名族群為準
+                if sector_name not in self._sector_by_name:
+                    self._sector_by_name[sector_name] = sector_info
+                    self._all_members[sector_name] = [
+                        {
+                            "ticker": stock["ticker"],
+                            "name": stock.get("name", ""),
+                            "description": stock.get("description", ""),
+                        }
+                        for stock in stocks
+                    ]
+
+        # 反向索引：股票代碼 -> 族群列表
+        self.ticker_to_themes: Dict[str, List[str]] = {}
+        for theme_name, members in self.theme_to_members.items():
+            for ticker in members:
+                self.ticker_to_themes.setdefault(ticker, []).append(theme_name)
+
+    def themes_of(self, code) -> List[str]:
+        """取得單一股票所屬的族群名稱列表"""
+        return list(self.ticker_to_themes.get(str(code).zfill(4), []))
+
+    def map_stocks(self, stocks_df: pd.DataFrame) -> Dict[str, List[str]]:
+        """
+        將股票列表對應到其所屬的族群。
+
+        Args:
+            stocks_df: 股票 DataFrame，需包含 code 欄位
+
+        Returns:
+            字典，key 為股票代碼，value 為該股票所屬的族群名稱列表
+        """
+        if stocks_df.empty:
+            return {}
+        codes = stocks_df["code"].astype(str).str.zfill(4)
+        return {code: list(self.ticker_to_themes.get(code, [])) for code in codes}
+
+    def get_sector(self, theme_name: str) -> Optional[Dict]:
+        """取得族群的 sector 資料，找不到時返回 None"""
+        return self._sector_by_name.get(theme_name)
+
+    def members_of(self, theme_name: str) -> List[str]:
+        """取得族群所有成分股代碼"""
+        return list(self.theme_to_members.get(theme_name, []))
+
+    def all_members(self, theme_name: str) -> List[Dict]:
+        """取得族群所有成分股（ticker, name, description）"""
+        return [dict(member) for member in self._all_members.get(theme_name, [])]
+
+
+# 最近一次建立的索引（同一份族群資料物件只建立一次）
+_index_cache: Tuple = (None, None)
+_index_lock = threading.Lock()
+
+
+def get_theme_index(themes_data) -> ThemeIndex:
+    """
+    取得族群資料對應的 ThemeIndex。
+
+    以族群資料物件本身為鍵：傳入同一個物件時直接沿用已建立的索引。
+
+    Args:
+        themes_data: 從 load_supply_chain_json() 載入的族群資料
+
+    Returns:
+        ThemeIndex 實例
+    """
+    global _index_cache
+    with _index_lock:
+        cached_data, cached_index = _index_cache
+        if cached_data is themes_data and cached_index is not None:
+            return cached_index
+    index = ThemeIndex(themes_data)
+    with _index_lock:
+        _index_cache = (themes_data, index)
+    return index
+
+
+def as_theme_index(themes_data) -> ThemeIndex:
+    """將族群資料轉為 ThemeIndex（傳入的已是 ThemeIndex 時直接返回）"""
+    if isinstance(themes_data, ThemeIndex):
+        return themes_data
+    return get_theme_index(themes_data)
+
+
+def map_stock_to_themes(
+    stocks_df: pd.DataFrame, themes_data: Dict
+) -> Dict[str, List[str]]:
+    """
+    將股票列表對應到其所屬的族群（一檔股票可能屬於多個族群）。
+
+    支援兩種 JSON 格式：
+    1. 舊格式：{"族群清單": [{"族群名稱": "...", "上游": {"代表公司": [...]}, ...}]}
+    2. 新格式：{"popular_sectors": [{"sector_name": "...", "upstream": [{"stocks": [...]}], ...}]}
+
+    Args:
+        stocks_df: 股票 DataFrame，需包含 code 欄位
+        themes_data: 從 load_supply_chain_json() 載入的族群資料（或已建立的 ThemeIndex）
+
+    Returns:
+        字典，key 為股票代碼，value 為該股票所屬的族群名稱列表
+    """
+    index = as_theme_index(themes_data)
+    return index.map_stocks(stocks_df)
+
+
+def _round_values(values, digits: int = 2) -> np.ndarray:
+    """
+    逐值以 Python 內建 round() 四捨五入（缺值保留 NaN）。
+
+    numpy 的 round 會先乘以 10^digits 再取整，在 .xx5 附近與內建 round() 結果可能差 0.01；
+    為了與逐筆累加時的輸出一致，統一使用內建 round()。
+    """
+    return np.array(
+        [round(value, digits) if value == value else np.nan for value in np.asarray(values, dtype=float).tolist()],
+        dtype=float,
+    )
+
+
+def _explode_theme_positions(
     stocks_df: pd.DataFrame, stock_to_themes: Dict[str, List[str]]
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    將股票依所屬族群展開（每檔股票重複其族群數次）。
+
+    Returns:
+        (positions, codes, theme_names)：positions 為展開後每列對應的 stocks_df 位置，
+        codes 為補零後的代碼陣列（未展開），theme_names 為展開後每列的族群名稱
+    """
+    codes = stocks_df["code"].astype(str).str.zfill(4).to_numpy()
+    theme_lists = [stock_to_themes.get(code) or () for code in codes]
+    positions = np.repeat(np.arange(len(codes)), [len(themes) for themes in theme_lists])
+    return positions, codes, list(chain.from_iterable(theme_lists))
+
+
+def calc_theme_heat(
+    stocks_df: pd.DataFrame,
+    stock_to_themes: Dict[str, List[str]],
+    extra_aggregates: bool = False,
 ) -> pd.DataFrame:
     """
     計算每個族群的熱度指標。
@@ -175,72 +319,581 @@ def calc_theme_heat(
     - avg_turnover: 平均週轉率
     - avg_chg_pct: 平均漲跌幅（若資料中有）
 
+    extra_aggregates=True 時另外提供：
+    - median_turnover: 週轉率中位數
+    - max_chg_pct: 最大漲跌幅
+    - total_value_traded: 成交金額合計（收盤價 × 成交股數，需有 close 與 volume 欄位）
+
     Args:
         stocks_df: 股票 DataFrame
         stock_to_themes: 從 map_stock_to_themes() 得到的對應關係
+        extra_aggregates: 是否計算額外的彙總指標
 
     Returns:
-        DataFrame，欄位：theme_name, count_in_topN, avg_turnover, avg_chg_pct
+        DataFrame，欄位：theme_name, count_in_topN, avg_turnover, avg_chg_pct（及額外指標）
         按 count_in_topN（降序）、avg_turnover（降序）排序
     """
-    # 統計每個族群
-    theme_stats: Dict[str, Dict] = {}
-    
+    columns = ["theme_name", "count_in_topN", "avg_turnover", "avg_chg_pct"]
+    if extra_aggregates:
+        columns += ["median_turnover", "max_chg_pct", "total_value_traded"]
+
+    if stocks_df.empty:
+        return pd.DataFrame(columns=columns)
+
     # 檢查是否有 turnover 欄位
     has_turnover = "turnover" in stocks_df.columns
 
-    for _, row in stocks_df.iterrows():
-        stock_code = str(row["code"]).zfill(4)
-        themes = stock_to_themes.get(stock_code, [])
+    # 展開成「股票 × 族群」，並依族群第一次出現的順序編號（與排序前的順序一致）
+    positions, _, theme_names = _explode_theme_positions(stocks_df, stock_to_themes)
 
-        for theme_name in themes:
-            if theme_name not in theme_stats:
-                theme_stats[theme_name] = {
-                    "count": 0,
-                    "turnover_sum": 0.0,
-                    "chg_pct_sum": 0.0,
-                    "chg_pct_count": 0,
-                }
-
-            theme_stats[theme_name]["count"] += 1
-            
-            # 只有在有 turnover 欄位時才累加
-            if has_turnover and pd.notna(row.get("turnover")):
-                theme_stats[theme_name]["turnover_sum"] += row["turnover"]
-
-            if pd.notna(row.get("chg_pct")):
-                theme_stats[theme_name]["chg_pct_sum"] += row["chg_pct"]
-                theme_stats[theme_name]["chg_pct_count"] += 1
-
-    # 轉換成 DataFrame
-    results = []
-    for theme_name, stats in theme_stats.items():
-        count = stats["count"]
-        avg_turnover = stats["turnover_sum"] / count if count > 0 and has_turnover else 0.0
-
-        avg_chg_pct = None
-        if stats["chg_pct_count"] > 0:
-            avg_chg_pct = stats["chg_pct_sum"] / stats["chg_pct_count"]
-
-        results.append({
-            "theme_name": theme_name,
-            "count_in_topN": count,
-            "avg_turnover": round(avg_turnover, 2),
-            "avg_chg_pct": round(avg_chg_pct, 2) if avg_chg_pct is not None else None,
-        })
+    # 如果沒有任何族群，返回空的 DataFrame（但要有正確的欄位）
+    if not theme_names:
+        return pd.DataFrame(columns=columns)
+
+    group_ids, group_names = pd.factorize(pd.Series(theme_names, dtype=object), sort=False)
+    n_groups = len(group_names)
+
+    # 數值欄位（缺值不計入加總與平均的分子）
+    def numeric_column(name):
+        if name not in stocks_df.columns:
+            return np.full(len(positions), np.nan)
+        return pd.to_numeric(stocks_df[name], errors="coerce").to_numpy(dtype=float)[positions]
+
+    turnover = numeric_column("turnover")
+    chg_pct = numeric_column("chg_pct")
+
+    # 以 bincount 依族群加總（依列順序累加）
+    counts = np.bincount(group_ids, minlength=n_groups)
+    turnover_sum = np.bincount(group_ids, weights=np.nan_to_num(turnover, nan=0.0), minlength=n_groups)
+    chg_valid = ~np.isnan(chg_pct)
+    chg_count = np.bincount(group_ids[chg_valid], minlength=n_groups)
+    chg_sum = np.bincount(group_ids[chg_valid], weights=chg_pct[chg_valid], minlength=n_groups)
+
+    # 平均週轉率以族群檔數為分母（缺值視為 0）
+    avg_turnover = turnover_sum / counts if has_turnover else np.zeros(n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_chg_pct = np.where(chg_count > 0, chg_sum / chg_count, np.nan)
 
-    df = pd.DataFrame(results)
+    df = pd.DataFrame({
+        "theme_name": group_names,
+        "count_in_topN": counts,
+        "avg_turnover": _round_values(avg_turnover),
+        "avg_chg_pct": _round_values(avg_chg_pct),
+    })
+    # 沒有任何漲跌幅資料時保留 None（與逐筆累加時的輸出一致）
+    if not chg_valid.any():
+        df["avg_chg_pct"] = None
 
-    # 如果 DataFrame 為空，返回空的 DataFrame（但要有正確的欄位）
-    if df.empty:
-        df = pd.DataFrame(columns=["theme_name", "count_in_topN", "avg_turnover", "avg_chg_pct"])
+    if extra_aggregates:
+        value_traded = numeric_column("close") * numeric_column("volume")
+        value_valid = ~np.isnan(value_traded)
+        value_sum = np.bincount(group_ids[value_valid], weights=value_traded[value_valid], minlength=n_groups)
+        value_count = np.bincount(group_ids[value_valid], minlength=n_groups)
+        df["median_turnover"] = _round_values(pd.Series(turnover).groupby(group_ids).median().reindex(range(n_groups)))
+        df["max_chg_pct"] = _round_values(pd.Series(chg_pct).groupby(group_ids).max().reindex(range(n_groups)))
+        df["total_value_traded"] = np.where(value_count > 0, value_sum, np.nan)
+
+    # 排序：先按 count_in_topN（降序），再按 avg_turnover（降序）
+    df = df.sort_values(
+        ["count_in_topN", "avg_turnover"], ascending=[False, False]
+    ).reset_index(drop=True)
+
+    return df[columns]
+
+
+def calc_market_theme_heat(
+    universe_df: pd.DataFrame,
+    stock_to_themes: Dict[str, List[str]],
+    turnover_baseline: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    以全市場（而非 Top N）計算每個族群的熱度與廣度指標。
+
+    指標包括：
+    - member_count: 族群在全市場中有資料的成分股數
+    - up_count / breadth: 上漲檔數與上漲比例（以有漲跌幅資料的成分股為分母）
+    - avg_turnover: 平均週轉率
+    - weighted_chg_pct: 以週轉率加權的平均漲跌幅
+    - median_turnover_pct: 成分股週轉率在全市場百分位數（0-100）的中位數
+    - avg_turnover_z / z_count: 成分股週轉率相對於自身歷史的 z 分數平均與可計算檔數
+    - total_value_traded: 成交金額合計（收盤價 × 成交股數）
+
+    Args:
+        universe_df: 全市場 DataFrame（需包含 code, turnover, chg_pct，可包含 close, volume）
+        stock_to_themes: 從 map_stock_to_themes() 得到的對應關係
+        turnover_baseline: 各股歷史週轉率統計（index 為補零後代碼，欄位 mean, std），None 時不計算 z 分數
+
+    Returns:
+        DataFrame，按 median_turnover_pct（降序）、breadth（降序）排序
+    """
+    columns = [
+        "theme_name", "member_count", "up_count", "breadth", "avg_turnover", "weighted_chg_pct",
+        "median_turnover_pct", "avg_turnover_z", "z_count", "total_value_traded",
+    ]
+    if universe_df.empty:
+        return pd.DataFrame(columns=columns)
+
+    positions, codes, theme_names = _explode_theme_positions(universe_df, stock_to_themes)
+    if not theme_names:
+        return pd.DataFrame(columns=columns)
+
+    group_ids, group_names = pd.factorize(pd.Series(theme_names, dtype=object), sort=False)
+    n_groups = len(group_names)
+
+    def numeric_column(name):
+        if name not in universe_df.columns:
+            return np.full(len(universe_df), np.nan)
+        return pd.to_numeric(universe_df[name], errors="coerce").to_numpy(dtype=float)
+
+    turnover_all = numeric_column("turnover")
+    # 全市場百分位數（快照已預先計算時直接使用，否則先對全部股票排名，再展開到族群）
+    if "turnover_pct" in universe_df.columns:
+        turnover_pct_all = numeric_column("turnover_pct")
+    else:
+        turnover_pct_all = pd.Series(turnover_all).rank(pct=True).to_numpy() * 100
+
+    if turnover_baseline is not None and not turnover_baseline.empty:
+        baseline = turnover_baseline.reindex(codes)
+        mean = baseline["mean"].to_numpy(dtype=float)
+        std = baseline["std"].to_numpy(dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z_all = np.where(std > 0, (turnover_all - mean) / std, np.nan)
     else:
-        # 排序：先按 count_in_topN（降序），再按 avg_turnover（降序）
+        z_all = np.full(len(codes), np.nan)
+
+    turnover = turnover_all[positions]
+    chg_pct = numeric_column("chg_pct")[positions]
+    turnover_pct = turnover_pct_all[positions]
+    z = z_all[positions]
+    value_traded = (numeric_column("close") * numeric_column("volume"))[positions]
+
+    def group_sum(values, valid):
+        return np.bincount(group_ids[valid], weights=values[valid], minlength=n_groups)
+
+    def group_count(valid):
+        return np.bincount(group_ids[valid], minlength=n_groups)
+
+    member_count = np.bincount(group_ids, minlength=n_groups)
+    chg_valid = ~np.isnan(chg_pct)
+    turnover_valid = ~np.isnan(turnover)
+    weight_valid = chg_valid & turnover_valid
+    z_valid = ~np.isnan(z)
+    value_valid = ~np.isnan(value_traded)
+
+    up_count = group_count(chg_valid & (chg_pct > 0))
+    chg_count = group_count(chg_valid)
+    weight_sum = group_sum(turnover, weight_valid)
+    z_count = group_count(z_valid)
+    value_count = group_count(value_valid)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        breadth = np.where(chg_count > 0, up_count / chg_count, np.nan)
+        avg_turnover = np.where(
+            group_count(turnover_valid) > 0,
+            group_sum(turnover, turnover_valid) / group_count(turnover_valid),
+            np.nan,
+        )
+        weighted_chg_pct = np.where(
+            weight_sum > 0, group_sum(chg_pct * turnover, weight_valid) / weight_sum, np.nan
+        )
+        avg_turnover_z = np.where(z_count > 0, group_sum(z, z_valid) / z_count, np.nan)
+
+    median_turnover_pct = (
+        pd.Series(turnover_pct).groupby(group_ids).median().reindex(range(n_groups)).to_numpy()
+    )
+
+    df = pd.DataFrame({
+        "theme_name": group_names,
+        "member_count": member_count,
+        "up_count": up_count,
+        "breadth": _round_values(breadth, 4),
+        "avg_turnover": _round_values(avg_turnover),
+        "weighted_chg_pct": _round_values(weighted_chg_pct),
+        "median_turnover_pct": _round_values(median_turnover_pct),
+        "avg_turnover_z": _round_values(avg_turnover_z),
+        "z_count": z_count,
+        "total_value_traded": np.where(value_count > 0, group_sum(value_traded, value_valid), np.nan),
+    })
+
+    df = df.sort_values(
+        ["median_turnover_pct", "breadth"], ascending=[False, False], na_position="last"
+    ).reset_index(drop=True)
+
+    return df[columns]
+
+
+def diff_theme_members(old_data, new_data) -> Dict[str, Tuple[Set[str], Set[str]]]:
+    """
+    比對兩版族群定義的成分股差異。
+
+    Args:
+        old_data: 舊版族群資料（或 ThemeIndex）
+        new_data: 新版族群資料（或 ThemeIndex）
+
+    Returns:
+        字典，key 為有變動的族群名稱，value 為 (新增代碼集合, 移除代碼集合)；
+        整個族群新增或刪除時，對應的集合為該族群全部成分股
+    """
+    old_index = as_theme_index(old_data)
+    new_index = as_theme_index(new_data)
+    changes = {}
+    for theme_name in set(old_index.theme_to_members) | set(new_index.theme_to_members):
+        old_members = set(old_index.theme_to_members.get(theme_name, ()))
+        new_members = set(new_index.theme_to_members.get(theme_name, ()))
+        if old_members != new_members:
+            changes[theme_name] = (new_members - old_members, old_members - new_members)
+    return changes
+
+
+def _ordered_sum(values: np.ndarray) -> float:
+    """依陣列順序逐筆加總（與 np.bincount 的累加順序相同；np.sum 為兩兩加總，結果可能差最後一位）"""
+    return float(np.bincount(np.zeros(len(values), dtype=np.intp), weights=values, minlength=1)[0])
+
+
+class ThemeHeatAccumulator:
+    """
+    逐族群的熱度累加器（以個股貢獻為單位，可隨族群定義變更增量更新）。
+
+    建立時將股票資料整理成逐列的數值陣列，並為每個族群保存其在 stocks_df 中出現的列位置與
+    累加值（檔數、週轉率總和、漲跌幅總和/筆數，以及全市場模式用的上漲檔數、加權總和、
+    z 分數與成交金額總和、週轉率百分位數中位數）。族群定義變更時以新舊版本的成分股差異
+    只重算成分股有變動的族群，其餘族群的累加值沿用。
+
+    heat_frame() 的結果與 calc_theme_heat()（不含額外指標）相同，
+    market_heat_frame() 的結果與 calc_market_theme_heat() 相同。
+    同一個累加器可由多個請求執行緒共用（內部加鎖）。
+    """
+
+    def __init__(self, stocks_df: pd.DataFrame, themes_data, turnover_baseline: Optional[pd.DataFrame] = None):
+        """
+        Args:
+            stocks_df: 股票 DataFrame（需包含 code 欄位，可包含 turnover, chg_pct, close, volume, turnover_pct）
+            themes_data: 族群資料（load_supply_chain_json() 的結果或 ThemeIndex）
+            turnover_baseline: 各股歷史週轉率統計（同 calc_market_theme_heat），None 時不計算 z 分數
+        """
+        self.index = as_theme_index(themes_data)
+        self.has_turnover = "turnover" in stocks_df.columns
+        self._lock = threading.RLock()
+
+        if stocks_df.empty:
+            self._codes = np.array([], dtype=object)
+        else:
+            self._codes = stocks_df["code"].astype(str).str.zfill(4).to_numpy()
+
+        def numeric_column(name):
+            if name not in stocks_df.columns:
+                return np.full(len(self._codes), np.nan)
+            return pd.to_numeric(stocks_df[name], errors="coerce").to_numpy(dtype=float)
+
+        self._turnover = numeric_column("turnover")
+        self._chg_pct = numeric_column("chg_pct")
+        self._value_traded = numeric_column("close") * numeric_column("volume")
+        # 全市場百分位數與 z 分數不受族群定義影響，建立時計算一次（算法同 calc_market_theme_heat）
+        if "turnover_pct" in stocks_df.columns:
+            self._turnover_pct = numeric_column("turnover_pct")
+        else:
+            self._turnover_pct = pd.Series(self._turnover).rank(pct=True).to_numpy() * 100
+        if turnover_baseline is not None and not turnover_baseline.empty:
+            baseline = turnover_baseline.reindex(self._codes)
+            mean = baseline["mean"].to_numpy(dtype=float)
+            std = baseline["std"].to_numpy(dtype=float)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self._z = np.where(std > 0, (self._turnover - mean) / std, np.nan)
+        else:
+            self._z = np.full(len(self._codes), np.nan)
+
+        # 代碼 -> 出現的列位置（同一代碼可能出現多次）
+        self._positions_by_code: Dict[str, List[int]] = {}
+        for pos, code in enumerate(self._codes.tolist()):
+            self._positions_by_code.setdefault(code, []).append(pos)
+
+        theme_positions: Dict[str, List[int]] = {}
+        for code, positions in self._positions_by_code.items():
+            for theme_name in self.index.ticker_to_themes.get(code, ()):
+                theme_positions.setdefault(theme_name, []).extend(positions)
+
+        self._theme_positions: Dict[str, np.ndarray] = {}
+        self._stats: Dict[str, Tuple] = {}
+        for theme_name, positions in theme_positions.items():
+            self._set_theme(theme_name, np.array(sorted(positions), dtype=np.intp))
+
+    def _set_theme(self, theme_name: str, positions: np.ndarray) -> None:
+        """以族群的列位置（遞增）重算該族群的累加值；沒有任何列時移除該族群"""
+        if len(positions) == 0:
+            self._theme_positions.pop(theme_name, None)
+            self._stats.pop(theme_name, None)
+            return
+
+        # 依列順序累加，與 calc_theme_heat / calc_market_theme_heat 的 bincount 加總結果完全一致
+        turnover = self._turnover[positions]
+        chg_pct = self._chg_pct[positions]
+        z = self._z[positions]
+        value_traded = self._value_traded[positions]
+
+        chg_valid = ~np.isnan(chg_pct)
+        turnover_valid = ~np.isnan(turnover)
+        weight_valid = chg_valid & turnover_valid
+        z_valid = ~np.isnan(z)
+        value_valid = ~np.isnan(value_traded)
+        turnover_pct = self._turnover_pct[positions]
+        turnover_pct = turnover_pct[~np.isnan(turnover_pct)]
+
+        self._theme_positions[theme_name] = positions
+        self._stats[theme_name] = (
+            len(positions),                                              # 0 檔數
+            _ordered_sum(np.nan_to_num(turnover, nan=0.0)),              # 1 週轉率總和（缺值視為 0）
+            _ordered_sum(chg_pct[chg_valid]),                            # 2 漲跌幅總和
+            int(chg_valid.sum()),                                        # 3 漲跌幅筆數
+            int((chg_pct[chg_valid] > 0).sum()),                         # 4 上漲檔數
+            _ordered_sum(turnover[turnover_valid]),                      # 5 有效週轉率總和
+            int(turnover_valid.sum()),                                   # 6 有效週轉率筆數
+            _ordered_sum(turnover[weight_valid]),                        # 7 權重總和
+            _ordered_sum((chg_pct * turnover)[weight_valid]),            # 8 加權漲跌幅總和
+            _ordered_sum(z[z_valid]),                                    # 9 z 分數總和
+            int(z_valid.sum()),                                          # 10 z 分數筆數
+            _ordered_sum(value_traded[value_valid]),                     # 11 成交金額總和
+            int(value_valid.sum()),                                      # 12 成交金額筆數
+            float(np.median(turnover_pct)) if len(turnover_pct) else np.nan,  # 13 週轉率百分位數中位數
+            int(positions[0]),                                           # 14 第一次出現的列位置
+        )
+
+    def same_rows(self, stocks_df: pd.DataFrame) -> bool:
+        """stocks_df 是否與建立時的股票與數值完全相同（相同時可沿用此累加器）"""
+        codes = stocks_df["code"].astype(str).str.zfill(4).to_numpy() if not stocks_df.empty else np.array([])
+        if len(codes) != len(self._codes) or not (codes == self._codes).all():
+            return False
+        for name, values in (("turnover", self._turnover), ("chg_pct", self._chg_pct)):
+            column = (
+                pd.to_numeric(stocks_df[name], errors="coerce").to_numpy(dtype=float)
+                if name in stocks_df.columns else np.full(len(codes), np.nan)
+            )
+            if not np.array_equal(column, values, equal_nan=True):
+                return False
+        return True
+
+    @property
+    def codes(self) -> Set[str]:
+        """累加器涵蓋的股票代碼（補零後）"""
+        return set(self._positions_by_code)
+
+    def apply_catalog_change(self, themes_data, changes: Optional[Dict[str, Tuple[Set[str], Set[str]]]] = None) -> Set[str]:
+        """
+        套用新版族群定義，只更新成分股有變動且出現在 stocks_df 中的族群。
+
+        Args:
+            themes_data: 新版族群資料（或 ThemeIndex）
+            changes: 目前定義到新版定義的 diff_theme_members() 結果（多個累加器套用同一次變更時可共用），
+                None 時自行比對
+
+        Returns:
+            熱度有變動的族群名稱集合
+        """
+        new_index = as_theme_index(themes_data)
+        with self._lock:
+            if new_index is self.index:
+                return set()
+            if changes is None:
+                changes = diff_theme_members(self.index, new_index)
+
+            affected = set()
+            for theme_name, (added, removed) in changes.items():
+                removed_positions = [pos for code in removed for pos in self._positions_by_code.get(code, ())]
+                added_positions = [pos for code in added for pos in self._positions_by_code.get(code, ())]
+                if not removed_positions and not added_positions:
+                    continue
+
+                positions = self._theme_positions.get(theme_name, np.array([], dtype=np.intp))
+                positions = positions[~np.isin(positions, removed_positions)]
+                positions = np.sort(np.concatenate([positions, np.array(added_positions, dtype=np.intp)]))
+                self._set_theme(theme_name, positions)
+                affected.add(theme_name)
+
+            self.index = new_index
+            return affected
+
+    def _ordered_stats(self) -> Tuple[List[str], np.ndarray, List]:
+        # 依族群第一次出現的順序排列（列位置，同一列內依族群定義順序），與 bincount 分組的順序相同
+        theme_order = {theme_name: i for i, theme_name in enumerate(self.index.theme_to_members)}
+        theme_names = sorted(self._stats, key=lambda name: (self._stats[name][14], theme_order.get(name, 0)))
+        stats = np.array([self._stats[name][:13] for name in theme_names], dtype=float).reshape(-1, 13)
+        medians = [self._stats[name][13] for name in theme_names]
+        return theme_names, stats.T, medians
+
+    def heat_frame(self, themes_data=None) -> pd.DataFrame:
+        """
+        取得 Top N 族群熱度表（可先套用新版族群定義）。
+
+        Args:
+            themes_data: 族群資料（或 ThemeIndex），與目前的定義不同時先套用差異；None 表示沿用目前的定義
+
+        Returns:
+            DataFrame，欄位與排序同 calc_theme_heat()：theme_name, count_in_topN, avg_turnover, avg_chg_pct
+        """
+        columns = ["theme_name", "count_in_topN", "avg_turnover", "avg_chg_pct"]
+        with self._lock:
+            if themes_data is not None:
+                self.apply_catalog_change(themes_data)
+            if not self._stats:
+                return pd.DataFrame(columns=columns)
+            theme_names, stats, _ = self._ordered_stats()
+
+        counts, turnover_sum, chg_sum, chg_count = stats[0], stats[1], stats[2], stats[3]
+        avg_turnover = turnover_sum / counts if self.has_turnover else np.zeros(len(theme_names))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg_chg_pct = np.where(chg_count > 0, chg_sum / chg_count, np.nan)
+
+        df = pd.DataFrame({
+            "theme_name": theme_names,
+            "count_in_topN": counts.astype(np.int64),
+            "avg_turnover": _round_values(avg_turnover),
+            "avg_chg_pct": _round_values(avg_chg_pct),
+        })
+        # 沒有任何漲跌幅資料時保留 None（與 calc_theme_heat 一致）
+        if not (chg_count > 0).any():
+            df["avg_chg_pct"] = None
+
         df = df.sort_values(
             ["count_in_topN", "avg_turnover"], ascending=[False, False]
         ).reset_index(drop=True)
+        return df[columns]
 
-    return df
+    def market_heat_frame(self, themes_data=None) -> pd.DataFrame:
+        """
+        取得全市場族群熱度表（可先套用新版族群定義）。
+
+        Args:
+            themes_data: 族群資料（或 ThemeIndex），與目前的定義不同時先套用差異；None 表示沿用目前的定義
+
+        Returns:
+            DataFrame，欄位與排序同 calc_market_theme_heat()
+        """
+        columns = [
+            "theme_name", "member_count", "up_count", "breadth", "avg_turnover", "weighted_chg_pct",
+            "median_turnover_pct", "avg_turnover_z", "z_count", "total_value_traded",
+        ]
+        with self._lock:
+            if themes_data is not None:
+                self.apply_catalog_change(themes_data)
+            if not self._stats:
+                return pd.DataFrame(columns=columns)
+            theme_names, stats, medians = self._ordered_stats()
+
+        (member_count, _, _, chg_count, up_count, turnover_sum, turnover_count,
+         weight_sum, weighted_sum, z_sum, z_count, value_sum, value_count) = stats
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            breadth = np.where(chg_count > 0, up_count / chg_count, np.nan)
+            avg_turnover = np.where(turnover_count > 0, turnover_sum / turnover_count, np.nan)
+            weighted_chg_pct = np.where(weight_sum > 0, weighted_sum / weight_sum, np.nan)
+            avg_turnover_z = np.where(z_count > 0, z_sum / z_count, np.nan)
+
+        df = pd.DataFrame({
+            "theme_name": theme_names,
+            "member_count": member_count.astype(np.int64),
+            "up_count": up_count.astype(np.int64),
+            "breadth": _round_values(breadth, 4),
+            "avg_turnover": _round_values(avg_turnover),
+            "weighted_chg_pct": _round_values(weighted_chg_pct),
+            "median_turnover_pct": _round_values(medians),
+            "avg_turnover_z": _round_values(avg_turnover_z),
+            "z_count": z_count.astype(np.int64),
+            "total_value_traded": np.where(value_count > 0, value_sum, np.nan),
+        })
+
+        df = df.sort_values(
+            ["median_turnover_pct", "breadth"], ascending=[False, False], na_position="last"
+        ).reset_index(drop=True)
+        return df[columns]
+
+
+class ThemeHeatAccumulatorCache:
+    """
+    ThemeHeatAccumulator 的 LRU 快取（執行緒安全）。
+
+    鍵應包含資料的識別（例如快照交易日、Top N），不含族群定義版本：
+    族群定義變更後沿用同一個累加器，由 heat_frame(themes_data) 只套用差異。
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, ThemeHeatAccumulator]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[ThemeHeatAccumulator]:
+        with self._lock:
+            accumulator = self._entries.get(key)
+            if accumulator is not None:
+                self._entries.move_to_end(key)
+            return accumulator
+
+    def put(self, key: Hashable, accumulator: ThemeHeatAccumulator) -> None:
+        with self._lock:
+            self._entries[key] = accumulator
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_build(
+        self, key: Hashable, stocks_df: pd.DataFrame, builder: Callable[[], ThemeHeatAccumulator]
+    ) -> ThemeHeatAccumulator:
+        """
+        取得快取的累加器；不存在或資料已不同（同一鍵的快照被取代）時呼叫 builder 建立並存入。
+
+        Args:
+            key: 快取鍵
+            stocks_df: 這次請求的股票資料（用來確認快取的累加器是否仍對應相同資料）
+            builder: 建立 ThemeHeatAccumulator 的函式
+
+        Returns:
+            ThemeHeatAccumulator
+        """
+        accumulator = self.get(key)
+        if accumulator is not None and accumulator.same_rows(stocks_df):
+            return accumulator
+        accumulator = builder()
+        self.put(key, accumulator)
+        return accumulator
+
+
+def group_stocks_by_theme(
+    stocks_df: pd.DataFrame, stock_to_themes: Dict[str, List[str]]
+) -> Dict[str, List[Dict]]:
+    """
+    一次取得所有族群在 Top N 中出現的股票（單次分組，取代逐族群呼叫 get_stocks_in_theme）。
+
+    Args:
+        stocks_df: 股票 DataFrame
+        stock_to_themes: 從 map_stock_to_themes() 得到的對應關係
+
+    Returns:
+        字典，key 為族群名稱，value 為該族群股票的 records 列表
+        （排序與 get_stocks_in_theme 相同：有 turnover 時依週轉率降序，否則依代碼升序）
+    """
+    if stocks_df.empty:
+        return {}
+
+    positions, _, theme_names = _explode_theme_positions(stocks_df, stock_to_themes)
+    if not theme_names:
+        return {}
+
+    group_ids, group_names = pd.factorize(pd.Series(theme_names, dtype=object), sort=False)
+    long_df = stocks_df.iloc[positions].reset_index(drop=True)
+    long_df["_group"] = group_ids
+
+    # 先依族群、再依週轉率（或代碼）排序，之後每個族群是連續的一段
+    if "turnover" in long_df.columns:
+        long_df = long_df.sort_values(["_group", "turnover"], ascending=[True, False], kind="mergesort")
+    else:
+        long_df = long_df.sort_values(["_group", "code"], ascending=[True, True], kind="mergesort")
+
+    records = long_df.drop(columns="_group").to_dict("records")
+    bounds = np.cumsum(np.bincount(group_ids, minlength=len(group_names)))
+    groups = {}
+    start = 0
+    for theme_name, end in zip(group_names, bounds):
+        groups[theme_name] = records[start:end]
+        start = end
+    return groups
 
 
 def get_stocks_in_theme(
@@ -286,93 +939,47 @@ def get_all_members_of_theme(theme_name: str, themes_data: Dict) -> List[Dict]:
     
     Args:
         theme_name: 族群名稱
-        themes_data: 從 load_supply_chain_json() 載入的族群資料
+        themes_data: 從 load_supply_chain_json() 載入的族群資料（或已建立的 ThemeIndex）
     
     Returns:
         該族群所有股票的列表，每個元素包含 ticker, name, description
     """
-    # 判斷格式
-    sectors_list = None
-    if isinstance(themes_data, list):
-        sectors_list = themes_data
-    elif "themes" in themes_data:
-        # themes_new.json 格式（物件，有 themes 鍵）
-        themes_list = themes_data.get("themes", [])
-        # 轉換格式：將 theme 欄位轉為 sector_name，intro 轉為 description
-        sectors_list = []
-        for theme_info in themes_list:
-            if not isinstance(theme_info, dict):
-                continue
-            sector_info = {
-                "sector_name": theme_info.get("theme", ""),
-                "description": theme_info.get("description", ""),
-                "stocks": []
-            }
-            # 轉換 stocks：將 intro 轉為 description
-            stocks = theme_info.get("stocks", [])
-            if isinstance(stocks, list):
-                for stock in stocks:
-                    if isinstance(stock, dict):
-                        sector_info["stocks"].append({
-                            "ticker": stock.get("ticker", ""),
-                            "name": stock.get("name", ""),
-                            "description": stock.get("intro", "")  # intro 轉為 description
-                        })
-            sectors_list.append(sector_info)
-    elif "popular_sectors" in themes_data:
-        sectors_list = themes_data.get("popular_sectors", [])
+    index = as_theme_index(themes_data)
+    return index.all_members(theme_name)
+
+
+def _today_member(row) -> Dict:
+    """將一筆股票資料（Series 或 records 字典）整理為族群今日成員格式"""
+    member = {
+        "ticker": str(row["code"]).zfill(4),
+        "name": row.get("name", ""),
+    }
+    
+    # 加入週轉率（如果有）
+    if "turnover" in row and pd.notna(row["turnover"]):
+        member["turnover"] = float(row["turnover"])
     else:
-        # 舊格式，不支援
-        return []
+        member["turnover"] = None
     
-    # 尋找對應的族群
-    for sector_info in sectors_list:
-        if not isinstance(sector_info, dict):
-            continue
-        
-        sector_name = sector_info.get("sector_name", "")
-        if sector_name == theme_name:
-            # 優先檢查扁平化的 stocks 陣列（頂層）
-            if "stocks" in sector_info:
-                stocks = sector_info.get("stocks", [])
-                if isinstance(stocks, list):
-                    # 過濾有效的股票（有 ticker）
-                    valid_stocks = []
-                    for stock in stocks:
-                        if isinstance(stock, dict):
-                            ticker = stock.get("ticker", "")
-                            if ticker and isinstance(ticker, str) and ticker.isdigit() and len(ticker) == 4:
-                                valid_stocks.append({
-                                    "ticker": ticker,
-                                    "name": stock.get("name", ""),
-                                    "description": stock.get("description", "")
-                                })
-                    return valid_stocks
-            else:
-                # 如果沒有扁平化的 stocks，則從 upstream/midstream/downstream 讀取
-                valid_stocks = []
-                for stage in ["upstream", "midstream", "downstream"]:
-                    if stage in sector_info:
-                        categories = sector_info[stage]
-                        if isinstance(categories, list):
-                            for category_info in categories:
-                                if isinstance(category_info, dict):
-                                    stocks = category_info.get("stocks", [])
-                                    if isinstance(stocks, list):
-                                        for stock in stocks:
-                                            if isinstance(stock, dict):
-                                                ticker = stock.get("ticker", "")
-                                                if ticker and isinstance(ticker, str) and ticker.isdigit() and len(ticker) == 4:
-                                                    # 避免重複（同一檔股票可能出現在多個階段）
-                                                    if not any(s["ticker"] == ticker for s in valid_stocks):
-                                                        valid_stocks.append({
-                                                            "ticker": ticker,
-                                                            "name": stock.get("name", ""),
-                                                            "description": stock.get("description", "")
-                                                        })
-                return valid_stocks
+    # 加入漲跌幅（如果有）
+    if "chg_pct" in row and pd.notna(row["chg_pct"]):
+        member["chg_pct"] = float(row["chg_pct"])
+    else:
+        member["chg_pct"] = None
     
-    return []
+    # 加入是否為注意股（如果有）
+    if "is_focus" in row:
+        member["is_focus"] = bool(row["is_focus"])
+    else:
+        member["is_focus"] = False
+    
+    return member
+
+
+def _sort_today_members(today_members: List[Dict]) -> List[Dict]:
+    # 按週轉率排序（降序）
+    today_members.sort(key=lambda x: x["turnover"] if x["turnover"] is not None else 0, reverse=True)
+    return today_members
 
 
 def get_today_members_of_theme(
@@ -398,33 +1005,23 @@ def get_today_members_of_theme(
         themes = stock_to_themes.get(stock_code, [])
         
         if theme_name in themes:
-            member = {
-                "ticker": stock_code,
-                "name": row.get("name", ""),
-            }
-            
-            # 加入週轉率（如果有）
-            if "turnover" in row and pd.notna(row["turnover"]):
-                member["turnover"] = float(row["turnover"])
-            else:
-                member["turnover"] = None
-            
-            # 加入漲跌幅（如果有）
-            if "chg_pct" in row and pd.notna(row["chg_pct"]):
-                member["chg_pct"] = float(row["chg_pct"])
-            else:
-                member["chg_pct"] = None
-            
-            # 加入是否為注意股（如果有）
-            if "is_focus" in row:
-                member["is_focus"] = bool(row["is_focus"])
-            else:
-                member["is_focus"] = False
-            
-            today_members.append(member)
+            today_members.append(_today_member(row))
     
-    # 按週轉率排序（降序）
-    today_members.sort(key=lambda x: x["turnover"] if x["turnover"] is not None else 0, reverse=True)
-    
-    return today_members
+    return _sort_today_members(today_members)
+
+
+def today_members_by_theme(theme_stocks: Dict[str, List[Dict]]) -> Dict[str, List[Dict]]:
+    """
+    將 group_stocks_by_theme() 的分組結果一次轉為各族群的今日成員清單。
+
+    Args:
+        theme_stocks: 族群名稱 -> 股票 records 列表（group_stocks_by_theme() 的結果）
+
+    Returns:
+        族群名稱 -> 今日成員列表（格式與排序同 get_today_members_of_theme）
+    """
+    return {
+        theme_name: _sort_today_members([_today_member(row) for row in records])
+        for theme_name, records in theme_stocks.items()
+    }
 
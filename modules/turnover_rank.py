@@ -0,0 +1,127 @@
+"""
+週轉率排名模組
+以 NumPy 陣列計算週轉率排序、全市場百分位數與市場內相對指標。
+全市場快照只在更新時計算一次，之後前 N 名、百分位門檻或各市場前 N 名都只是切片；
+未排序的資料只取少數幾檔時以 argpartition 挑選，不必排序整個市場。
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# add_rank_columns() 新增的欄位
+RANK_COLUMNS = ["turnover_rank", "turnover_pct", "market_rank", "market_pct", "turnover_vs_market"]
+# top_n 小於資料筆數的 1/ARGPARTITION_RATIO 時改用 argpartition
+ARGPARTITION_RATIO = 8
+
+
+def _turnover_keys(df: pd.DataFrame) -> np.ndarray:
+    """排序鍵：週轉率取負值（由高到低），缺值視為最小"""
+    turnover = df["turnover"]
+    if not pd.api.types.is_float_dtype(turnover):
+        turnover = pd.to_numeric(turnover, errors="coerce")
+    keys = -turnover.to_numpy(dtype=float)
+    keys[np.isnan(keys)] = np.inf
+    return keys
+
+
+def turnover_order(df: pd.DataFrame, top_n: Optional[int] = None) -> np.ndarray:
+    """
+    取得依週轉率由高到低排列的列位置（同值依原順序，缺值在最後）。
+
+    top_n 遠小於資料筆數時以 argpartition 找出門檻值，只排序前 N 檔。
+
+    Args:
+        df: 需包含 turnover 欄位
+        top_n: 只需要前 N 名時指定（None 表示全部）
+
+    Returns:
+        列位置陣列（長度為 min(top_n, len(df))）
+    """
+    keys = _turnover_keys(df)
+    n = len(keys)
+    if not top_n or top_n >= n or top_n * ARGPARTITION_RATIO >= n:
+        order = np.argsort(keys, kind="stable")
+        return order[:top_n] if top_n else order
+
+    # 第 top_n 名的值；嚴格優於門檻的全部入選，同值的依原順序補滿
+    threshold = keys[np.argpartition(keys, top_n - 1)[top_n - 1]]
+    better = np.flatnonzero(keys < threshold)
+    ties = np.flatnonzero(keys == threshold)[: top_n - len(better)]
+    candidates = np.sort(np.concatenate([better, ties]))
+    return candidates[np.argsort(keys[candidates], kind="stable")]
+
+
+def sort_by_turnover(df: pd.DataFrame, top_n: Optional[int] = None) -> pd.DataFrame:
+    """
+    依週轉率由高到低排序並取前 N 名（取代 sort_values("turnover").head(top_n)）。
+
+    Args:
+        df: 需包含 turnover 欄位
+        top_n: 取前 N 名（None 表示全部）
+
+    Returns:
+        排序後的 DataFrame（index 重設）
+    """
+    if df.empty:
+        return df.reset_index(drop=True)
+    return df.iloc[turnover_order(df, top_n)].reset_index(drop=True)
+
+
+def add_rank_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    依週轉率排序全市場資料並加上排名欄位（每個交易日計算一次）。
+
+    新增欄位：
+    - turnover_rank: 全市場週轉率排名（1 為最高，同值依原順序）
+    - turnover_pct: 全市場週轉率百分位數（0-100，越高越活躍）
+    - market_rank: 市場（上市/上櫃）內排名
+    - market_pct: 市場內百分位數
+    - turnover_vs_market: 週轉率相對於所屬市場中位數的倍數
+
+    Args:
+        df: 全市場 DataFrame（需包含 turnover，可包含 market）
+
+    Returns:
+        依週轉率由高到低排序的新 DataFrame
+    """
+    df = sort_by_turnover(df)
+    turnover = pd.to_numeric(df["turnover"], errors="coerce")
+
+    df["turnover_rank"] = np.arange(1, len(df) + 1)
+    df["turnover_pct"] = (turnover.rank(pct=True) * 100).round(2)
+
+    market = df["market"] if "market" in df.columns else pd.Series("", index=df.index)
+    grouped = turnover.groupby(market.to_numpy(), sort=False, dropna=False)
+    # 已依週轉率排序，市場內排名即為累計順序
+    df["market_rank"] = grouped.cumcount().to_numpy() + 1
+    df["market_pct"] = (grouped.rank(pct=True) * 100).round(2)
+    market_median = grouped.transform("median")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        df["turnover_vs_market"] = (turnover / market_median.where(market_median > 0)).round(3)
+    return df
+
+
+def market_positions(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    取得各市場的列位置（沿用 df 的順序；df 已排序時即為各市場的排名順序）。
+
+    Args:
+        df: 需包含 market 欄位
+
+    Returns:
+        字典，key 為市場名稱，value 為列位置陣列
+    """
+    if "market" not in df.columns or df.empty:
+        return {}
+    codes, names = pd.factorize(df["market"], sort=False)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes[codes >= 0], minlength=len(names)))
+    order = order[codes[order] >= 0]
+    positions = {}
+    start = 0
+    for name, end in zip(names, bounds):
+        positions[name] = order[start:end]
+        start = end
+    return positions
@@ -0,0 +1,189 @@
+"""
+證交所個股日成交資訊快取模組
+以 (股票代碼, YYYYMM) 為鍵，將 STOCK_DAY 逐月資料持久化到 SQLite。
+已結束的月份永不過期；當月資料只保留短暫的 TTL。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 快取目錄（可用環境變數覆寫）
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / "cache"
+# 尚未結束的月份（通常是當月）快取秒數
+DEFAULT_CURRENT_MONTH_TTL = 900
+
+
+def _next_month(month_start: datetime) -> datetime:
+    if month_start.month == 12:
+        return datetime(month_start.year + 1, 1, 1)
+    return datetime(month_start.year, month_start.month + 1, 1)
+
+
+class TwseMonthCache:
+    """
+    STOCK_DAY 逐月資料的 SQLite 快取（執行緒安全）。
+
+    每筆快取記錄抓取時間；若抓取時間已在該月份結束之後，資料視為完整並永久保留，
+    否則超過 current_month_ttl 秒即視為過期。
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, current_month_ttl: Optional[float] = None):
+        """
+        Args:
+            cache_dir: 快取目錄，None 時使用 TWSE_CACHE_DIR 環境變數或預設目錄
+            current_month_ttl: 未結束月份的快取秒數，None 時使用 TWSE_CACHE_TTL 環境變數或預設值
+        """
+        if cache_dir is None:
+            cache_dir = os.environ.get("TWSE_CACHE_DIR", str(DEFAULT_CACHE_DIR))
+        if current_month_ttl is None:
+            current_month_ttl = float(os.environ.get("TWSE_CACHE_TTL", DEFAULT_CURRENT_MONTH_TTL))
+
+        self.cache_dir = Path(cache_dir)
+        self.db_path = self.cache_dir / "twse_stock_day.sqlite3"
+        self.current_month_ttl = current_month_ttl
+
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "errors": 0}
+        self._enabled = True
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS stock_day_month (
+                        stock_no TEXT NOT NULL,
+                        yyyymm TEXT NOT NULL,
+                        rows TEXT NOT NULL,
+                        fetched_at REAL NOT NULL,
+                        PRIMARY KEY (stock_no, yyyymm)
+                    )
+                    """
+                )
+        except (OSError, sqlite3.Error) as e:
+            # 快取無法使用時不影響主流程，直接改為每次都向 API 取資料
+            logger.warning(f"證交所快取停用（{self.db_path}）: {str(e)}")
+            self._enabled = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """開啟連線：區塊正常結束時提交、發生例外時回滾，最後一律關閉連線"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def get(self, stock_no: str, month_start: datetime) -> Optional[List[Dict]]:
+        """
+        讀取指定月份的快取。
+
+        Args:
+            stock_no: 股票代碼
+            month_start: 該月第一天
+
+        Returns:
+            該月份的資料列（Date 為 datetime），快取不存在或已過期時返回 None
+        """
+        if not self._enabled:
+            self._count("misses")
+            return None
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT rows, fetched_at FROM stock_day_month WHERE stock_no = ? AND yyyymm = ?",
+                    (stock_no, month_start.strftime("%Y%m")),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"讀取證交所快取失敗: {str(e)}")
+            self._count("errors")
+            self._count("misses")
+            return None
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        rows_json, fetched_at = row
+        # 抓取時間在月份結束之後 → 資料完整，永不過期
+        month_closed_at = _next_month(month_start).timestamp()
+        if fetched_at < month_closed_at and time.time() - fetched_at > self.current_month_ttl:
+            self._count("expired")
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        rows = json.loads(rows_json)
+        for r in rows:
+            r["Date"] = datetime.strptime(r["Date"], "%Y-%m-%d")
+        return rows
+
+    def put(self, stock_no: str, month_start: datetime, rows: List[Dict]) -> None:
+        """
+        寫入指定月份的資料。
+
+        Args:
+            stock_no: 股票代碼
+            month_start: 該月第一天
+            rows: 該月份完整的資料列（Date 為 datetime）
+        """
+        if not self._enabled:
+            return
+
+        payload = json.dumps(
+            [{**r, "Date": r["Date"].strftime("%Y-%m-%d")} for r in rows],
+            ensure_ascii=False,
+        )
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO stock_day_month (stock_no, yyyymm, rows, fetched_at) VALUES (?, ?, ?, ?)",
+                    (stock_no, month_start.strftime("%Y%m"), payload, time.time()),
+                )
+            self._count("writes")
+        except sqlite3.Error as e:
+            logger.warning(f"寫入證交所快取失敗: {str(e)}")
+            self._count("errors")
+
+    def stats(self) -> Dict:
+        """
+        取得快取命中統計。
+
+        Returns:
+            字典，包含 hits, misses, expired, writes, errors, hit_rate, enabled
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        stats["enabled"] = self._enabled
+        return stats
+
+
+_cache: Optional[TwseMonthCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_twse_month_cache() -> TwseMonthCache:
+    """取得行程層級共用的 TwseMonthCache 實例"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TwseMonthCache()
+        return _cache
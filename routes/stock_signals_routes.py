@@ -1,5 +1,6 @@
-from flask import Blueprint, request
+from flask import Blueprint, request, jsonify, g, has_request_context, Response
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 import requests
 import warnings
@@ -7,8 +8,9 @@ import logging
 from datetime import datetime, timedelta
 import time
 import math
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import threading
 
 signals_bp = Blueprint('signals', __name__)
 import sys
@@ -32,6 +34,27 @@ except ImportError:
     YFINANCE_AVAILABLE = False
     logger.warning("yfinance 未安裝，將僅使用台灣證交所 API")
 
+from modules.http_client import get_http_client
+from modules.rate_limiter import get_rate_limiter
+from modules.twse_cache import get_twse_month_cache
+from modules.security_master import get_security_master, MARKET_TPEX
+
+# 台灣證交所個股日成交資訊 API
+TWSE_STOCK_DAY_URL = "https://www.twse.com.tw/exchangeReport/STOCK_DAY"
+# 單次查詢同時送出的逐月請求數上限
+TWSE_MAX_WORKERS = int(os.environ.get('TWSE_MAX_WORKERS', 4))
+# 證交所請求額度（所有查詢共用）：平均每秒請求數與允許的瞬間突發量
+TWSE_RATE_LIMIT = float(os.environ.get('TWSE_RATE_LIMIT', 1.0))
+TWSE_RATE_BURST = float(os.environ.get('TWSE_RATE_BURST', 3))
+_TWSE_LIMITER = get_rate_limiter('www.twse.com.tw', TWSE_RATE_LIMIT, TWSE_RATE_BURST)
+
+# 批次訊號查詢：同時處理的股票數與單次請求的股票數上限
+SIGNALS_BATCH_WORKERS = int(os.environ.get('SIGNALS_BATCH_WORKERS', 8))
+SIGNALS_BATCH_MAX_TICKERS = int(os.environ.get('SIGNALS_BATCH_MAX_TICKERS', 300))
+
+# yf.download 以模組層級的共用狀態收集結果，多個請求同時呼叫會互相覆蓋，需序列化
+_YF_DOWNLOAD_LOCK = threading.Lock()
+
 
 def get_tick_size(price):
     """
@@ -115,10 +138,129 @@ def calculate_kdj(high, low, close, period=9, k_period=3, d_period=3):
     return k.values, d.values
 
 
+def _fetch_twse_month(stock_no, month_start):
+    """
+    獲取單一月份的證交所日成交資訊（供執行緒池並行呼叫）
+    
+    每次送出請求前都會向行程層級的限流器取得 token，
+    因此無論同時有多少查詢在進行，總請求速率都不會超過 TWSE_RATE_LIMIT。
+    請求透過共用 HTTP 用戶端送出，沿用既有的 keep-alive 連線。
+    
+    返回:
+        該月份的完整資料列（list of dict；API 回覆「沒有符合條件的資料」時為空列表），
+        重試後仍失敗時返回 None（不寫入快取）
+    """
+    # 格式化日期為 YYYYMMDD（取該月第一天）
+    date_str = month_start.strftime('%Y%m%d')
+    month_label = month_start.strftime('%Y-%m')
+    
+    rows = []
+    max_retries = 3
+    retry_count = 0
+    success = False
+    
+    while retry_count < max_retries and not success:
+        try:
+            params = {
+                'response': 'json',
+                'date': date_str,
+                'stockNo': stock_no
+            }
+            
+            # 取得請求額度（取代原本固定的 time.sleep）；每次重試都重新取得額度，因此不在傳輸層重試
+            _TWSE_LIMITER.acquire()
+            # 增加超時時間到 30 秒，適應 Render 的網路環境
+            response = get_http_client().get(
+                TWSE_STOCK_DAY_URL, params=params, profile='twse', timeout=30, retry=False
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            
+            # 檢查 API 回應
+            if data.get('stat') == 'OK' and 'data' in data:
+                # 解析數據
+                rows = []
+                for row in data['data']:
+                    try:
+                        # 日期格式：民國年/MM/DD，需要轉換為西元年
+                        date_str_row = row[0].strip()
+                        date_parts = date_str_row.split('/')
+                        if len(date_parts) == 3:
+                            roc_year = int(date_parts[0])
+                            year = roc_year + 1911  # 轉換為西元年
+                            month = int(date_parts[1])
+                            day = int(date_parts[2])
+                            
+                            date = datetime(year, month, day)
+                            # 台灣證交所 API 數據格式：
+                            # [0]日期, [1]成交股數, [2]成交金額, [3]開盤, [4]最高, [5]最低, [6]收盤, [7]漲跌價差, [8]成交筆數
+                            open_price = float(str(row[3]).replace(',', '').replace('--', '0'))
+                            high_price = float(str(row[4]).replace(',', '').replace('--', '0'))
+                            low_price = float(str(row[5]).replace(',', '').replace('--', '0'))
+                            close_price = float(str(row[6]).replace(',', '').replace('--', '0'))
+                            
+                            # 成交量（成交股數）
+                            volume_str = str(row[1]).replace(',', '').replace('--', '0')
+                            volume = int(float(volume_str)) if volume_str else 0
+                            
+                            rows.append({
+                                'Date': date,
+                                'Open': open_price,
+                                'High': high_price,
+                                'Low': low_price,
+                                'Close': close_price,
+                                'Volume': volume
+                            })
+                    except (ValueError, IndexError, TypeError) as e:
+                        # 跳過無法解析的數據
+                        continue
+                
+                if rows:
+                    logger.info(f"成功獲取 {month_label} 的數據，共 {len(rows)} 筆")
+                else:
+                    logger.warning(f"{month_label} 的數據為空")
+                success = True  # 即使沒有數據，也算成功（可能是非交易日）
+            elif data.get('stat') != 'OK':
+                # 錯誤訊息可能放在 message 或直接放在 stat
+                error_msg = data.get('message') or data.get('stat') or 'Unknown error'
+                logger.warning(f"API 返回錯誤狀態: {error_msg} (月份: {month_label})")
+                if '沒有符合條件的資料' in str(error_msg):
+                    # 該月份沒有數據，視為成功（空結果會寫入快取）
+                    success = True
+                else:
+                    # 其他錯誤（包括「很抱歉」開頭的一般錯誤）不可當成空月份快取
+                    retry_count += 1
+            else:
+                logger.warning(f"API 回應格式異常 (月份: {month_label})")
+                retry_count += 1
+            
+        except requests.exceptions.Timeout:
+            retry_count += 1
+            logger.warning(f"請求超時 (月份: {month_label}, 重試 {retry_count}/{max_retries})")
+            if retry_count < max_retries:
+                time.sleep(2 ** retry_count)  # 指數退避
+        except requests.exceptions.RequestException as e:
+            retry_count += 1
+            logger.warning(f"請求失敗: {str(e)} (月份: {month_label}, 重試 {retry_count}/{max_retries})")
+            if retry_count < max_retries:
+                time.sleep(2 ** retry_count)  # 指數退避
+        except Exception as e:
+            logger.error(f"處理數據時發生錯誤: {str(e)} (月份: {month_label})")
+            retry_count += 1
+            if retry_count < max_retries:
+                time.sleep(2 ** retry_count)
+    
+    return rows if success else None
+
+
 def get_twse_stock_data(stock_no, days=180):
     """
     從台灣證交所 API 獲取股票數據（改進版：支援重試、更長超時、詳細日誌）
     
+    已抓過的月份會先從逐月快取（modules.twse_cache）讀取，只有未命中的月份
+    才透過有上限的執行緒池並行送出，並由行程層級的 Token Bucket 限流器控制總請求速率。
+    
     參數:
         stock_no: 股票代碼（4位數字，例如 "2330"）
         days: 需要獲取的天數
@@ -126,151 +268,55 @@ def get_twse_stock_data(stock_no, days=180):
     返回:
         pandas DataFrame 包含 Open, High, Low, Close, Volume 欄位
     """
-    # 配置重試策略
-    try:
-        retry_strategy = Retry(
-            total=3,  # 總共重試 3 次
-            backoff_factor=1,  # 重試間隔：1秒、2秒、4秒
-            status_forcelist=[429, 500, 502, 503, 504],  # 需要重試的 HTTP 狀態碼
-            allowed_methods=["GET"]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-    except Exception:
-        # 如果 urllib3 版本較舊，使用簡單的 session
-        adapter = HTTPAdapter()
-    
-    session = requests.Session()
-    session.mount("https://", adapter)
-    session.mount("http://", adapter)
-    
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'application/json',
-        'Accept-Language': 'zh-TW,zh;q=0.9,en;q=0.8',
-        'Referer': 'https://www.twse.com.tw/',
-    })
-    
-    all_data = []
     end_date = datetime.now()
     start_date = end_date - timedelta(days=days)
     
     # 台灣證交所 API 一次只能獲取一個月的數據，需要逐月獲取
-    # 從起始月份的第一天開始，逐月獲取
+    # 從起始月份的第一天開始，列出所有需要的月份
+    months = []
     current_month = start_date.replace(day=1)
     end_month = end_date.replace(day=1)
-    
-    total_months = (end_month.year - current_month.year) * 12 + (end_month.month - current_month.month) + 1
-    logger.info(f"開始獲取股票 {stock_no} 的數據，共需獲取 {total_months} 個月的數據")
-    
-    month_count = 0
     while current_month <= end_month:
-        month_count += 1
-        # 格式化日期為 YYYYMMDD（取該月第一天）
-        date_str = current_month.strftime('%Y%m%d')
-        
-        max_retries = 3
-        retry_count = 0
-        success = False
-        
-        while retry_count < max_retries and not success:
-            try:
-                url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY"
-                params = {
-                    'response': 'json',
-                    'date': date_str,
-                    'stockNo': stock_no
-                }
-                
-                # 增加超時時間到 30 秒，適應 Render 的網路環境
-                response = session.get(url, params=params, timeout=30)
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                # 檢查 API 回應
-                if data.get('stat') == 'OK' and 'data' in data:
-                    # 解析數據
-                    row_count = 0
-                    for row in data['data']:
-                        try:
-                            # 日期格式：民國年/MM/DD，需要轉換為西元年
-                            date_str_row = row[0].strip()
-                            date_parts = date_str_row.split('/')
-                            if len(date_parts) == 3:
-                                roc_year = int(date_parts[0])
-                                year = roc_year + 1911  # 轉換為西元年
-                                month = int(date_parts[1])
-                                day = int(date_parts[2])
-                                
-                                date = datetime(year, month, day)
-                                if start_date <= date <= end_date:
-                                    # 台灣證交所 API 數據格式：
-                                    # [0]日期, [1]成交股數, [2]成交金額, [3]開盤, [4]最高, [5]最低, [6]收盤, [7]漲跌價差, [8]成交筆數
-                                    open_price = float(str(row[3]).replace(',', '').replace('--', '0'))
-                                    high_price = float(str(row[4]).replace(',', '').replace('--', '0'))
-                                    low_price = float(str(row[5]).replace(',', '').replace('--', '0'))
-                                    close_price = float(str(row[6]).replace(',', '').replace('--', '0'))
-                                    
-                                    # 成交量（成交股數）
-                                    volume_str = str(row[1]).replace(',', '').replace('--', '0')
-                                    volume = int(float(volume_str)) if volume_str else 0
-                                    
-                                    all_data.append({
-                                        'Date': date,
-                                        'Open': open_price,
-                                        'High': high_price,
-                                        'Low': low_price,
-                                        'Close': close_price,
-                                        'Volume': volume
-                                    })
-                                    row_count += 1
-                        except (ValueError, IndexError, TypeError) as e:
-                            # 跳過無法解析的數據
-                            continue
-                    
-                    if row_count > 0:
-                        logger.info(f"成功獲取 {current_month.strftime('%Y-%m')} 的數據，共 {row_count} 筆")
-                        success = True
-                    else:
-                        logger.warning(f"{current_month.strftime('%Y-%m')} 的數據為空")
-                        success = True  # 即使沒有數據，也算成功（可能是非交易日）
-                elif data.get('stat') != 'OK':
-                    error_msg = data.get('message', 'Unknown error')
-                    logger.warning(f"API 返回錯誤狀態: {error_msg} (月份: {current_month.strftime('%Y-%m')})")
-                    if '很抱歉' in str(error_msg) or '沒有符合條件的資料' in str(error_msg):
-                        # 該月份沒有數據，視為成功
-                        success = True
-                    else:
-                        retry_count += 1
-                else:
-                    logger.warning(f"API 回應格式異常 (月份: {current_month.strftime('%Y-%m')})")
-                    retry_count += 1
-                
-            except requests.exceptions.Timeout:
-                retry_count += 1
-                logger.warning(f"請求超時 (月份: {current_month.strftime('%Y-%m')}, 重試 {retry_count}/{max_retries})")
-                if retry_count < max_retries:
-                    time.sleep(2 ** retry_count)  # 指數退避
-            except requests.exceptions.RequestException as e:
-                retry_count += 1
-                logger.warning(f"請求失敗: {str(e)} (月份: {current_month.strftime('%Y-%m')}, 重試 {retry_count}/{max_retries})")
-                if retry_count < max_retries:
-                    time.sleep(2 ** retry_count)  # 指數退避
-            except Exception as e:
-                logger.error(f"處理數據時發生錯誤: {str(e)} (月份: {current_month.strftime('%Y-%m')})")
-                retry_count += 1
-                if retry_count < max_retries:
-                    time.sleep(2 ** retry_count)
-        
-        # 避免請求過於頻繁（增加延遲時間）
-        time.sleep(1.0)  # 增加到 1 秒，避免觸發 API 頻率限制
-        
+        months.append(current_month)
         # 移到下一個月
         if current_month.month == 12:
             current_month = current_month.replace(year=current_month.year + 1, month=1)
         else:
             current_month = current_month.replace(month=current_month.month + 1)
     
+    logger.info(f"開始獲取股票 {stock_no} 的數據，共需獲取 {len(months)} 個月的數據")
+    
+    # 先讀取快取，只抓取未命中（或已過期）的月份
+    cache = get_twse_month_cache()
+    month_rows = {}
+    missing_months = []
+    for month_start in months:
+        cached_rows = cache.get(stock_no, month_start)
+        if cached_rows is None:
+            missing_months.append(month_start)
+        else:
+            month_rows[month_start] = cached_rows
+    
+    if missing_months:
+        logger.info(f"股票 {stock_no} 快取命中 {len(months) - len(missing_months)} 個月，需向 API 獲取 {len(missing_months)} 個月")
+        with ThreadPoolExecutor(max_workers=min(TWSE_MAX_WORKERS, len(missing_months))) as executor:
+            fetched = executor.map(
+                lambda month_start: _fetch_twse_month(stock_no, month_start),
+                missing_months
+            )
+            for month_start, rows in zip(missing_months, fetched):
+                if rows is None:
+                    continue
+                cache.put(stock_no, month_start, rows)
+                month_rows[month_start] = rows
+    
+    all_data = [
+        row
+        for month_start in months
+        for row in month_rows.get(month_start, [])
+        if start_date <= row['Date'] <= end_date
+    ]
+    
     if not all_data:
         logger.error(f"無法獲取股票 {stock_no} 的任何數據")
         return None
@@ -288,310 +334,367 @@ def get_twse_stock_data(stock_no, days=180):
     return df
 
 
+def _resample_weekly(daily_data):
+    """將日線數據轉換為週線數據"""
+    return daily_data.resample('W').agg({
+        'Open': 'first',
+        'High': 'max',
+        'Low': 'min',
+        'Close': 'last',
+        'Volume': 'sum'
+    }).dropna()
+
+
+def _get_twse_stock_name(stock_no):
+    """從證交所 STOCK_DAY 回應的 title 取得股票名稱，失敗時返回 None"""
+    try:
+        url = TWSE_STOCK_DAY_URL
+        params = {
+            'response': 'json',
+            'date': datetime.now().strftime('%Y%m%d'),
+            'stockNo': stock_no
+        }
+        _TWSE_LIMITER.acquire()
+        response = get_http_client().get(url, params=params, profile='twse', timeout=30, retry=False)
+        if response.status_code == 200:
+            data = response.json()
+            if data.get('stat') == 'OK' and 'title' in data:
+                # title 格式通常是 "2330 台積電 個股日成交資訊"
+                parts = data['title'].split()
+                if len(parts) >= 2:
+                    return parts[1]
+    except:
+        pass
+    return None
+
+
 def try_get_stock_data_yfinance(ticker):
     """
-    使用 yfinance 獲取股票數據（第一順位）
-    返回: (daily_data, weekly_data, stock_info, error_msg) 或 (None, None, None, error_msg) 如果失敗
+    使用 yfinance 獲取股票過去2年的日線數據（第一順位）
+    返回: (daily_data_2y, stock_info, error_msg) 或 (None, None, error_msg) 如果失敗
     """
     if not YFINANCE_AVAILABLE:
-        return None, None, None, "yfinance 未安裝"
+        return None, None, "yfinance 未安裝"
     
     try:
-        # 嘗試 .TW 和 .TWO 兩種格式
-        tickers_to_try = [f"{ticker}.TW", f"{ticker}.TWO"]
+        # 依證券主檔直接使用正確的後綴；主檔查無資料時才嘗試 .TW 和 .TWO 兩種格式
+        security_master = get_security_master()
+        tickers_to_try = [f"{ticker}{suffix}" for suffix in security_master.get_yfinance_suffixes(ticker)]
+        master_name = security_master.get_name(ticker)
         
         for ticker_with_suffix in tickers_to_try:
             try:
-                logger.info(f"嘗試使用 yfinance 獲取 {ticker_with_suffix} 的數據")
+                logger.info(f"嘗試使用 yfinance 獲取 {ticker_with_suffix} 的2年數據")
                 stock = yf.Ticker(ticker_with_suffix)
                 
-                # 獲取日線數據（最近 180 天）
-                daily_data = stock.history(period="6mo")
-                
-                if daily_data is None or daily_data.empty:
-                    logger.warning(f"yfinance 無法獲取 {ticker_with_suffix} 的日線數據")
-                    continue
-                
-                # 獲取週線數據（最近 2 年）
-                weekly_data_full = stock.history(period="2y")
+                # 獲取過去2年的日線數據
+                daily_data_2y = stock.history(period="2y")
                 
-                if weekly_data_full is None or weekly_data_full.empty:
-                    logger.warning(f"yfinance 無法獲取 {ticker_with_suffix} 的週線數據")
+                if daily_data_2y is None or daily_data_2y.empty:
+                    logger.warning(f"yfinance 無法獲取 {ticker_with_suffix} 的2年數據")
                     continue
                 
-                # 將日線數據轉換為週線數據
-                weekly_data = weekly_data_full.resample('W').agg({
-                    'Open': 'first',
-                    'High': 'max',
-                    'Low': 'min',
-                    'Close': 'last',
-                    'Volume': 'sum'
-                }).dropna()
-                
-                # 獲取股票資訊
+                # 獲取股票資訊（主檔已有名稱時不再呼叫 stock.info）
                 stock_info = {}
-                try:
-                    info = stock.info
-                    if info:
-                        stock_info['longName'] = info.get('longName', info.get('shortName', ticker))
-                except:
-                    stock_info['longName'] = ticker
+                if master_name:
+                    stock_info['longName'] = master_name
+                else:
+                    try:
+                        info = stock.info
+                        if info:
+                            stock_info['longName'] = info.get('longName', info.get('shortName', ticker))
+                    except:
+                        stock_info['longName'] = ticker
                 
-                logger.info(f"成功使用 yfinance 獲取 {ticker_with_suffix} 的數據")
-                return daily_data, weekly_data, stock_info, None
+                logger.info(f"成功使用 yfinance 獲取 {ticker_with_suffix} 的2年數據")
+                return daily_data_2y, stock_info, None
                 
             except Exception as e:
-                logger.warning(f"yfinance 獲取 {ticker_with_suffix} 失敗: {str(e)}")
+                logger.warning(f"yfinance 獲取 {ticker_with_suffix} 的2年數據失敗: {str(e)}")
                 continue
         
-        return None, None, None, f"yfinance 無法獲取股票代碼 {ticker} 的數據（已嘗試 .TW 和 .TWO）"
+        tried = '、'.join(tickers_to_try)
+        return None, None, f"yfinance 無法獲取股票代碼 {ticker} 的數據（已嘗試 {tried}）"
     
     except Exception as e:
-        return None, None, None, f"使用 yfinance 獲取股票數據時發生錯誤: {str(e)}"
+        return None, None, f"使用 yfinance 獲取股票數據時發生錯誤: {str(e)}"
 
 
 def try_get_stock_data_twse(stock_no):
     """
-    使用台灣證交所 API 獲取股票數據（第二順位）
-    返回: (daily_data, weekly_data, stock_info, error_msg) 或 (None, None, None, error_msg) 如果失敗
+    使用台灣證交所 API 獲取股票過去2年的日線數據（第二順位）
+    返回: (daily_data_2y, stock_info, error_msg) 或 (None, None, error_msg) 如果失敗
     """
     try:
-        logger.info(f"嘗試使用台灣證交所 API 獲取 {stock_no} 的數據")
-        
-        # 獲取日線數據（最近 180 天）
-        daily_data = get_twse_stock_data(stock_no, days=180)
-        
-        if daily_data is None or daily_data.empty:
-            return None, None, None, f"無法從台灣證交所獲取股票代碼 {stock_no} 的日線數據"
-        
-        # 獲取週線數據（最近 2 年，用於計算週線指標）
-        weekly_data_full = get_twse_stock_data(stock_no, days=730)
+        # 上櫃股票不在證交所 STOCK_DAY 的範圍內，直接略過
+        security_master = get_security_master()
+        if security_master.get_market(stock_no) == MARKET_TPEX:
+            return None, None, f"股票代碼 {stock_no} 為上櫃股票，台灣證交所 API 不提供其數據"
         
-        if weekly_data_full is None or weekly_data_full.empty:
-            return None, None, None, f"無法從台灣證交所獲取股票代碼 {stock_no} 的週線數據"
+        logger.info(f"嘗試使用台灣證交所 API 獲取 {stock_no} 的2年數據")
+        daily_data_2y = get_twse_stock_data(stock_no, days=730)
         
-        # 將日線數據轉換為週線數據（取每週最後一個交易日的數據）
-        weekly_data = weekly_data_full.resample('W').agg({
-            'Open': 'first',
-            'High': 'max',
-            'Low': 'min',
-            'Close': 'last',
-            'Volume': 'sum'
-        }).dropna()
+        if daily_data_2y is None or daily_data_2y.empty:
+            return None, None, f"無法從台灣證交所獲取股票代碼 {stock_no} 的2年數據"
         
-        # 獲取股票名稱（從證交所 API）
+        # 獲取股票名稱（優先使用證券主檔，查無資料時才向證交所 API 查詢）
         stock_info = {}
-        try:
-            # 嘗試獲取股票名稱
-            url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY"
-            params = {
-                'response': 'json',
-                'date': datetime.now().strftime('%Y%m%d'),
-                'stockNo': stock_no
-            }
-            response = requests.get(url, params=params, timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('stat') == 'OK' and 'title' in data:
-                    # 從 title 中提取股票名稱
-                    title = data['title']
-                    # title 格式通常是 "2330 台積電 個股日成交資訊"
-                    parts = title.split()
-                    if len(parts) >= 2:
-                        stock_info['longName'] = parts[1]
-        except:
-            pass
-        
-        logger.info(f"成功使用台灣證交所 API 獲取 {stock_no} 的數據")
-        return daily_data, weekly_data, stock_info, None
+        stock_name = security_master.get_name(stock_no) or _get_twse_stock_name(stock_no)
+        if stock_name:
+            stock_info['longName'] = stock_name
+        
+        logger.info(f"成功使用台灣證交所 API 獲取 {stock_no} 的2年數據")
+        return daily_data_2y, stock_info, None
     
     except Exception as e:
-        return None, None, None, f"獲取股票數據時發生錯誤: {str(e)}"
+        return None, None, f"獲取2年數據時發生錯誤: {str(e)}"
+
+
+def get_stock_history(ticker):
+    """
+    獲取股票過去2年的日線數據：優先使用 yfinance，失敗後使用台灣證交所 API
+    
+    每個 ticker 只會向數據源抓取一次最長的區間（2年），日線、週線與分形支撐壓力位
+    都從這份數據衍生；在 Flask request 中會以 request 為範圍記住結果，
+    同一個 request 內重複呼叫不會再向數據源發出請求。
+    
+    返回: (daily_data_2y, stock_info, error_msg, data_source)
+    """
+    memo = None
+    if has_request_context():
+        memo = g.setdefault('_stock_history_memo', {})
+        if ticker in memo:
+            return memo[ticker]
+    
+    # 先嘗試 yfinance（第一順位）
+    daily_data_2y, stock_info, error_msg = try_get_stock_data_yfinance(ticker)
+    
+    if daily_data_2y is not None:
+        result = (daily_data_2y, stock_info, None, "yfinance")
+    else:
+        # yfinance 失敗，嘗試台灣證交所 API（第二順位）
+        logger.info(f"yfinance 失敗，嘗試使用台灣證交所 API 獲取 {ticker} 的數據")
+        daily_data_2y, stock_info, error_msg = try_get_stock_data_twse(ticker)
+        
+        if daily_data_2y is not None:
+            result = (daily_data_2y, stock_info, None, "TWSE")
+        else:
+            # 兩個數據源都失敗
+            result = (None, None, error_msg or "所有數據源都無法獲取數據", None)
+    
+    if memo is not None:
+        memo[ticker] = result
+    return result
+
+
+def split_daily_weekly(daily_data_2y):
+    """
+    從2年日線數據衍生日線（最近 6 個月）與週線（最近 2 年）數據
+    返回: (daily_data, weekly_data)
+    """
+    daily_data_2y = daily_data_2y.sort_index()
+    
+    # 日線數據（最近 6 個月）
+    six_months_ago = daily_data_2y.index[-1] - pd.DateOffset(months=6)
+    daily_data = daily_data_2y[daily_data_2y.index >= six_months_ago].copy()
+    
+    # 週線數據（最近 2 年）
+    weekly_data = _resample_weekly(daily_data_2y)
+    
+    return daily_data, weekly_data
 
 
 def get_stock_data(ticker):
     """
-    獲取股票數據：優先使用 yfinance，失敗後使用台灣證交所 API
+    獲取股票數據：日線（最近 6 個月）與週線（最近 2 年），皆由 get_stock_history 的同一份數據衍生
     返回: (daily_data, weekly_data, stock_info, error_msg, data_source)
     """
-    # 先嘗試 yfinance（第一順位）
-    daily_data, weekly_data, stock_info, error_msg = try_get_stock_data_yfinance(ticker)
+    daily_data_2y, stock_info, error_msg, data_source = get_stock_history(ticker)
+    
+    if daily_data_2y is None or daily_data_2y.empty:
+        return None, None, None, error_msg, None
+    
+    daily_data, weekly_data = split_daily_weekly(daily_data_2y)
+    
+    logger.info(f"使用 {data_source} 成功獲取 {ticker} 的數據")
+    return daily_data, weekly_data, stock_info, None, data_source
+
+
+def resolve_market_suffixes(tickers):
+    """
+    依證券主檔（上市/上櫃清單）一次判斷多檔股票的 yfinance 代碼後綴
     
-    if daily_data is not None and weekly_data is not None:
-        logger.info(f"使用 yfinance 成功獲取 {ticker} 的數據")
-        return daily_data, weekly_data, stock_info, None, "yfinance"
+    參數:
+        tickers: 股票代碼清單（4位數字）
     
-    # yfinance 失敗，嘗試台灣證交所 API（第二順位）
-    logger.info(f"yfinance 失敗，嘗試使用台灣證交所 API 獲取 {ticker} 的數據")
-    daily_data, weekly_data, stock_info, error_msg = try_get_stock_data_twse(ticker)
+    返回: (suffix_map, name_map)
+        suffix_map: dict，key 為股票代碼，value 為要嘗試的後綴清單（無法判斷時為 ['.TW', '.TWO']）
+        name_map: dict，key 為股票代碼，value 為主檔中的股票名稱
+    """
+    security_master = get_security_master()
+    suffix_map = {}
+    name_map = {}
     
-    if daily_data is not None and weekly_data is not None:
-        logger.info(f"使用台灣證交所 API 成功獲取 {ticker} 的數據")
-        return daily_data, weekly_data, stock_info, None, "TWSE"
+    for ticker in tickers:
+        suffix_map[ticker] = security_master.get_yfinance_suffixes(ticker)
+        name = security_master.get_name(ticker)
+        if name:
+            name_map[ticker] = name
     
-    # 兩個數據源都失敗
-    return None, None, None, error_msg or "所有數據源都無法獲取數據", None
+    return suffix_map, name_map
 
 
-def get_stock_data_2years(ticker):
+def get_bulk_stock_history(tickers):
     """
-    獲取股票過去2年的歷史數據（用於計算支撐壓力位）
-    返回: (daily_data_2y, stock_info, error_msg, data_source) 或 (None, None, error_msg, None) 如果失敗
+    以單次 yfinance 多檔下載取得多檔股票過去2年的日線數據
+    
+    先用 resolve_market_suffixes 判斷每檔股票的後綴，再以 yf.download 一次下載
+    所有代碼，最後拆成每檔股票各自的 DataFrame。無法判斷市場的股票會同時下載
+    .TW 與 .TWO，取有數據的那一個。
+    
+    參數:
+        tickers: 股票代碼清單（4位數字）
+    
+    返回: dict，key 為股票代碼，value 為 (daily_data_2y, stock_info, error_msg, data_source)
+          只包含成功取得數據的股票
     """
-    if not YFINANCE_AVAILABLE:
-        # 使用台灣證交所 API 獲取2年數據
-        try:
-            logger.info(f"嘗試使用台灣證交所 API 獲取 {ticker} 的2年數據")
-            daily_data_2y = get_twse_stock_data(ticker, days=730)
-            
-            if daily_data_2y is None or daily_data_2y.empty:
-                return None, None, f"無法從台灣證交所獲取股票代碼 {ticker} 的2年數據", None
-            
-            # 獲取股票名稱
-            stock_info = {}
-            try:
-                url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY"
-                params = {
-                    'response': 'json',
-                    'date': datetime.now().strftime('%Y%m%d'),
-                    'stockNo': ticker
-                }
-                response = requests.get(url, params=params, timeout=30)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('stat') == 'OK' and 'title' in data:
-                        title = data['title']
-                        parts = title.split()
-                        if len(parts) >= 2:
-                            stock_info['longName'] = parts[1]
-            except:
-                pass
-            
-            logger.info(f"成功使用台灣證交所 API 獲取 {ticker} 的2年數據")
-            return daily_data_2y, stock_info, None, "TWSE"
-        except Exception as e:
-            return None, None, f"獲取2年數據時發生錯誤: {str(e)}", None
+    if not YFINANCE_AVAILABLE or not tickers:
+        return {}
+    
+    suffix_map, name_map = resolve_market_suffixes(tickers)
+    symbols = [f"{ticker}{suffix}" for ticker in tickers for suffix in suffix_map[ticker]]
     
-    # 優先使用 yfinance
     try:
-        tickers_to_try = [f"{ticker}.TW", f"{ticker}.TWO"]
-        
-        for ticker_with_suffix in tickers_to_try:
-            try:
-                logger.info(f"嘗試使用 yfinance 獲取 {ticker_with_suffix} 的2年數據")
-                stock = yf.Ticker(ticker_with_suffix)
-                
-                # 獲取過去2年的日線數據
-                daily_data_2y = stock.history(period="2y")
-                
-                if daily_data_2y is None or daily_data_2y.empty:
-                    logger.warning(f"yfinance 無法獲取 {ticker_with_suffix} 的2年數據")
+        logger.info(f"使用 yfinance 批次下載 {len(symbols)} 個代碼的2年數據")
+        with _YF_DOWNLOAD_LOCK:
+            data = yf.download(
+                symbols,
+                period="2y",
+                group_by='ticker',
+                auto_adjust=True,
+                actions=False,
+                threads=True,
+                progress=False,
+            )
+    except Exception as e:
+        logger.warning(f"yfinance 批次下載失敗: {str(e)}")
+        return {}
+    
+    if data is None or data.empty:
+        return {}
+    
+    histories = {}
+    for ticker in tickers:
+        for suffix in suffix_map[ticker]:
+            symbol = f"{ticker}{suffix}"
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
                     continue
-                
-                # 獲取股票資訊
-                stock_info = {}
-                try:
-                    info = stock.info
-                    if info:
-                        stock_info['longName'] = info.get('longName', info.get('shortName', ticker))
-                except:
-                    stock_info['longName'] = ticker
-                
-                logger.info(f"成功使用 yfinance 獲取 {ticker_with_suffix} 的2年數據")
-                return daily_data_2y, stock_info, None, "yfinance"
-                
-            except Exception as e:
-                logger.warning(f"yfinance 獲取 {ticker_with_suffix} 的2年數據失敗: {str(e)}")
+                frame = data[symbol]
+            else:
+                # 只下載一個代碼時欄位不分層
+                frame = data
+            
+            frame = frame[['Open', 'High', 'Low', 'Close', 'Volume']].dropna(subset=['Close'])
+            if frame.empty:
                 continue
-        
-        # yfinance 失敗，嘗試台灣證交所 API
-        logger.info(f"yfinance 失敗，嘗試使用台灣證交所 API 獲取 {ticker} 的2年數據")
-        daily_data_2y = get_twse_stock_data(ticker, days=730)
-        
-        if daily_data_2y is None or daily_data_2y.empty:
-            return None, None, f"無法從台灣證交所獲取股票代碼 {ticker} 的2年數據", None
-        
-        # 獲取股票名稱
-        stock_info = {}
-        try:
-            url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY"
-            params = {
-                'response': 'json',
-                'date': datetime.now().strftime('%Y%m%d'),
-                'stockNo': ticker
-            }
-            response = requests.get(url, params=params, timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('stat') == 'OK' and 'title' in data:
-                    title = data['title']
-                    parts = title.split()
-                    if len(parts) >= 2:
-                        stock_info['longName'] = parts[1]
-        except:
-            pass
-        
-        logger.info(f"成功使用台灣證交所 API 獲取 {ticker} 的2年數據")
-        return daily_data_2y, stock_info, None, "TWSE"
+            
+            stock_info = {'longName': name_map.get(ticker, ticker)}
+            histories[ticker] = (frame, stock_info, None, "yfinance")
+            break
     
-    except Exception as e:
-        return None, None, f"獲取2年數據時發生錯誤: {str(e)}", None
+    logger.info(f"yfinance 批次下載成功取得 {len(histories)}/{len(tickers)} 檔股票的數據")
+    return histories
+
+
+def get_stock_data_2years(ticker):
+    """
+    獲取股票過去2年的歷史數據（用於計算支撐壓力位）
+    返回: (daily_data_2y, stock_info, error_msg, data_source) 或 (None, None, error_msg, None) 如果失敗
+    """
+    return get_stock_history(ticker)
 
 
-def calculate_support_resistance_levels(daily_data_2y, current_price):
+def find_fractal_points(high, low, window=5):
+    """
+    找出分形高點與分形低點的位置（向量化實作）
+    
+    分形高點：最高價嚴格高於左右各 window 根K棒的最高價
+    分形低點：最低價嚴格低於左右各 window 根K棒的最低價
+    
+    以 sliding_window_view 一次取出每根K棒前後的視窗，
+    比較中心值與其餘 2*window 根的最大/最小值，取代逐根逐鄰居的 Python 迴圈。
+    
+    參數:
+        high: 最高價序列（由舊到新）
+        low: 最低價序列（由舊到新）
+        window: 左右各需比較的K棒數
+    
+    返回:
+        (fractal_high_idx, fractal_low_idx)：分形高點與分形低點的位置索引陣列
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    size = 2 * window + 1
+    
+    if len(high) < size:
+        empty = np.array([], dtype=int)
+        return empty, empty
+    
+    # 每一列是以第 (row + window) 根K棒為中心的視窗
+    high_windows = sliding_window_view(high, size)
+    low_windows = sliding_window_view(low, size)
+    
+    # 視窗中除了中心以外的其他K棒
+    neighbors = np.r_[0:window, window + 1:size]
+    # 缺值的鄰居不參與比較（與逐一比較時 NaN 比較結果為 False 的行為一致）
+    neighbor_high = np.where(np.isnan(high_windows[:, neighbors]), -np.inf, high_windows[:, neighbors]).max(axis=1)
+    neighbor_low = np.where(np.isnan(low_windows[:, neighbors]), np.inf, low_windows[:, neighbors]).min(axis=1)
+    
+    center_high = high_windows[:, window]
+    center_low = low_windows[:, window]
+    
+    fractal_high_idx = np.flatnonzero(center_high > neighbor_high) + window
+    fractal_low_idx = np.flatnonzero(center_low < neighbor_low) + window
+    
+    return fractal_high_idx, fractal_low_idx
+
+
+def calculate_support_resistance_levels(daily_data_2y, current_price, window=5):
     """
     計算多重分形支撐與壓力位（參考 TradingView Fractals 指標）
     
     參數:
         daily_data_2y: 過去2年的日線數據 (DataFrame)
         current_price: 當前價格
+        window: 分形判斷時左右各需比較的K棒數（預設 5）
     
     返回:
         dict 包含 R1, R2, R3, S1, S2, S3（多重支撐壓力位）
     """
     try:
-        if daily_data_2y is None or daily_data_2y.empty or len(daily_data_2y) < 11:
+        min_bars = 2 * window + 1
+        if daily_data_2y is None or daily_data_2y.empty or len(daily_data_2y) < min_bars:
             return {
                 'r1': None, 'r2': None, 'r3': None,
                 's1': None, 's2': None, 's3': None,
-                'error': '數據不足，無法計算支撐壓力位（需要至少11根K棒）'
+                'error': f'數據不足，無法計算支撐壓力位（需要至少{min_bars}根K棒）'
             }
         
         # 確保數據按日期排序（由舊到新）
         daily_data_2y = daily_data_2y.sort_index()
         
         # 1. 找出所有分形高點和分形低點（Fractals）
-        # 分形高點：高於左右各5根K棒的最高價
-        # 分形低點：低於左右各5根K棒的最低價
-        window = 5
+        # 分形高點：高於左右各 window 根K棒的最高價
+        # 分形低點：低於左右各 window 根K棒的最低價
+        highs = daily_data_2y['High'].to_numpy(dtype=float)
+        lows = daily_data_2y['Low'].to_numpy(dtype=float)
+        dates = daily_data_2y.index
         
-        fractal_highs = []  # 儲存 (日期, 價格)
-        fractal_lows = []   # 儲存 (日期, 價格)
+        fractal_high_idx, fractal_low_idx = find_fractal_points(highs, lows, window)
         
-        for i in range(window, len(daily_data_2y) - window):
-            current_high = daily_data_2y['High'].iloc[i]
-            current_low = daily_data_2y['Low'].iloc[i]
-            current_date = daily_data_2y.index[i]
-            
-            # 檢查是否為分形高點（高於左右各5根K棒）
-            is_fractal_high = True
-            for j in range(i - window, i + window + 1):
-                if j != i and daily_data_2y['High'].iloc[j] >= current_high:
-                    is_fractal_high = False
-                    break
-            
-            if is_fractal_high:
-                fractal_highs.append((current_date, current_high))
-            
-            # 檢查是否為分形低點（低於左右各5根K棒）
-            is_fractal_low = True
-            for j in range(i - window, i + window + 1):
-                if j != i and daily_data_2y['Low'].iloc[j] <= current_low:
-                    is_fractal_low = False
-                    break
-            
-            if is_fractal_low:
-                fractal_lows.append((current_date, current_low))
+        fractal_highs = [(dates[i], highs[i]) for i in fractal_high_idx]  # 儲存 (日期, 價格)
+        fractal_lows = [(dates[i], lows[i]) for i in fractal_low_idx]     # 儲存 (日期, 價格)
         
         # 2. 篩選與排序多重壓力位 (Resistances)
         # 找出所有 > 當前價格 的分形高點，由近到遠排序（按日期降序），取前3個
@@ -680,16 +783,31 @@ def get_stock_signals(ticker):
         }
     
     # 獲取股票數據：優先使用 yfinance，失敗後使用台灣證交所 API
-    daily_data, weekly_data, stock_info, error_msg, data_source = get_stock_data(ticker_clean)
+    daily_data_2y, stock_info, error_msg, data_source = get_stock_history(ticker_clean)
     
-    if daily_data is None or weekly_data is None:
+    if daily_data_2y is None or daily_data_2y.empty:
         error_detail = error_msg if error_msg else "未知錯誤"
         source_info = f"（已嘗試 yfinance 和台灣證交所 API）" if data_source is None else f"（使用 {data_source}）"
         return {
             "error": f"無法獲取股票代碼 {ticker_clean} 的數據{source_info}。\n錯誤詳情: {error_detail}\n\n請確認：\n1. 股票代碼是否正確（4位數字）\n2. 該股票是否為台股上市/上櫃股票\n3. 該股票是否仍在交易中"
         }
     
+    return calculate_stock_signals(ticker_clean, daily_data_2y, stock_info)
+
+
+def calculate_stock_signals(ticker_clean, daily_data_2y, stock_info):
+    """
+    由2年日線數據計算股票訊號（日/週 KD 金叉、站上 20MA、多重支撐壓力位）
+    
+    參數:
+        ticker_clean: 股票代碼（4位數字）
+        daily_data_2y: 過去2年的日線數據 (DataFrame)
+        stock_info: 股票資訊（包含 longName）
+    
+    返回: dict 包含各項訊號狀態或錯誤訊息
+    """
     try:
+        daily_data, weekly_data = split_daily_weekly(daily_data_2y)
         signals = {}
         
         # 計算日線 KDJ
@@ -771,30 +889,17 @@ def get_stock_signals(ticker):
         
         # 計算多重分形支撐與壓力位
         try:
-            # 獲取過去2年的歷史數據
-            daily_data_2y, stock_info_2y, error_msg_2y, data_source_2y = get_stock_data_2years(ticker_clean)
+            # 使用同一份2年數據計算多重支撐壓力位
+            support_resistance = calculate_support_resistance_levels(daily_data_2y, current_price)
             
-            if daily_data_2y is not None and not daily_data_2y.empty:
-                # 計算多重支撐壓力位
-                support_resistance = calculate_support_resistance_levels(daily_data_2y, current_price)
-                
-                # 將結果加入到 signals 字典
-                signals['r1'] = support_resistance.get('r1')
-                signals['r2'] = support_resistance.get('r2')
-                signals['r3'] = support_resistance.get('r3')
-                signals['s1'] = support_resistance.get('s1')
-                signals['s2'] = support_resistance.get('s2')
-                signals['s3'] = support_resistance.get('s3')
-                signals['support_resistance_error'] = support_resistance.get('error')
-            else:
-                # 無法獲取2年數據，設置為 None
-                signals['r1'] = None
-                signals['r2'] = None
-                signals['r3'] = None
-                signals['s1'] = None
-                signals['s2'] = None
-                signals['s3'] = None
-                signals['support_resistance_error'] = f"無法獲取2年歷史數據: {error_msg_2y}" if error_msg_2y else "無法獲取2年歷史數據"
+            # 將結果加入到 signals 字典
+            signals['r1'] = support_resistance.get('r1')
+            signals['r2'] = support_resistance.get('r2')
+            signals['r3'] = support_resistance.get('r3')
+            signals['s1'] = support_resistance.get('s1')
+            signals['s2'] = support_resistance.get('s2')
+            signals['s3'] = support_resistance.get('s3')
+            signals['support_resistance_error'] = support_resistance.get('error')
         except Exception as e:
             logger.error(f"計算多重支撐壓力位時發生錯誤: {str(e)}")
             signals['r1'] = None
@@ -849,3 +954,102 @@ def stock_signals():
 def signals_route():
     """股票訊號查詢路由"""
     return stock_signals()
+
+
+@signals_bp.route('/cache-stats', methods=['GET'])
+def cache_stats_route():
+    """證交所逐月快取的命中統計"""
+    return jsonify(get_twse_month_cache().stats())
+
+
+@signals_bp.route('/http-stats', methods=['GET'])
+def http_stats_route():
+    """共用 HTTP 用戶端的各主機延遲與連線重用統計"""
+    return jsonify(get_http_client().stats())
+
+
+def _to_json_safe(value):
+    """將訊號結果中的 numpy 型別轉為 JSON 可序列化的 Python 型別"""
+    if isinstance(value, dict):
+        return {k: _to_json_safe(v) for k, v in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _batch_signal_item(ticker, history=None):
+    """
+    計算單一股票的訊號，錯誤只影響該股票
+    有批次下載的數據時直接計算，否則逐檔向數據源獲取
+    """
+    try:
+        if history is not None:
+            daily_data_2y, stock_info, _, _ = history
+            signals = calculate_stock_signals(ticker, daily_data_2y, stock_info)
+        else:
+            signals = get_stock_signals(ticker)
+    except Exception as e:
+        signals = {"error": f"計算股票訊號時發生錯誤: {str(e)}"}
+    
+    if 'error' in signals:
+        return {'ticker': ticker, 'error': signals['error']}
+    return {'ticker': ticker, 'signals': _to_json_safe(signals)}
+
+
+@signals_bp.route('/batch', methods=['POST'])
+def signals_batch_route():
+    """
+    批次股票訊號查詢
+    
+    請求體: {"tickers": ["2330", "2317", ...], "stream": false}
+    - stream=false：全部完成後依輸入順序返回 {"results": [...], "summary": {...}}
+    - stream=true：以 NDJSON 逐行返回，每完成一檔就輸出一行
+    每個結果為 {"ticker": ..., "signals": {...}} 或 {"ticker": ..., "error": "..."}
+    """
+    data = request.get_json(silent=True) or {}
+    tickers = data.get('tickers')
+    stream = bool(data.get('stream', False))
+    
+    if not isinstance(tickers, list) or not tickers:
+        return jsonify({'error': '請提供 tickers 股票代碼清單'}), 400
+    
+    # 清理代碼並去除重複（保留輸入順序）
+    tickers_clean = []
+    for ticker in tickers:
+        ticker_clean = str(ticker).strip().upper().replace('.TWO', '').replace('.TW', '')
+        if ticker_clean and ticker_clean not in tickers_clean:
+            tickers_clean.append(ticker_clean)
+    
+    if len(tickers_clean) > SIGNALS_BATCH_MAX_TICKERS:
+        return jsonify({'error': f'單次最多查詢 {SIGNALS_BATCH_MAX_TICKERS} 檔股票'}), 400
+    
+    max_workers = min(SIGNALS_BATCH_WORKERS, len(tickers_clean))
+    valid_tickers = [t for t in tickers_clean if t.isdigit() and len(t) == 4]
+    
+    def run_batch():
+        # 先以單次 yfinance 多檔下載取得數據，取不到的股票再逐檔處理
+        histories = get_bulk_stock_history(valid_tickers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_batch_signal_item, t, histories.get(t)) for t in tickers_clean]
+            for future in as_completed(futures):
+                yield future.result()
+    
+    if stream:
+        def generate():
+            for item in run_batch():
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        
+        return Response(generate(), mimetype='application/x-ndjson')
+    
+    results_by_ticker = {item['ticker']: item for item in run_batch()}
+    results = [results_by_ticker[t] for t in tickers_clean]
+    
+    error_count = sum(1 for item in results if 'error' in item)
+    return jsonify({
+        'results': results,
+        'summary': {
+            'total': len(results),
+            'succeeded': len(results) - error_count,
+            'failed': error_count,
+        }
+    })
@@ -3,33 +3,300 @@
 提供族群熱度分析、注意股分析等功能
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 import sys
 import os
+import json
+import threading
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # 添加父目錄到路徑
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # 導入模組
-from modules.data_loader import (
-    load_supply_chain_json, 
-    load_today_topN, 
-    load_attention_stocks_from_web
+from modules.data_loader import load_attention_stocks_from_web
+from modules.theme_catalog import get_theme_catalog
+from modules.market_snapshot import get_market_snapshot_store
+from modules.http_cache import PrecomputedResponse, PrecomputedResponseCache
+from modules.theme_engine import (
+    ThemeHeatAccumulator,
+    ThemeHeatAccumulatorCache,
+    map_stock_to_themes,
+    calc_theme_heat,
+    today_members_by_theme,
 )
-from modules.theme_engine import map_stock_to_themes, calc_theme_heat
-from modules.report_builder import build_theme_report, get_theme_detail_for_display
+from modules.report_builder import build_theme_report, build_theme_detail, get_theme_detail_for_display
+from modules.analysis_store import get_analysis_store
+from modules.heat_history import get_heat_history
 
 theme_analysis_bp = Blueprint('theme_analysis', __name__)
 
+# 啟動時先載入族群定義，請求期間只在檔案變更時才重新讀取
+try:
+    get_theme_catalog().current()
+except Exception as e:
+    print(f"⚠️ 載入族群定義失敗: {str(e)}")
+
+
+
+def _record_heat_history(trading_date: str, universe_df: pd.DataFrame) -> None:
+    """
+    市場快照更新時記錄當日族群熱度（trading_date 為資料本身的交易日，每個交易日只記錄一次）。
+    既有歷史以其他族群定義版本記錄時（例如停機期間修改了族群定義），先以目前的定義重算。
+    """
+    catalog = get_theme_catalog().current()
+    get_heat_history().sync_day(trading_date, universe_df, catalog.index, catalog.version)
+
+
+def _rebase_heat_history(old_snapshot, new_snapshot) -> None:
+    """族群定義變更時在背景更新歷史熱度（只重算 Top N 含有變動成分股的交易日）"""
+    threading.Thread(
+        target=get_heat_history().rebase_catalog,
+        args=(old_snapshot.index, new_snapshot.index, old_snapshot.version, new_snapshot.version),
+        daemon=True,
+    ).start()
+
+
+try:
+    get_market_snapshot_store().add_refresh_listener(_record_heat_history)
+    get_theme_catalog().add_change_listener(_rebase_heat_history)
+except Exception as e:
+    print(f"⚠️ 註冊族群熱度歷史記錄失敗: {str(e)}")
+
+# 預先序列化/壓縮好的回應，鍵包含族群定義版本（及快照交易日），版本變更時自動失效
+_precomputed_responses = PrecomputedResponseCache()
+
+# 以快照交易日（及 Top N / 歷史天數）為鍵的族群熱度累加器；族群定義變更時只套用差異，不重新計算全部族群
+_heat_accumulators = ThemeHeatAccumulatorCache()
+
+# 注意股抓取與週轉率資料抓取同時進行（由背景執行緒池執行）
+# 每個請求執行緒最多佔用一個背景執行緒，因此預設與 gunicorn 執行緒數相同，避免負載高時排隊
+ATTENTION_WORKERS = int(os.environ.get("ATTENTION_WORKERS", os.environ.get("GUNICORN_THREADS", 16)))
+_attention_executor = ThreadPoolExecutor(max_workers=ATTENTION_WORKERS, thread_name_prefix="attention")
+
+
+def _is_truthy(value) -> bool:
+    """請求參數的布林值：只接受 true 或 "true"/"1"/"yes"（"false" 等字串視為 False）"""
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return value is True
+
+
+def _turnover_stock_item(row: dict) -> dict:
+    """將股票資料列整理為回傳格式（code 補零、數值缺值轉為 None）"""
+    turnover = row.get('turnover')
+    chg_pct = row.get('chg_pct')
+    return {
+        'code': str(row["code"]).zfill(4),
+        'name': row.get('name', ''),
+        'turnover': float(turnover) if pd.notna(turnover) else None,
+        'chg_pct': float(chg_pct) if pd.notna(chg_pct) else None,
+    }
+
+
+def _analyze_attention_stocks(themes_data) -> dict:
+    """
+    抓取注意股並進行族群映射（在背景執行緒中執行，與週轉率資料抓取同時進行）。
+
+    Returns:
+        字典，包含 focus_df, focus_for_theme, focus_stock_to_themes, focus_report_data；
+        抓取或映射失敗時只保留已取得的部分
+    """
+    focus_df = pd.DataFrame()
+    focus_for_theme = pd.DataFrame()
+    focus_report_data = None
+    focus_stock_to_themes = {}
+    
+    try:
+        focus_df = load_attention_stocks_from_web()
+        if not focus_df.empty:
+            # 標準化代碼格式
+            focus_df['code'] = focus_df['code'].astype(str).str.strip()
+            
+            # 為注意股建立標準化代碼欄位（用於族群映射）
+            # 只對 4 位代碼的注意股進行族群映射（6 位代碼是權證，不在族群定義中）
+            focus_df['code_normalized'] = focus_df['code'].apply(
+                lambda x: x.zfill(4) if len(x) <= 4 else ''
+            )
+            
+            # 建立一個用於族群分析的 DataFrame（只包含一般股票，排除權證）
+            focus_for_theme = focus_df[focus_df['code_normalized'] != ''].copy()
+            focus_for_theme['code'] = focus_for_theme['code_normalized']
+            
+            if not focus_for_theme.empty:
+                # 獨立對所有注意股進行族群映射（不需要週轉率資料）
+                focus_stock_to_themes = map_stock_to_themes(focus_for_theme, themes_data)
+                focus_theme_heat_df = calc_theme_heat(focus_for_theme, focus_stock_to_themes)
+                focus_report_data = build_theme_report(
+                    focus_for_theme, focus_theme_heat_df, focus_stock_to_themes, themes_data
+                )
+            
+            # 移除臨時欄位
+            if 'code_normalized' in focus_df.columns:
+                focus_df = focus_df.drop(columns=['code_normalized'])
+    except Exception as e:
+        # 注意股載入失敗不影響主流程，但記錄錯誤以便調試
+        import traceback
+        print(f"注意股載入失敗: {str(e)}")
+        print(traceback.format_exc())
+    
+    return {
+        'focus_df': focus_df,
+        'focus_for_theme': focus_for_theme,
+        'focus_stock_to_themes': focus_stock_to_themes,
+        'focus_report_data': focus_report_data,
+    }
+
+
+def _build_turnover_report(stocks_df: pd.DataFrame, themes_data, theme_heat_df: pd.DataFrame = None) -> tuple:
+    """
+    建立週轉率族群熱度報告（回傳格式）。
+
+    Args:
+        stocks_df: 週轉率前 N 名
+        themes_data: 族群資料（或 ThemeIndex）
+        theme_heat_df: 已由累加器取得的族群熱度，None 時以 calc_theme_heat() 計算
+
+    Returns:
+        (turnover_report, turnover_report_data)；後者為 build_theme_report() 的原始結果
+    """
+    # 計算族群對應與熱度
+    stock_to_themes = map_stock_to_themes(stocks_df, themes_data)
+    if theme_heat_df is None:
+        theme_heat_df = calc_theme_heat(stocks_df, stock_to_themes)
+    
+    # 建立報告
+    turnover_report_data = build_theme_report(
+        stocks_df, theme_heat_df, stock_to_themes, themes_data
+    )
+    
+    # 計算平均週轉率
+    avg_turnover = float(stocks_df['turnover'].mean()) if not stocks_df.empty else 0.0
+    
+    # 準備週轉率前N名清單
+    turnover_stocks_list = [_turnover_stock_item(row) for row in stocks_df.to_dict('records')]
+    
+    # 為每個族群準備個股清單（直接使用報告中已分組好的結果）
+    theme_stocks_map = {}
+    for theme_name in turnover_report_data['theme_heat_ranking']['theme_name'].tolist():
+        theme_stocks = turnover_report_data['theme_stocks'].get(theme_name, [])
+        if theme_stocks:
+            theme_stocks_map[theme_name] = [_turnover_stock_item(row) for row in theme_stocks]
+    
+    turnover_report = {
+        'summary': {
+            'total_stocks': turnover_report_data['summary']['total_stocks'],
+            'total_themes': turnover_report_data['summary']['total_themes'],
+            'avg_turnover': avg_turnover
+        },
+        'theme_heat_ranking': turnover_report_data['theme_heat_ranking'].to_dict('records'),
+        'theme_stocks': theme_stocks_map,  # 每個族群的個股清單
+        'turnover_stocks_list': turnover_stocks_list,  # 週轉率前N名清單
+        'unclassified_stocks': []
+    }
+    
+    # 找出未分類股票
+    for item in turnover_stocks_list:
+        if not stock_to_themes.get(item['code'], []):
+            turnover_report['unclassified_stocks'].append(item.copy())
+    
+    return turnover_report, turnover_report_data
+
+
+def _build_focus_report(attention: dict) -> dict:
+    """
+    由 _analyze_attention_stocks() 的結果建立注意股報告（回傳格式）。
+
+    Returns:
+        注意股報告字典；沒有注意股資料時返回 None
+    """
+    focus_df = attention['focus_df']
+    focus_for_theme = attention['focus_for_theme']
+    focus_stock_to_themes = attention['focus_stock_to_themes']
+    focus_report_data = attention['focus_report_data']
+    
+    if focus_df.empty:
+        return None
+    
+    # 準備注意股清單（直接使用爬取的資料）
+    focus_stocks_list = []
+    
+    # 遍歷 focus_df，使用爬取的資料
+    for row in focus_df.to_dict('records'):
+        focus_stocks_list.append({
+            'code': str(row["code"]).strip(),  # 保持原始代碼格式，不強制補零（因為代碼不一定是4碼）
+            'name': row.get('name', ''),
+            'detail': row.get('detail', ''),  # 事項描述（從爬取的資料中取得）
+        })
+    
+    # 計算一般股票（非權證）的注意股數量
+    normal_stock_count = len([s for s in focus_stocks_list if len(s['code']) <= 4])
+    
+    # 為每個注意股族群準備個股清單
+    focus_theme_stocks_map = {}
+    theme_heat_ranking = []
+    unclassified_stocks = []
+    
+    if focus_report_data:
+        theme_heat_ranking = focus_report_data['theme_heat_ranking'].to_dict('records')
+        
+        # 代碼 -> 名稱查詢表（同一代碼以第一筆為準），取代逐檔過濾 focus_df
+        focus_codes = focus_df['code'].str.zfill(4)
+        is_first = ~focus_codes.duplicated()
+        focus_name_by_code = dict(zip(focus_codes[is_first], focus_df.loc[is_first, 'name']))
+        
+        for theme_name in focus_report_data['theme_heat_ranking']['theme_name'].tolist():
+            theme_stocks = focus_report_data['theme_stocks'].get(theme_name, [])
+            if theme_stocks:
+                focus_theme_stocks_map[theme_name] = []
+                for stock_row in theme_stocks:
+                    stock_code = str(stock_row["code"]).zfill(4)
+                    focus_theme_stocks_map[theme_name].append({
+                        'code': stock_code,
+                        'name': focus_name_by_code.get(stock_code, stock_row.get('name', '')),
+                    })
+        
+        # 找出未分類注意股（一般股票中不屬於任何族群的）
+        for row in focus_for_theme.to_dict('records'):
+            stock_code = str(row["code"]).zfill(4)
+            if not focus_stock_to_themes.get(stock_code, []):
+                unclassified_stocks.append({
+                    'code': stock_code,
+                    'name': focus_name_by_code.get(stock_code, row.get('name', '')),
+                })
+    
+    return {
+        'summary': {
+            'total_focus_stocks': len(focus_df),
+            'normal_stock_count': normal_stock_count,  # 一般股票（非權證）數量
+            'classified_themes': len(theme_heat_ranking)  # 涉及的族群數
+        },
+        'theme_heat_ranking': theme_heat_ranking,
+        'theme_stocks': focus_theme_stocks_map,  # 每個族群的個股清單
+        'focus_stocks_list': focus_stocks_list,  # 注意股清單
+        'unclassified_stocks': unclassified_stocks  # 未分類注意股
+    }
+
 
 @theme_analysis_bp.route('/analyze', methods=['POST'])
 def analyze():
-    """分析族群熱度"""
+    """
+    分析族群熱度
+    
+    請求體: {"top_n": 50, "stream": false}
+    - stream=false：全部完成後返回 {"analysis_id", "turnover_report", "focus_report"}
+    - stream=true：以 NDJSON 逐行返回，週轉率報告完成即先輸出，注意股報告完成後再輸出：
+      {"section": "turnover_report", "analysis_id": ..., "data": {...}}
+      {"section": "focus_report", "data": {...} 或 null}
+      {"section": "done"}
+    注意股（MoneyDJ）抓取與週轉率資料抓取同時進行。
+    """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         top_n = data.get('top_n', None)
+        stream = _is_truthy(data.get('stream', False))
         
         if top_n:
             try:
@@ -39,200 +306,64 @@ def analyze():
             except ValueError:
                 return jsonify({'error': 'top_n 必須是有效的數字'}), 400
         
-        # 載入週轉率資料
-        stocks_df = load_today_topN(top_n=top_n, source="api")
-        if stocks_df.empty:
-            return jsonify({'error': '無法載入週轉率資料'}), 500
+        # 取得族群定義（已載入並建立索引，檔案變更時才重新載入）
+        catalog = get_theme_catalog().current()
+        themes_data = catalog.index
         
-        # 載入族群定義
-        themes_data = load_supply_chain_json()
-        
-        # 如果指定了 top_n，限制資料
-        if top_n and top_n > 0:
-            stocks_df = stocks_df.head(top_n).copy()
-        
-        # 計算族群對應與熱度
-        stock_to_themes = map_stock_to_themes(stocks_df, themes_data)
-        theme_heat_df = calc_theme_heat(stocks_df, stock_to_themes)
-        
-        # 建立報告
-        turnover_report_data = build_theme_report(
-            stocks_df, theme_heat_df, stock_to_themes, themes_data
-        )
-        
-        # 嘗試載入注意股
-        focus_df = pd.DataFrame()
-        focus_report_data = None
-        focus_stock_to_themes = {}
+        # 注意股抓取與族群映射在背景進行，不必等週轉率資料
+        attention_future = _attention_executor.submit(_analyze_attention_stocks, themes_data)
         
         try:
-            focus_df = load_attention_stocks_from_web()
-            if not focus_df.empty:
-                # 標準化代碼格式
-                focus_df['code'] = focus_df['code'].astype(str).str.strip()
-                
-                # 為注意股建立標準化代碼欄位（用於族群映射）
-                # 只對 4 位代碼的注意股進行族群映射（6 位代碼是權證，不在族群定義中）
-                focus_df['code_normalized'] = focus_df['code'].apply(
-                    lambda x: x.zfill(4) if len(x) <= 4 else ''
-                )
-                
-                # 建立一個用於族群分析的 DataFrame（只包含一般股票，排除權證）
-                focus_for_theme = focus_df[focus_df['code_normalized'] != ''].copy()
-                focus_for_theme['code'] = focus_for_theme['code_normalized']
-                
-                if not focus_for_theme.empty:
-                    # 獨立對所有注意股進行族群映射（不需要週轉率資料）
-                    focus_stock_to_themes = map_stock_to_themes(focus_for_theme, themes_data)
-                    focus_theme_heat_df = calc_theme_heat(focus_for_theme, focus_stock_to_themes)
-                    focus_report_data = build_theme_report(
-                        focus_for_theme, focus_theme_heat_df, focus_stock_to_themes, themes_data
-                    )
-                
-                # 移除臨時欄位
-                if 'code_normalized' in focus_df.columns:
-                    focus_df = focus_df.drop(columns=['code_normalized'])
-        except Exception as e:
-            # 注意股載入失敗不影響主流程，但記錄錯誤以便調試
-            import traceback
-            print(f"注意股載入失敗: {str(e)}")
-            print(traceback.format_exc())
-        
-        # 計算平均週轉率
-        avg_turnover = float(stocks_df['turnover'].mean()) if not stocks_df.empty else 0.0
-        
-        # 準備週轉率前N名清單
-        turnover_stocks_list = []
-        for _, row in stocks_df.iterrows():
-            stock_code = str(row["code"]).zfill(4)
-            turnover_stocks_list.append({
-                'code': stock_code,
-                'name': row.get('name', ''),
-                'turnover': float(row.get('turnover', 0)) if pd.notna(row.get('turnover')) else None,
-                'chg_pct': float(row.get('chg_pct', 0)) if pd.notna(row.get('chg_pct')) else None,
-            })
+            # 載入週轉率資料（當日市場快照的前 N 名，預設 50）
+            top_n = top_n or 50
+            stocks_df, trading_date = get_market_snapshot_store().get_top_n_with_date(top_n)
+            if stocks_df.empty:
+                # 不會用到注意股結果，尚未開始的抓取直接取消
+                attention_future.cancel()
+                return jsonify({'error': '無法載入週轉率資料'}), 500
+            
+            # 同一份快照的累加器跨請求沿用，族群定義變更後只重算受影響的族群
+            accumulator = _heat_accumulators.get_or_build(
+                ("top-n", trading_date, top_n), stocks_df, lambda: ThemeHeatAccumulator(stocks_df, themes_data)
+            )
+            turnover_report, turnover_report_data = _build_turnover_report(
+                stocks_df, themes_data, accumulator.heat_frame(themes_data)
+            )
+            
+            # 暫存各族群今日成員，之後查詢族群詳細資訊只需帶 analysis_id
+            analysis_id = get_analysis_store().put(
+                catalog, today_members_by_theme(turnover_report_data['theme_stocks'])
+            )
+        except Exception:
+            attention_future.cancel()
+            raise
         
-        # 為每個族群準備個股清單
-        theme_stocks_map = {}
-        for theme_name in turnover_report_data['theme_heat_ranking']['theme_name'].tolist():
-            # 取得該族群在 Top N 中實際出現的股票
-            from modules.theme_engine import get_stocks_in_theme
-            theme_stocks = get_stocks_in_theme(stocks_df, stock_to_themes, theme_name)
-            if not theme_stocks.empty:
-                theme_stocks_map[theme_name] = []
-                for _, stock_row in theme_stocks.iterrows():
-                    stock_code = str(stock_row["code"]).zfill(4)
-                    theme_stocks_map[theme_name].append({
-                        'code': stock_code,
-                        'name': stock_row.get('name', ''),
-                        'turnover': float(stock_row.get('turnover', 0)) if pd.notna(stock_row.get('turnover')) else None,
-                        'chg_pct': float(stock_row.get('chg_pct', 0)) if pd.notna(stock_row.get('chg_pct')) else None,
-                    })
+        if stream:
+            def generate():
+                yield json.dumps({
+                    'section': 'turnover_report',
+                    'analysis_id': analysis_id,
+                    'data': turnover_report,
+                }, ensure_ascii=False) + "\n"
+                try:
+                    focus_report = _build_focus_report(attention_future.result())
+                    yield json.dumps({'section': 'focus_report', 'data': focus_report}, ensure_ascii=False) + "\n"
+                except Exception as e:
+                    yield json.dumps({'section': 'error', 'error': f'注意股分析失敗: {str(e)}'}, ensure_ascii=False) + "\n"
+                yield json.dumps({'section': 'done'}) + "\n"
+            
+            return Response(generate(), mimetype='application/x-ndjson')
         
         # 準備返回資料
         result = {
-            'turnover_report': {
-                'summary': {
-                    'total_stocks': turnover_report_data['summary']['total_stocks'],
-                    'total_themes': turnover_report_data['summary']['total_themes'],
-                    'avg_turnover': avg_turnover
-                },
-                'theme_heat_ranking': turnover_report_data['theme_heat_ranking'].to_dict('records'),
-                'theme_stocks': theme_stocks_map,  # 每個族群的個股清單
-                'turnover_stocks_list': turnover_stocks_list,  # 週轉率前N名清單
-                'unclassified_stocks': []
-            }
+            'analysis_id': analysis_id,
+            'turnover_report': turnover_report
         }
         
-        # 找出未分類股票
-        for _, row in stocks_df.iterrows():
-            stock_code = str(row["code"]).zfill(4)
-            themes = stock_to_themes.get(stock_code, [])
-            if not themes:
-                result['turnover_report']['unclassified_stocks'].append({
-                    'code': stock_code,
-                    'name': row.get('name', ''),
-                    'turnover': float(row.get('turnover', 0)) if pd.notna(row.get('turnover')) else None,
-                    'chg_pct': float(row.get('chg_pct', 0)) if pd.notna(row.get('chg_pct')) else None,
-                })
-        
         # 如果有注意股資料，獨立分析族群熱度
-        if not focus_df.empty:
-            # 準備注意股清單（直接使用爬取的資料）
-            focus_stocks_list = []
-            
-            # 遍歷 focus_df，使用爬取的資料
-            for _, row in focus_df.iterrows():
-                # 保持原始代碼格式，不強制補零（因為代碼不一定是4碼）
-                stock_code = str(row["code"]).strip()
-                stock_name = row.get('name', '')
-                # 直接使用爬取的事項描述
-                detail = row.get('detail', '') if 'detail' in row.index else ''
-                
-                focus_stocks_list.append({
-                    'code': stock_code,  # 使用原始代碼格式
-                    'name': stock_name,
-                    'detail': detail,  # 事項描述（從爬取的資料中取得）
-                })
-            
-            # 計算一般股票（非權證）的注意股數量
-            normal_stock_count = len([s for s in focus_stocks_list if len(s['code']) <= 4])
-            
-            # 為每個注意股族群準備個股清單
-            focus_theme_stocks_map = {}
-            theme_heat_ranking = []
-            unclassified_stocks = []
-            
-            if focus_report_data:
-                theme_heat_ranking = focus_report_data['theme_heat_ranking'].to_dict('records')
-                
-                # 建立一個用於查詢的 DataFrame
-                focus_for_theme = focus_df.copy()
-                focus_for_theme['code_normalized'] = focus_for_theme['code'].apply(
-                    lambda x: x.zfill(4) if len(x) <= 4 else ''
-                )
-                focus_for_theme = focus_for_theme[focus_for_theme['code_normalized'] != '']
-                focus_for_theme['code'] = focus_for_theme['code_normalized']
-                
-                for theme_name in focus_report_data['theme_heat_ranking']['theme_name'].tolist():
-                    from modules.theme_engine import get_stocks_in_theme
-                    theme_stocks = get_stocks_in_theme(focus_for_theme, focus_stock_to_themes, theme_name)
-                    if not theme_stocks.empty:
-                        focus_theme_stocks_map[theme_name] = []
-                        for _, stock_row in theme_stocks.iterrows():
-                            stock_code = str(stock_row["code"]).zfill(4)
-                            # 從原始 focus_df 中查找名稱
-                            orig_row = focus_df[focus_df['code'].str.zfill(4) == stock_code]
-                            stock_name = orig_row.iloc[0].get('name', '') if not orig_row.empty else stock_row.get('name', '')
-                            focus_theme_stocks_map[theme_name].append({
-                                'code': stock_code,
-                                'name': stock_name,
-                            })
-                
-                # 找出未分類注意股（一般股票中不屬於任何族群的）
-                for _, row in focus_for_theme.iterrows():
-                    stock_code = str(row["code"]).zfill(4)
-                    themes = focus_stock_to_themes.get(stock_code, [])
-                    if not themes:
-                        # 從原始 focus_df 中查找名稱
-                        orig_row = focus_df[focus_df['code'].str.zfill(4) == stock_code]
-                        stock_name = orig_row.iloc[0].get('name', '') if not orig_row.empty else row.get('name', '')
-                        unclassified_stocks.append({
-                            'code': stock_code,
-                            'name': stock_name,
-                        })
-            
-            result['focus_report'] = {
-                'summary': {
-                    'total_focus_stocks': len(focus_df),
-                    'normal_stock_count': normal_stock_count,  # 一般股票（非權證）數量
-                    'classified_themes': len(theme_heat_ranking)  # 涉及的族群數
-                },
-                'theme_heat_ranking': theme_heat_ranking,
-                'theme_stocks': focus_theme_stocks_map,  # 每個族群的個股清單
-                'focus_stocks_list': focus_stocks_list,  # 注意股清單
-                'unclassified_stocks': unclassified_stocks  # 未分類注意股
-            }
+        focus_report = _build_focus_report(attention_future.result())
+        if focus_report is not None:
+            result['focus_report'] = focus_report
         
         return jsonify(result)
         
@@ -242,17 +373,37 @@ def analyze():
 
 @theme_analysis_bp.route('/theme-detail', methods=['POST'])
 def theme_detail():
-    """取得族群詳細資訊"""
+    """
+    取得族群詳細資訊
+
+    請求內容為 {analysis_id, theme_name}（使用 /analyze 暫存的結果），
+    或舊格式 {theme_name, stocks_df}（由前端上傳股票資料）。
+    """
     try:
         data = request.get_json()
         theme_name = data.get('theme_name')
+        analysis_id = data.get('analysis_id')
         stocks_df = data.get('stocks_df')  # 應該是 JSON 格式的 DataFrame
         
         if not theme_name:
             return jsonify({'error': '請提供 theme_name'}), 400
         
-        # 載入族群定義
-        themes_data = load_supply_chain_json()
+        if analysis_id:
+            analysis = get_analysis_store().get(analysis_id)
+            if analysis is None:
+                return jsonify({'error': '分析結果不存在或已過期，請重新分析'}), 404
+            
+            # 由其他 worker 暫存的結果只有族群定義版本，改用目前載入的族群定義
+            catalog = analysis.catalog or get_theme_catalog().current()
+            theme_detail_data = build_theme_detail(
+                theme_name, catalog.index, analysis.today_members.get(theme_name, [])
+            )
+            if not theme_detail_data:
+                return jsonify({'error': f'找不到族群: {theme_name}'}), 404
+            return jsonify(theme_detail_data)
+        
+        # 取得族群定義（已載入並建立索引，檔案變更時才重新載入）
+        themes_data = get_theme_catalog().current().index
         
         # 如果有 stocks_df，轉換為 DataFrame
         today_df = pd.DataFrame(stocks_df) if stocks_df else pd.DataFrame()
@@ -276,39 +427,161 @@ def theme_detail():
         return jsonify({'error': f'取得族群詳細資訊失敗: {str(e)}'}), 500
 
 
+@theme_analysis_bp.route('/theme-detail', methods=['GET'])
+def theme_detail_snapshot():
+    """
+    以當日市場快照取得族群詳細資訊（支援 ETag / gzip）。
+
+    Query 參數：theme_name（必填）、top_n（預設 50）。
+    同一族群定義版本、快照交易日與 top_n 下內容不變，只計算一次。
+    """
+    try:
+        theme_name = request.args.get('theme_name', '').strip()
+        if not theme_name:
+            return jsonify({'error': '請提供 theme_name'}), 400
+        
+        try:
+            top_n = int(request.args.get('top_n', 50))
+            if top_n < 1:
+                return jsonify({'error': 'top_n 必須大於 0'}), 400
+        except ValueError:
+            return jsonify({'error': 'top_n 必須是有效的數字'}), 400
+        
+        catalog = get_theme_catalog().current()
+        if catalog.index.is_legacy or not catalog.index.get_sector(theme_name):
+            return jsonify({'error': f'找不到族群: {theme_name}'}), 404
+        
+        # 資料與交易日需來自同一份快照，快取鍵才會與內容對應
+        today_df, trading_date = get_market_snapshot_store().get_top_n_with_date(top_n)
+        
+        def build():
+            stock_to_themes = map_stock_to_themes(today_df, catalog.index)
+            return PrecomputedResponse(get_theme_detail_for_display(
+                theme_name, today_df, catalog.index, stock_to_themes
+            ))
+        
+        cached = _precomputed_responses.get_or_build(
+            ("theme-detail", catalog.version, trading_date, theme_name, top_n), build
+        )
+        return cached.to_response()
+        
+    except Exception as e:
+        return jsonify({'error': f'取得族群詳細資訊失敗: {str(e)}'}), 500
+
+
+def _build_theme_list(themes_data) -> list:
+    """將族群定義整理為族群清單（名稱、說明、成分股數）"""
+    # 判斷格式
+    themes_list = []
+    if isinstance(themes_data, list):
+        themes_list = themes_data
+    elif "themes" in themes_data:
+        themes_list = themes_data.get("themes", [])
+    elif "popular_sectors" in themes_data:
+        themes_list = themes_data.get("popular_sectors", [])
+    else:
+        themes_list = themes_data.get("族群清單", [])
+    
+    # 格式化返回資料
+    result = []
+    for theme_info in themes_list:
+        if isinstance(theme_info, dict):
+            theme_name = theme_info.get("theme") or theme_info.get("sector_name") or theme_info.get("族群名稱", "")
+            description = theme_info.get("description", "")
+            stocks = theme_info.get("stocks", [])
+            
+            result.append({
+                'theme_name': theme_name,
+                'description': description,
+                'stock_count': len(stocks) if isinstance(stocks, list) else 0
+            })
+    return result
+
+
 @theme_analysis_bp.route('/theme-list', methods=['GET'])
 def theme_list():
-    """取得所有族群清單"""
+    """取得所有族群清單（依族群定義版本預先產生，支援 ETag / gzip）"""
     try:
-        themes_data = load_supply_chain_json()
-        
-        # 判斷格式
-        themes_list = []
-        if isinstance(themes_data, list):
-            themes_list = themes_data
-        elif "themes" in themes_data:
-            themes_list = themes_data.get("themes", [])
-        elif "popular_sectors" in themes_data:
-            themes_list = themes_data.get("popular_sectors", [])
-        else:
-            themes_list = themes_data.get("族群清單", [])
-        
-        # 格式化返回資料
-        result = []
-        for theme_info in themes_list:
-            if isinstance(theme_info, dict):
-                theme_name = theme_info.get("theme") or theme_info.get("sector_name") or theme_info.get("族群名稱", "")
-                description = theme_info.get("description", "")
-                stocks = theme_info.get("stocks", [])
-                
-                result.append({
-                    'theme_name': theme_name,
-                    'description': description,
-                    'stock_count': len(stocks) if isinstance(stocks, list) else 0
-                })
-        
-        return jsonify({'themes': result})
+        catalog = get_theme_catalog().current()
+        cached = _precomputed_responses.get_or_build(
+            ("theme-list", catalog.version),
+            lambda: PrecomputedResponse({'themes': _build_theme_list(catalog.data)}),
+        )
+        return cached.to_response()
         
     except Exception as e:
         return jsonify({'error': f'取得族群清單失敗: {str(e)}'}), 500
 
+
+@theme_analysis_bp.route('/trend', methods=['GET'])
+def theme_trend():
+    """
+    族群熱度趨勢
+    
+    Query 參數：
+    - days: 最近幾個交易日（預設 20，最多 750）
+    - theme: 指定族群（可重複帶入多個，省略表示全部）
+    - limit: 最多返回幾個族群（依最新排名）
+    """
+    try:
+        try:
+            days = int(request.args.get('days', 20))
+            limit = request.args.get('limit')
+            limit = int(limit) if limit else None
+        except ValueError:
+            return jsonify({'error': 'days / limit 必須是有效的數字'}), 400
+        if days < 1 or days > 750:
+            return jsonify({'error': 'days 必須介於 1 到 750'}), 400
+        
+        themes = [t for t in request.args.getlist('theme') if t.strip()] or None
+        return jsonify(get_heat_history().get_trend(days=days, themes=themes, limit=limit))
+        
+    except Exception as e:
+        return jsonify({'error': f'取得族群熱度趨勢失敗: {str(e)}'}), 500
+
+
+@theme_analysis_bp.route('/market-heat', methods=['GET'])
+def market_heat():
+    """
+    全市場族群熱度（所有上市櫃股票，而非週轉率前 N 名）
+    
+    Query 參數：history_days - 計算個股週轉率 z 分數的歷史天數（預設 60，最多 250）
+    同一族群定義版本與快照交易日下只計算一次（支援 ETag / gzip）。
+    """
+    try:
+        try:
+            history_days = int(request.args.get('history_days', 60))
+        except ValueError:
+            return jsonify({'error': 'history_days 必須是有效的數字'}), 400
+        if history_days < 1 or history_days > 250:
+            return jsonify({'error': 'history_days 必須介於 1 到 250'}), 400
+        
+        catalog = get_theme_catalog().current()
+        # 資料與交易日需來自同一份快照，快取鍵才會與內容對應
+        universe_df, trading_date = get_market_snapshot_store().get_universe_with_date()
+        
+        def build():
+            # 族群定義變更時沿用同一份快照的累加器，只重算成分股有變動的族群
+            accumulator = _heat_accumulators.get_or_build(
+                ("market", trading_date, history_days),
+                universe_df,
+                lambda: ThemeHeatAccumulator(
+                    universe_df, catalog.index, get_heat_history().turnover_baseline(trading_date, days=history_days)
+                ),
+            )
+            heat_df = accumulator.market_heat_frame(catalog.index)
+            heat_df = heat_df.astype(object).where(heat_df.notna(), None)
+            return PrecomputedResponse({
+                'trading_date': trading_date,
+                'total_stocks': len(universe_df),
+                'history_days': history_days,
+                'themes': heat_df.to_dict('records'),
+            })
+        
+        cached = _precomputed_responses.get_or_build(
+            ("market-heat", catalog.version, trading_date, history_days), build
+        )
+        return cached.to_response()
+        
+    except Exception as e:
+        return jsonify({'error': f'計算全市場族群熱度失敗: {str(e)}'}), 500
@@ -0,0 +1,32 @@
+"""
+測試共用的 fixture
+"""
+
+import sqlite3
+
+import pytest
+
+
+class _TrackedConnection(sqlite3.Connection):
+    """記錄是否已關閉的 SQLite 連線"""
+
+    closed = False
+
+    def close(self):
+        self.closed = True
+        super().close()
+
+
+@pytest.fixture
+def sqlite_connections(monkeypatch):
+    """記錄測試期間開啟的所有 SQLite 連線（用於確認連線都已關閉）"""
+    opened = []
+    connect = sqlite3.connect
+
+    def tracked_connect(*args, **kwargs):
+        conn = connect(*args, factory=_TrackedConnection, **kwargs)
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", tracked_connect)
+    return opened
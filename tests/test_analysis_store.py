@@ -0,0 +1,42 @@
+"""
+分析結果暫存測試
+/analyze 與 /theme-detail 可能由不同的 gunicorn worker 處理，分析 ID 應可跨行程取回。
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.analysis_store import AnalysisStore
+
+
+class _Catalog:
+    version = "abc123"
+    index = {}
+
+
+MEMBERS = {"半導體": [{"ticker": "2330", "name": "台積電", "turnover": 1.5, "chg_pct": None, "is_focus": True}]}
+
+
+def test_other_worker_reads_analysis(tmp_path):
+    analysis_id = AnalysisStore(store_dir=str(tmp_path)).put(_Catalog(), MEMBERS)
+
+    # 另一個 worker 行程：行程內快取是空的，從資料庫取回
+    analysis = AnalysisStore(store_dir=str(tmp_path)).get(analysis_id)
+    assert analysis is not None
+    assert analysis.catalog is None
+    assert analysis.catalog_version == "abc123"
+    assert analysis.today_members == MEMBERS
+
+
+def test_expired_analysis_is_gone(tmp_path):
+    analysis_id = AnalysisStore(store_dir=str(tmp_path), ttl=-1).put(_Catalog(), MEMBERS)
+    assert AnalysisStore(store_dir=str(tmp_path), ttl=-1).get(analysis_id) is None
+    assert AnalysisStore(store_dir=str(tmp_path)).get("missing") is None
+
+
+def test_connections_are_closed(tmp_path, sqlite_connections):
+    store = AnalysisStore(store_dir=str(tmp_path))
+    analysis_id = store.put(_Catalog(), MEMBERS)
+    assert AnalysisStore(store_dir=str(tmp_path)).get(analysis_id) is not None
+    assert sqlite_connections and all(conn.closed for conn in sqlite_connections)
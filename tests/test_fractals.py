@@ -0,0 +1,113 @@
+"""
+分形支撐壓力位的等價性測試
+以原本逐根逐鄰居比較的迴圈實作為基準，確認向量化的 find_fractal_points
+與 calculate_support_resistance_levels 在隨機合成的 10 年日線上結果完全相同。
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from routes.stock_signals_routes import adjust_to_tick, calculate_support_resistance_levels, find_fractal_points
+
+TRADING_DAYS_10Y = 2500
+
+
+def _reference_fractals(daily_data, window=5):
+    """原本的迴圈實作（逐根以 iloc 與左右各 window 根比較）"""
+    fractal_highs = []
+    fractal_lows = []
+    for i in range(window, len(daily_data) - window):
+        current_high = daily_data['High'].iloc[i]
+        current_low = daily_data['Low'].iloc[i]
+
+        is_fractal_high = True
+        for j in range(i - window, i + window + 1):
+            if j != i and daily_data['High'].iloc[j] >= current_high:
+                is_fractal_high = False
+                break
+        if is_fractal_high:
+            fractal_highs.append(i)
+
+        is_fractal_low = True
+        for j in range(i - window, i + window + 1):
+            if j != i and daily_data['Low'].iloc[j] <= current_low:
+                is_fractal_low = False
+                break
+        if is_fractal_low:
+            fractal_lows.append(i)
+    return fractal_highs, fractal_lows
+
+
+def _synthetic_daily(seed, days=TRADING_DAYS_10Y, nan_ratio=0.0):
+    """隨機漫步的日線資料；價格取到 0.05 以產生大量同價（測試嚴格大於/小於的邊界）"""
+    rng = np.random.default_rng(seed)
+    close = np.maximum(50 + np.cumsum(rng.normal(0, 1, days)), 1)
+    high = np.round((close + rng.uniform(0, 2, days)) * 20) / 20
+    low = np.round((close - rng.uniform(0, 2, days)) * 20) / 20
+    if nan_ratio:
+        high[rng.random(days) < nan_ratio] = np.nan
+        low[rng.random(days) < nan_ratio] = np.nan
+    index = pd.bdate_range("2015-01-01", periods=days)
+    return pd.DataFrame({'Open': close, 'High': high, 'Low': low, 'Close': close, 'Volume': 1000}, index=index)
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("window", [2, 5, 8])
+def test_fractal_points_match_loop(seed, window):
+    daily = _synthetic_daily(seed, nan_ratio=0.01 if seed % 2 else 0.0)
+
+    expected_highs, expected_lows = _reference_fractals(daily, window)
+    high_idx, low_idx = find_fractal_points(daily['High'], daily['Low'], window)
+
+    # 中心值為 NaN 時舊迴圈會把它當成分形點，但價格比較一律為 False，不會成為支撐壓力位
+    highs = daily['High'].to_numpy()
+    lows = daily['Low'].to_numpy()
+    assert list(high_idx) == [i for i in expected_highs if not np.isnan(highs[i])]
+    assert list(low_idx) == [i for i in expected_lows if not np.isnan(lows[i])]
+
+
+def _reference_levels(daily, current_price):
+    """以迴圈找出的分形點，依原本的規則挑出 R1-R3 / S1-S3"""
+    expected_highs, expected_lows = _reference_fractals(daily)
+    dates = daily.index
+
+    def pick(points, column, keep, direction, prefix):
+        candidates = [(dates[i], daily[column].iloc[i]) for i in points]
+        candidates = [(date, price) for date, price in candidates if keep(price)]
+        candidates.sort(key=lambda x: x[0], reverse=True)
+        seen, prices = set(), []
+        for _, price in candidates:
+            if round(price, 2) not in seen:
+                seen.add(round(price, 2))
+                prices.append(price)
+        prices = prices[:3] + [None] * (3 - len(prices[:3]))
+        return {
+            f'{prefix}{n}': round(adjust_to_tick(price, direction=direction), 2) if price is not None else None
+            for n, price in enumerate(prices, start=1)
+        }
+
+    levels = pick(expected_highs, 'High', lambda p: p > current_price, 'resistance', 'r')
+    levels.update(pick(expected_lows, 'Low', lambda p: p < current_price, 'support', 's'))
+    levels['error'] = None
+    return levels
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_support_resistance_levels_match_loop(seed):
+    daily = _synthetic_daily(100 + seed)
+    current_price = float(daily['Close'].iloc[-1])
+
+    assert calculate_support_resistance_levels(daily, current_price) == _reference_levels(daily, current_price)
+
+
+def test_short_series_returns_error():
+    daily = _synthetic_daily(0, days=10)
+    result = calculate_support_resistance_levels(daily, 50.0)
+    assert result['r1'] is None and 'error' in result
+    high_idx, low_idx = find_fractal_points(daily['High'], daily['Low'], 5)
+    assert len(high_idx) == 0 and len(low_idx) == 0
@@ -0,0 +1,132 @@
+"""
+族群熱度歷史測試
+每個交易日只記錄一次：假日時上游仍是前一個交易日的資料，不應重複寫入或覆寫。
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.heat_history import HeatHistoryStore
+from modules.theme_engine import ThemeHeatAccumulator
+
+THEMES = {"族群清單": [{"族群名稱": "半導體", "上游": {"代表公司": ["台積電 (2330)"]}}]}
+
+
+def _universe(turnover):
+    return pd.DataFrame({
+        "code": ["2330", "1101"],
+        "name": ["台積電", "台泥"],
+        "close": [1000.0, 40.0],
+        "turnover": [turnover, 1.0],
+        "chg_pct": [1.0, -1.0],
+        "market": ["上市", "上市"],
+        "volume": [1e6, 1e6],
+    })
+
+
+def test_record_day_skips_stored_date(tmp_path):
+    history = HeatHistoryStore(history_dir=str(tmp_path), top_n=50)
+    assert history.record_day("2026-10-08", _universe(3.0), THEMES, "v1")
+    assert history.has_day("2026-10-08")
+
+    # 同一交易日再次記錄（例如假日重新整理）不覆寫原本的資料
+    assert not history.record_day("2026-10-08", _universe(9.0), THEMES, "v1")
+    trend = history.get_trend(days=5)
+    assert trend["dates"] == ["2026-10-08"]
+    assert trend["themes"][0]["series"][0]["avg_turnover"] == 3.0
+
+
+def test_rebase_matches_full_recompute(tmp_path):
+    history = HeatHistoryStore(history_dir=str(tmp_path), top_n=50)
+    history.record_day("2026-10-08", _universe(3.0), THEMES, "v1")
+    new_themes = {"族群清單": [
+        {"族群名稱": "半導體", "上游": {"代表公司": ["台積電 (2330)"]}},
+        {"族群名稱": "水泥", "上游": {"代表公司": ["台泥 (1101)"]}},
+    ]}
+
+    result = history.rebase_catalog(THEMES, new_themes, "v1", "v2")
+    assert result == {"days_checked": 1, "days_updated": 1, "rows_written": 1}
+    assert history.day_version("2026-10-08") == "v2"
+
+    # 與直接以新定義記錄的結果相同
+    expected = HeatHistoryStore(history_dir=str(tmp_path / "full"), top_n=50)
+    expected.record_day("2026-10-08", _universe(3.0), new_themes, "v2")
+    assert history.get_trend(days=5) == expected.get_trend(days=5)
+
+    # 不影響任何記錄日的變更只更新版本
+    result = history.rebase_catalog(new_themes, {**new_themes, "備註": "x"}, "v2", "v3")
+    assert result["days_updated"] == 0 and history.day_version("2026-10-08") == "v3"
+
+
+def test_connections_are_closed(tmp_path, sqlite_connections):
+    history = HeatHistoryStore(history_dir=str(tmp_path), top_n=50)
+    history.record_day("2026-10-08", _universe(3.0), THEMES, "v1")
+    history.record_day("2026-10-08", _universe(3.0), THEMES, "v1")
+    history.get_trend(days=5)
+    history.turnover_baseline("2026-10-09")
+    assert sqlite_connections and all(conn.closed for conn in sqlite_connections)
+
+
+def test_restart_with_changed_catalog_rebases_older_days(tmp_path):
+    new_themes = {"族群清單": [
+        {"族群名稱": "半導體", "上游": {"代表公司": ["台積電 (2330)"]}},
+        {"族群名稱": "水泥", "上游": {"代表公司": ["台泥 (1101)"]}},
+    ]}
+    history = HeatHistoryStore(history_dir=str(tmp_path), top_n=50)
+    history.sync_day("2026-10-07", _universe(3.0), THEMES, "v1")
+    history.sync_day("2026-10-08", _universe(4.0), THEMES, "v1")
+
+    # 停機期間修改族群定義：重啟後第一次記錄新交易日時，較早的交易日也改用新定義
+    restarted = HeatHistoryStore(history_dir=str(tmp_path), top_n=50)
+    assert restarted.sync_day("2026-10-09", _universe(5.0), new_themes, "v2")
+    assert [restarted.day_version(d) for d in ("2026-10-07", "2026-10-08", "2026-10-09")] == ["v2"] * 3
+
+    expected = HeatHistoryStore(history_dir=str(tmp_path / "full"), top_n=50)
+    for trading_date, turnover in (("2026-10-07", 3.0), ("2026-10-08", 4.0), ("2026-10-09", 5.0)):
+        expected.record_day(trading_date, _universe(turnover), new_themes, "v2")
+    assert restarted.get_trend(days=5) == expected.get_trend(days=5)
+
+
+def test_rebase_applies_diff_to_recorded_days(tmp_path, monkeypatch):
+    themes = {"族群清單": [
+        {"族群名稱": "半導體", "上游": {"代表公司": ["台積電 (2330)"]}},
+        {"族群名稱": "水泥", "上游": {"代表公司": ["台泥 (1101)"]}},
+    ]}
+    new_themes = {"族群清單": [
+        {"族群名稱": "半導體", "上游": {"代表公司": ["台積電 (2330)"]}},
+        {"族群名稱": "水泥", "上游": {"代表公司": ["台泥 (1101)", "亞泥 (1102)"]}},
+    ]}
+    universe = pd.concat([_universe(3.0), _universe(3.0).iloc[[1]].assign(code="1102", turnover=0.5)])
+    history = HeatHistoryStore(history_dir=str(tmp_path), top_n=50)
+    history.record_day("2026-10-08", universe, themes, "v1")
+
+    built = []
+    recomputed = []
+    init = ThemeHeatAccumulator.__init__
+    set_theme = ThemeHeatAccumulator._set_theme
+
+    def counting_init(self, *args, **kwargs):
+        built.append(self)
+        init(self, *args, **kwargs)
+
+    def counting_set_theme(self, theme_name, positions):
+        recomputed.append(theme_name)
+        set_theme(self, theme_name, positions)
+
+    monkeypatch.setattr(ThemeHeatAccumulator, "__init__", counting_init)
+    monkeypatch.setattr(ThemeHeatAccumulator, "_set_theme", counting_set_theme)
+
+    result = history.rebase_catalog(themes, new_themes, "v1", "v2")
+    # 沿用記錄當日建立的累加器，只重算成分股有變動的族群
+    assert built == []
+    assert recomputed == ["水泥"]
+    # 水泥的數值改變且排名升到第一，兩列都需改寫
+    assert result == {"days_checked": 1, "days_updated": 1, "rows_written": 2}
+
+    monkeypatch.undo()
+    expected = HeatHistoryStore(history_dir=str(tmp_path / "full"), top_n=50)
+    expected.record_day("2026-10-08", universe, new_themes, "v2")
+    assert history.get_trend(days=5) == expected.get_trend(days=5)
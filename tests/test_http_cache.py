@@ -0,0 +1,119 @@
+"""
+預先計算回應測試
+內容只序列化/壓縮一次；ETag 相符時返回 304，並依 Accept-Encoding 返回壓縮版本。
+"""
+
+import gzip
+import json
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import http_cache
+from modules.http_cache import MIN_COMPRESS_SIZE, PrecomputedResponse, PrecomputedResponseCache
+
+PAYLOAD = {"themes": [{"theme_name": f"族群{i}", "stock_count": i} for i in range(100)]}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # 不依賴是否安裝 brotli
+    monkeypatch.setattr(http_cache, "BROTLI_AVAILABLE", False)
+    cache = PrecomputedResponseCache(max_entries=2)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return PrecomputedResponse(PAYLOAD)
+
+    app = Flask(__name__)
+
+    @app.route("/themes")
+    def themes():
+        return cache.get_or_build(("theme-list", "v1"), build).to_response()
+
+    app.builds = builds
+    return app
+
+
+def test_gzip_body_and_etag(app):
+    client = app.test_client()
+    response = client.get("/themes", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Cache-Control"] == "public, no-cache"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert json.loads(gzip.decompress(response.get_data())) == PAYLOAD
+    assert response.headers["ETag"].endswith('-gzip"')
+
+    plain = client.get("/themes")
+    assert "Content-Encoding" not in plain.headers
+    assert plain.get_json() == PAYLOAD
+    assert plain.headers["ETag"] != response.headers["ETag"]
+    # 只建立（序列化、壓縮）一次
+    assert len(app.builds) == 1
+
+
+def test_matching_etag_returns_304(app):
+    client = app.test_client()
+    etag = client.get("/themes", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+
+    response = client.get("/themes", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["ETag"] == etag
+
+    # 以其他編碼取得的 ETag 也代表相同內容
+    response = client.get("/themes", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = client.get("/themes", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+
+
+def test_small_payload_is_not_compressed():
+    small = PrecomputedResponse({"themes": []})
+    assert len(small.bodies["identity"]) < MIN_COMPRESS_SIZE
+    assert set(small.bodies) == {"identity"}
+
+    app = Flask(__name__)
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = small.to_response()
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json() == {"themes": []}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PrecomputedResponseCache(max_entries=2)
+    first = cache.get_or_build("a", lambda: PrecomputedResponse(1))
+    cache.get_or_build("b", lambda: PrecomputedResponse(2))
+    assert cache.get("a") is first
+    cache.get_or_build("c", lambda: PrecomputedResponse(3))
+    assert cache.get("b") is None
+    assert cache.get("a") is first
+
+
+def test_theme_list_route_revalidates(monkeypatch):
+    import routes.theme_analysis_routes as theme_routes
+
+    class _Catalog:
+        version = "v1"
+        data = {"族群清單": [{"族群名稱": "半導體"}]}
+
+    class _Store:
+        def current(self):
+            return _Catalog()
+
+    monkeypatch.setattr(theme_routes, "get_theme_catalog", lambda: _Store())
+    monkeypatch.setattr(theme_routes, "_precomputed_responses", PrecomputedResponseCache())
+    app = Flask(__name__)
+    app.register_blueprint(theme_routes.theme_analysis_bp, url_prefix="/theme-analysis")
+    client = app.test_client()
+
+    response = client.get("/theme-analysis/theme-list")
+    assert response.get_json() == {"themes": [{"theme_name": "半導體", "description": "", "stock_count": 0}]}
+    response = client.get("/theme-analysis/theme-list", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
@@ -0,0 +1,152 @@
+"""
+共用 HTTP 用戶端測試
+受限流器控制的請求以 retry=False 送出時，每次呼叫只會送出一個請求；
+每個主機的連線數依並行設定計算，同一主機的請求重用連線。
+"""
+
+import os
+import sys
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import scraper
+from modules.http_client import HttpClient
+
+
+class _BusyHandler(BaseHTTPRequestHandler):
+    """一律回應 429"""
+
+    hits = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        _BusyHandler.hits += 1
+        self.send_response(429)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def busy_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BusyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _BusyHandler.hits = 0
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+def test_retry_false_sends_single_request(busy_url):
+    client = HttpClient(retries=2, backoff=0.01)
+
+    assert client.get(busy_url, retry=False).status_code == 429
+    assert _BusyHandler.hits == 1
+
+    assert client.get(busy_url).status_code == 429
+    assert _BusyHandler.hits == 4
+
+
+def test_pool_size_covers_concurrency(monkeypatch):
+    monkeypatch.delenv("HTTP_POOL_MAXSIZE", raising=False)
+    monkeypatch.setenv("GUNICORN_THREADS", "16")
+    monkeypatch.setenv("SIGNALS_BATCH_WORKERS", "8")
+    monkeypatch.setenv("TWSE_MAX_WORKERS", "4")
+    assert HttpClient()._adapter._pool_maxsize == 32
+
+
+def test_pool_size_follows_largest_concurrency(monkeypatch):
+    monkeypatch.delenv("HTTP_POOL_MAXSIZE", raising=False)
+    monkeypatch.setenv("GUNICORN_THREADS", "64")
+    monkeypatch.setenv("SIGNALS_BATCH_WORKERS", "8")
+    monkeypatch.setenv("TWSE_MAX_WORKERS", "4")
+    client = HttpClient()
+    assert client._adapter._pool_maxsize == 64
+    # 不重試的連線池大小相同
+    assert client._no_retry_adapter._pool_maxsize == 64
+
+    monkeypatch.setenv("HTTP_POOL_MAXSIZE", "10")
+    assert HttpClient()._adapter._pool_maxsize == 10
+    assert HttpClient(pool_maxsize=5)._adapter._pool_maxsize == 5
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """以 keep-alive 回應；第一次請求回應 503，之後回應 200"""
+
+    protocol_version = "HTTP/1.1"
+    hits = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        _FlakyHandler.hits += 1
+        self.send_response(503 if _FlakyHandler.hits == 1 else 200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+
+@pytest.fixture
+def flaky_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _FlakyHandler.hits = 0
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+def test_retry_and_connection_reuse_stats(flaky_url):
+    client = HttpClient(retries=2, backoff=0.01)
+    assert client.get(flaky_url).status_code == 200
+    assert client.get(flaky_url).status_code == 200
+    assert _FlakyHandler.hits == 3
+
+    stats = next(iter(client.stats().values()))
+    assert stats["requests"] == 2
+    assert stats["retries"] == 1
+    assert stats["errors"] == 0
+    # 三次傳送共用一條連線
+    assert stats["new_connections"] == 1
+    assert stats["reused"] == 2
+
+
+class _RecordingClient:
+    """記錄 get() 的參數，回應固定的 JSON"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(kwargs)
+        client = self
+
+        class _Response:
+            status_code = 200
+
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return client.payload
+
+        return _Response()
+
+
+def test_rate_limited_callers_disable_transport_retry(monkeypatch):
+    import routes.stock_signals_routes as signals
+
+    client = _RecordingClient({"stat": "很抱歉，沒有符合條件的資料!"})
+    monkeypatch.setattr(scraper, "get_http_client", lambda: client)
+    monkeypatch.setattr(signals, "get_http_client", lambda: client)
+    monkeypatch.setattr(signals._TWSE_LIMITER, "acquire", lambda *args, **kwargs: None)
+
+    scraper._open_data_get_json(scraper.TWSE_CAPITAL_URL)
+    signals._fetch_twse_month("2330", datetime(2020, 1, 1))
+    signals._get_twse_stock_name("2330")
+    assert [call["retry"] for call in client.calls] == [False, False, False]
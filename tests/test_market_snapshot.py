@@ -0,0 +1,165 @@
+"""
+市場快照交易日測試
+快照的交易日應取自上游資料本身的日期：假日或上游尚未發布時保留原本的快照，不重複通知。
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import market_snapshot, scraper
+from modules.market_snapshot import MarketSnapshotStore
+
+
+def _universe(trading_date, turnover=1.0):
+    df = pd.DataFrame({
+        "code": ["2330", "6488"],
+        "name": ["台積電", "環球晶"],
+        "close": [1000.0, 400.0],
+        "turnover": [turnover, 2.0],
+        "chg_pct": [1.0, -1.0],
+        "market": ["上市", "上櫃"],
+        "volume": [1e6, 1e6],
+    })
+    df.attrs["trading_date"] = trading_date
+    return df
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("MARKET_SNAPSHOT_BACKGROUND_REFRESH", "0")
+    snapshot = MarketSnapshotStore(path=str(tmp_path / "snapshot.json"))
+    notified = []
+    snapshot.add_refresh_listener(lambda trading_date, df: notified.append(trading_date))
+    snapshot.notified = notified
+    return snapshot
+
+
+def _set_payload(monkeypatch, trading_date, expected, turnover=1.0, window_passed=False):
+    fetches = []
+
+    def fetch():
+        fetches.append(trading_date)
+        return _universe(trading_date, turnover)
+
+    monkeypatch.setattr(scraper, "fetch_market_universe", fetch)
+    monkeypatch.setattr(market_snapshot, "expected_trading_date", lambda now=None: expected)
+    monkeypatch.setattr(market_snapshot, "retry_window_passed", lambda date, now=None: window_passed)
+    return fetches
+
+
+def test_uses_payload_date(store, monkeypatch):
+    _set_payload(monkeypatch, "2026-10-16", expected="2026-10-16")
+    store.refresh()
+    assert store.info()["trading_date"] == "2026-10-16"
+    assert store.notified == ["2026-10-16"]
+
+
+def test_holiday_keeps_previous_session(store, monkeypatch):
+    _set_payload(monkeypatch, "2026-10-08", expected="2026-10-08")
+    store.refresh()
+
+    # 國定假日：時鐘推算為 10-09，但上游仍是 10-08 的資料
+    _set_payload(monkeypatch, "2026-10-08", expected="2026-10-09", turnover=9.0)
+    df = store.refresh()
+    assert store.info()["trading_date"] == "2026-10-08"
+    assert df["turnover"].max() == 2.0
+    assert store.notified == ["2026-10-08"]
+
+
+def test_refresh_before_publish_retries_later(store, monkeypatch):
+    _set_payload(monkeypatch, "2026-10-15", expected="2026-10-15")
+    store.refresh()
+
+    # 15:00 排程更新時上游尚未發布當日資料
+    _set_payload(monkeypatch, "2026-10-15", expected="2026-10-16")
+    store.refresh()
+    assert store.info()["trading_date"] == "2026-10-15"
+
+    # 稍後重試取得當日資料
+    _set_payload(monkeypatch, "2026-10-16", expected="2026-10-16", turnover=5.0)
+    df = store.refresh()
+    assert store.info()["trading_date"] == "2026-10-16"
+    assert df["turnover"].max() == 5.0
+    assert store.notified == ["2026-10-15", "2026-10-16"]
+
+
+def test_legacy_clock_stamped_snapshot_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.setenv("MARKET_SNAPSHOT_BACKGROUND_REFRESH", "0")
+    path = tmp_path / "snapshot.json"
+    records = json.loads(_universe("2026-10-16").to_json(orient="records"))
+    path.write_text(json.dumps({"trading_date": "2026-10-16", "fetched_at": 0, "records": records}))
+    snapshot = MarketSnapshotStore(path=str(path))
+
+    # 舊版快照以時鐘標記日期，同一天的資料仍會重新抓取並取代
+    _set_payload(monkeypatch, "2026-10-16", expected="2026-10-17", turnover=7.0)
+    assert snapshot.refresh()["turnover"].max() == 7.0
+    assert json.loads(path.read_text())["date_from_payload"] is True
+
+
+def test_top_n_with_date_matches_snapshot(store, monkeypatch):
+    _set_payload(monkeypatch, "2026-10-15", expected="2026-10-15")
+    top, trading_date = store.get_top_n_with_date(1)
+    assert trading_date == "2026-10-15"
+    assert list(top["code"]) == ["6488"]
+
+    _set_payload(monkeypatch, "2026-10-16", expected="2026-10-16", turnover=5.0)
+    store.refresh()
+    universe, trading_date = store.get_universe_with_date()
+    assert trading_date == "2026-10-16"
+    assert universe["turnover"].max() == 5.0
+
+
+def test_clock_dated_snapshot_is_not_notified(store, monkeypatch):
+    # 上游資料沒有日期時以時鐘推算，可能是沒有開盤的日子，不通知監聽者
+    _set_payload(monkeypatch, None, expected="2026-10-09")
+    store.refresh()
+    assert store.info()["trading_date"] == "2026-10-09"
+    assert store.notified == []
+
+
+def test_holiday_stops_retrying_after_window(store, monkeypatch):
+    _set_payload(monkeypatch, "2026-10-08", expected="2026-10-08")
+    store.refresh()
+
+    # 重試時限內仍會在背景重新抓取
+    _set_payload(monkeypatch, "2026-10-08", expected="2026-10-09")
+    store.refresh()
+    assert not store._is_fresh()
+
+    # 重試時限過後上游仍是 10-08：10-09 視為休市日，當天不再重新抓取
+    fetches = _set_payload(monkeypatch, "2026-10-08", expected="2026-10-09", window_passed=True)
+    store.refresh()
+    assert store._is_fresh()
+    store._last_attempt = 0
+    df, trading_date = store.get_universe_with_date()
+    assert trading_date == "2026-10-08"
+    assert fetches == ["2026-10-08"]
+
+    # 下一個交易日照常更新
+    _set_payload(monkeypatch, "2026-10-12", expected="2026-10-12", turnover=5.0)
+    assert not store._is_fresh()
+    assert store.refresh()["turnover"].max() == 5.0
+    assert store.notified == ["2026-10-08", "2026-10-12"]
+
+
+def test_retry_window_passed():
+    tz = market_snapshot.TAIPEI_TZ
+    assert not market_snapshot.retry_window_passed("2026-10-09", datetime(2026, 10, 9, 18, 0, tzinfo=tz))
+    assert market_snapshot.retry_window_passed("2026-10-09", datetime(2026, 10, 9, 19, 0, tzinfo=tz))
+
+
+def test_snapshot_slices_use_precomputed_ranks(store, monkeypatch):
+    _set_payload(monkeypatch, "2026-10-16", expected="2026-10-16", turnover=3.0)
+    store.refresh()
+
+    assert store.get_top_n(1)["code"].tolist() == ["2330"]
+    assert store.get_market_top_n("上櫃")["code"].tolist() == ["6488"]
+    assert store.get_market_top_n("興櫃").empty
+    assert store.get_top_percentile(100)["code"].tolist() == ["2330"]
+    assert store.get_top_percentile(50)["turnover_pct"].tolist() == [100.0, 50.0]
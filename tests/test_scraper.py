@@ -0,0 +1,75 @@
+"""
+開放資料解析測試
+以錄製格式的 STOCK_DAY_ALL / 股本 / TPEx 收盤行情解析全市場資料，
+確認漲跌幅由漲跌價差算出，全市場族群熱度的上漲廣度有值。
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import scraper
+from modules.theme_engine import calc_market_theme_heat, map_stock_to_themes
+
+THEMES = {"族群清單": [{"族群名稱": "半導體", "上游": {"代表公司": ["台積電 (2330)", "聯電 (2303)", "環球晶 (6488)"]}}]}
+
+TWSE_PRICE = [
+    {"Date": "1151016", "Code": "2330", "Name": "台積電", "TradeVolume": "30,000,000",
+     "ClosingPrice": "1,050.00", "Change": "+50.0000"},
+    {"Date": "1151016", "Code": "2303", "Name": "聯電", "TradeVolume": "60,000,000",
+     "ClosingPrice": "48.00", "Change": "-2.0000"},
+    {"Date": "1151016", "Code": "1101", "Name": "台泥", "TradeVolume": "5,000,000",
+     "ClosingPrice": "40.00", "Change": "X0.0000"},
+]
+TWSE_CAPITAL = [
+    {"公司代號": "2330", "已發行普通股數或TDR原股發行股數": "25,930,380,458"},
+    {"公司代號": "2303", "已發行普通股數或TDR原股發行股數": "12,500,000,000"},
+    {"公司代號": "1101", "已發行普通股數或TDR原股發行股數": "7,500,000,000"},
+]
+
+
+def _tpex_row(code, name, close, change, volume, issued):
+    row = [code, name, close, change] + [""] * 12
+    row[8] = volume
+    row[15] = issued
+    return row
+
+
+TPEX_QUOTES = {
+    "date": "20261016",
+    "tables": [{"data": [
+        _tpex_row("6488", "環球晶", "400.00", "+4.00 ", "2,000,000", "478,000,000"),
+        _tpex_row("8069", "元太", "250.00", "除息", "3,000,000", "1,140,000,000"),
+    ]}],
+}
+
+
+@pytest.fixture
+def universe(monkeypatch):
+    monkeypatch.setattr(scraper, "fetch_twse_price_json", lambda: TWSE_PRICE)
+    monkeypatch.setattr(scraper, "fetch_twse_capital_json", lambda: TWSE_CAPITAL)
+    monkeypatch.setattr(scraper, "fetch_tpex_quotes_json", lambda: TPEX_QUOTES)
+    return scraper.fetch_market_universe().set_index("code")
+
+
+def test_chg_pct_from_change(universe):
+    assert universe.loc["2330", "chg_pct"] == pytest.approx(5.0)
+    assert universe.loc["2303", "chg_pct"] == pytest.approx(-4.0)
+    assert universe.loc["6488", "chg_pct"] == pytest.approx(1.0101, abs=1e-4)
+    # 除權息（"X0.0000"）與非數值的漲跌（除息）不是一般漲跌，沒有漲跌幅
+    assert pd.isna(universe.loc["1101", "chg_pct"])
+    assert pd.isna(universe.loc["8069", "chg_pct"])
+    assert universe["chg_pct"].isna().sum() == 2
+
+
+def test_market_heat_breadth_is_not_null(universe):
+    universe = universe.reset_index()
+    heat = calc_market_theme_heat(universe, map_stock_to_themes(universe, THEMES))
+
+    row = heat.set_index("theme_name").loc["半導體"]
+    assert row["up_count"] == 2
+    assert row["breadth"] == pytest.approx(2 / 3, abs=1e-4)
+    assert pd.notna(row["weighted_chg_pct"])
@@ -0,0 +1,70 @@
+"""
+證券主檔測試
+每日重建在背景進行，查詢不等待下載，直接使用磁碟上既有的主檔。
+"""
+
+import json
+import os
+import sys
+import threading
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import security_master
+from modules.security_master import MARKET_TPEX, MARKET_TWSE, SecurityMaster
+
+PERSISTED = {"2330": {"market": MARKET_TWSE, "name": "台積電", "issued_shares": 25930380458}}
+REBUILT = {
+    **PERSISTED,
+    "6488": {"market": MARKET_TPEX, "name": "環球晶", "issued_shares": 478000000},
+}
+
+
+def test_lookup_does_not_wait_for_rebuild(tmp_path, monkeypatch):
+    path = tmp_path / "security_master.json"
+    path.write_text(json.dumps({"built_date": "2000-01-03", "records": PERSISTED}), encoding="utf-8")
+
+    release = threading.Event()
+    builds = []
+
+    def slow_build():
+        builds.append(threading.current_thread())
+        release.wait(5)
+        return REBUILT
+
+    monkeypatch.setattr(security_master, "build_security_records", slow_build)
+    master = SecurityMaster(path=str(path))
+
+    # 重建仍在進行（下載尚未完成）時，直接以既有主檔回應
+    assert master.get_yfinance_suffixes("2330") == [".TW"]
+    assert master.get_yfinance_suffixes("6488") == [".TW", ".TWO"]
+    assert len(builds) == 1 and builds[0] is not threading.current_thread()
+
+    release.set()
+    master._refresh_thread.join(5)
+    assert master.get_yfinance_suffixes("6488") == [".TWO"]
+    assert len(builds) == 1
+
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert saved["built_date"] == date.today().isoformat()
+    assert set(saved["records"]) == {"2330", "6488"}
+
+
+def test_failed_rebuild_keeps_existing_records(tmp_path, monkeypatch):
+    path = tmp_path / "security_master.json"
+    path.write_text(json.dumps({"built_date": "2000-01-03", "records": PERSISTED}), encoding="utf-8")
+
+    builds = []
+
+    def failing_build():
+        builds.append(1)
+        raise Exception("連線失敗")
+
+    monkeypatch.setattr(security_master, "build_security_records", failing_build)
+    master = SecurityMaster(path=str(path))
+    assert master.get_name("2330") == "台積電"
+    master._refresh_thread.join(5)
+
+    # 沿用既有資料，當天不再重試
+    assert master.get_name("2330") == "台積電"
+    assert builds == [1]
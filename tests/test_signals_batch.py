@@ -0,0 +1,91 @@
+"""
+批次股票訊號測試
+單一股票失敗只影響該股票的結果；單次請求的股票數有上限（重複代碼只算一次）。
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import routes.stock_signals_routes as signals
+
+
+def _fake_signals(ticker):
+    if ticker == "2317":
+        raise RuntimeError("連線逾時")
+    if ticker == "9999":
+        return {"error": "無法獲取股票代碼 9999 的數據"}
+    return {"ticker": ticker, "daily_kd_golden": np.bool_(True), "close": np.float64(1.5)}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(signals, "get_bulk_stock_history", lambda tickers: {})
+    monkeypatch.setattr(signals, "get_stock_signals", _fake_signals)
+    app = Flask(__name__)
+    app.register_blueprint(signals.signals_bp, url_prefix="/signals")
+    return app.test_client()
+
+
+def test_per_ticker_errors_do_not_fail_batch(client):
+    response = client.post("/signals/batch", json={"tickers": ["2330", "2317", "9999", "2330.TW", " 2454 "]})
+    assert response.status_code == 200
+    body = response.get_json()
+
+    # 依輸入順序、去除重複（含 .TW 後綴）
+    assert [item["ticker"] for item in body["results"]] == ["2330", "2317", "9999", "2454"]
+    assert body["results"][0]["signals"] == {"ticker": "2330", "daily_kd_golden": True, "close": 1.5}
+    assert body["results"][1]["error"] == "計算股票訊號時發生錯誤: 連線逾時"
+    assert body["results"][2]["error"] == "無法獲取股票代碼 9999 的數據"
+    assert "signals" in body["results"][3]
+    assert body["summary"] == {"total": 4, "succeeded": 2, "failed": 2}
+
+
+def test_stream_returns_one_line_per_ticker(client):
+    response = client.post("/signals/batch", json={"tickers": ["2330", "2317"], "stream": True})
+    assert response.mimetype == "application/x-ndjson"
+    items = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(item["ticker"] for item in items) == ["2317", "2330"]
+    assert {item["ticker"]: "error" in item for item in items} == {"2330": False, "2317": True}
+
+
+def test_bulk_history_skips_per_ticker_fetch(client, monkeypatch):
+    daily = pd.DataFrame({"Close": [1.0]})
+    monkeypatch.setattr(
+        signals, "get_bulk_stock_history",
+        lambda tickers: {"2330": (daily, {"longName": "台積電"}, None, "yfinance")},
+    )
+    computed = []
+
+    def fake_calculate(ticker, daily_data_2y, stock_info):
+        computed.append((ticker, stock_info["longName"]))
+        return {"ticker": ticker}
+
+    monkeypatch.setattr(signals, "calculate_stock_signals", fake_calculate)
+    body = client.post("/signals/batch", json={"tickers": ["2330", "2317"]}).get_json()
+    assert computed == [("2330", "台積電")]
+    assert body["summary"] == {"total": 2, "succeeded": 1, "failed": 1}
+
+
+def test_ticker_limit(client):
+    tickers = [f"{code:04d}" for code in range(1000, 1000 + signals.SIGNALS_BATCH_MAX_TICKERS)]
+    # 重複的代碼不計入上限
+    response = client.post("/signals/batch", json={"tickers": tickers + tickers[:10]})
+    assert response.status_code == 200
+    assert response.get_json()["summary"]["total"] == signals.SIGNALS_BATCH_MAX_TICKERS
+
+    response = client.post("/signals/batch", json={"tickers": tickers + ["9998"]})
+    assert response.status_code == 400
+    assert str(signals.SIGNALS_BATCH_MAX_TICKERS) in response.get_json()["error"]
+
+
+def test_missing_tickers_is_rejected(client):
+    assert client.post("/signals/batch", json={}).status_code == 400
+    assert client.post("/signals/batch", json={"tickers": []}).status_code == 400
+    assert client.post("/signals/batch", json={"tickers": "2330"}).status_code == 400
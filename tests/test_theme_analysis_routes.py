@@ -0,0 +1,136 @@
+"""
+族群熱度路由測試
+同一份快照的族群熱度累加器跨請求沿用：族群定義變更後只套用差異，結果與完整重算相同。
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import routes.theme_analysis_routes as theme_routes
+from modules.http_cache import PrecomputedResponseCache
+from modules.theme_engine import (
+    ThemeHeatAccumulator,
+    ThemeHeatAccumulatorCache,
+    as_theme_index,
+    calc_market_theme_heat,
+    calc_theme_heat,
+    map_stock_to_themes,
+)
+
+UNIVERSE = pd.DataFrame({
+    "code": ["2330", "2303", "1101", "1102", "2603"],
+    "name": ["台積電", "聯電", "台泥", "亞泥", "長榮"],
+    "turnover": [5.0, 4.0, 3.0, 2.0, 1.0],
+    "close": [1000.0, 50.0, 40.0, 30.0, 200.0],
+    "chg_pct": [1.0, -1.0, 2.0, None, 0.5],
+    "volume": [1e6, 2e6, 3e6, 4e6, 5e6],
+})
+
+OLD_THEMES = {"族群清單": [
+    {"族群名稱": "半導體", "上游": {"代表公司": ["台積電 (2330)", "聯電 (2303)"]}},
+    {"族群名稱": "水泥", "上游": {"代表公司": ["台泥 (1101)"]}},
+]}
+NEW_THEMES = {"族群清單": [
+    {"族群名稱": "半導體", "上游": {"代表公司": ["台積電 (2330)", "聯電 (2303)"]}},
+    {"族群名稱": "水泥", "上游": {"代表公司": ["台泥 (1101)", "亞泥 (1102)"]}},
+    {"族群名稱": "航運", "上游": {"代表公司": ["長榮 (2603)"]}},
+]}
+
+
+class _Catalog:
+    def __init__(self, themes, version):
+        self.index = as_theme_index(themes)
+        self.version = version
+        self.data = themes
+
+
+class _CatalogStore:
+    def __init__(self):
+        self.catalog = _Catalog(OLD_THEMES, "v1")
+
+    def current(self):
+        return self.catalog
+
+
+class _SnapshotStore:
+    def get_universe_with_date(self):
+        return UNIVERSE, "2026-10-16"
+
+    def get_top_n_with_date(self, top_n=None):
+        return UNIVERSE.head(top_n).copy(), "2026-10-16"
+
+
+class _History:
+    def turnover_baseline(self, before_date, days=60):
+        return pd.DataFrame(columns=["mean", "std", "days"])
+
+
+@pytest.fixture
+def catalogs(monkeypatch):
+    store = _CatalogStore()
+    monkeypatch.setattr(theme_routes, "get_theme_catalog", lambda: store)
+    monkeypatch.setattr(theme_routes, "get_market_snapshot_store", lambda: _SnapshotStore())
+    monkeypatch.setattr(theme_routes, "get_heat_history", lambda: _History())
+    monkeypatch.setattr(theme_routes, "load_attention_stocks_from_web", lambda: pd.DataFrame())
+    monkeypatch.setattr(theme_routes, "_precomputed_responses", PrecomputedResponseCache())
+    monkeypatch.setattr(theme_routes, "_heat_accumulators", ThemeHeatAccumulatorCache())
+    return store
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    built = []
+    init = ThemeHeatAccumulator.__init__
+
+    def counting_init(self, *args, **kwargs):
+        built.append(self)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(ThemeHeatAccumulator, "__init__", counting_init)
+    return built
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(theme_routes.theme_analysis_bp, url_prefix="/theme-analysis")
+    return app.test_client()
+
+
+def _records(df):
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def test_market_heat_reuses_accumulator_across_catalog_versions(client, catalogs, builds):
+    response = client.get("/theme-analysis/market-heat")
+    assert response.status_code == 200
+    assert response.get_json()["themes"] == _records(
+        calc_market_theme_heat(UNIVERSE, map_stock_to_themes(UNIVERSE, OLD_THEMES))
+    )
+
+    catalogs.catalog = _Catalog(NEW_THEMES, "v2")
+    response = client.get("/theme-analysis/market-heat")
+    assert response.get_json()["themes"] == _records(
+        calc_market_theme_heat(UNIVERSE, map_stock_to_themes(UNIVERSE, NEW_THEMES))
+    )
+    assert len(builds) == 1
+
+
+def test_analyze_reuses_accumulator_across_catalog_versions(client, catalogs, builds):
+    response = client.post("/theme-analysis/analyze", json={"top_n": 4})
+    assert response.status_code == 200
+    top = UNIVERSE.head(4)
+    assert response.get_json()["turnover_report"]["theme_heat_ranking"] == _records(
+        calc_theme_heat(top, map_stock_to_themes(top, OLD_THEMES))
+    )
+
+    catalogs.catalog = _Catalog(NEW_THEMES, "v2")
+    report = client.post("/theme-analysis/analyze", json={"top_n": 4}).get_json()["turnover_report"]
+    assert report["theme_heat_ranking"] == _records(calc_theme_heat(top, map_stock_to_themes(top, NEW_THEMES)))
+    assert [stock["code"] for stock in report["theme_stocks"]["水泥"]] == ["1101", "1102"]
+    assert len(builds) == 1
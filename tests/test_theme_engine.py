@@ -0,0 +1,147 @@
+"""
+族群熱度計算測試
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.theme_engine import (
+    ThemeHeatAccumulator,
+    ThemeHeatAccumulatorCache,
+    calc_market_theme_heat,
+    calc_theme_heat,
+    map_stock_to_themes,
+)
+
+
+def test_theme_heat_rounds_like_builtin_round():
+    # 27.905 以內建 round() 為 27.91，numpy 的 round 為 27.9
+    stocks = pd.DataFrame({
+        "code": ["1101", "1102"],
+        "name": ["台泥", "亞泥"],
+        "turnover": [27.905, 27.905],
+        "close": [40.0, 30.0],
+        "chg_pct": [1.005, np.nan],
+    })
+    heat = calc_theme_heat(stocks, {"1101": ["水泥"], "1102": ["水泥"]})
+
+    row = heat.iloc[0]
+    assert row["avg_turnover"] == round(27.905, 2) == 27.91
+    assert row["avg_chg_pct"] == round(1.005, 2)
+
+
+def test_theme_heat_without_chg_pct_keeps_none():
+    stocks = pd.DataFrame({"code": ["1101"], "name": ["台泥"], "turnover": [3.0], "close": [40.0], "chg_pct": [None]})
+    heat = calc_theme_heat(stocks, {"1101": ["水泥"]})
+    assert heat.iloc[0]["avg_chg_pct"] is None
+
+
+CODES = [str(code) for code in range(1101, 1401)]
+
+
+def _catalog(themes):
+    return {"族群清單": [
+        {"族群名稱": name, "上游": {"代表公司": [f"公司 ({code})" for code in codes]}} for name, codes in themes
+    ]}
+
+
+def _random_stocks(rng, n):
+    stocks = pd.DataFrame({
+        "code": rng.choice(CODES, n),
+        "turnover": rng.random(n) * 30,
+        "chg_pct": rng.normal(0, 3, n).round(2),
+        "close": rng.random(n) * 100,
+        "volume": rng.integers(0, 10**6, n).astype(float),
+    })
+    # 缺值（含同一代碼重複出現）
+    stocks.loc[rng.random(n) < 0.1, "turnover"] = np.nan
+    stocks.loc[rng.random(n) < 0.1, "chg_pct"] = np.nan
+    stocks.loc[rng.random(n) < 0.1, "close"] = np.nan
+    return stocks
+
+
+def _edit(rng, themes, step):
+    # 每個族群移除/加入幾檔，刪除第一個族群並在最後新增一個族群
+    edited = [
+        (name, sorted(set(codes) - set(rng.choice(codes, min(len(codes), 2)))) + list(rng.choice(CODES, 3)))
+        for name, codes in themes
+    ]
+    return edited[1:] + [(f"新族群{step}", list(rng.choice(CODES, 10)))]
+
+
+def test_accumulator_matches_full_recompute_after_catalog_edits():
+    rng = np.random.default_rng(0)
+    for trial in range(20):
+        stocks = _random_stocks(rng, int(rng.integers(1, 300)))
+        baseline = pd.DataFrame(
+            {"mean": rng.random(len(CODES)) * 10, "std": rng.random(len(CODES)) * 3}, index=CODES
+        ).sample(200, random_state=trial)
+        themes = [(f"族群{i}", list(rng.choice(CODES, int(rng.integers(1, 40)), replace=False))) for i in range(30)]
+        catalog = _catalog(themes)
+        accumulator = ThemeHeatAccumulator(stocks, catalog, baseline)
+
+        for step in range(4):
+            stock_to_themes = map_stock_to_themes(stocks, catalog)
+            pd.testing.assert_frame_equal(accumulator.heat_frame(catalog), calc_theme_heat(stocks, stock_to_themes))
+            pd.testing.assert_frame_equal(
+                accumulator.market_heat_frame(catalog), calc_market_theme_heat(stocks, stock_to_themes, baseline)
+            )
+            themes = _edit(rng, themes, step)
+            catalog = _catalog(themes)
+
+
+def test_catalog_change_updates_only_affected_themes():
+    stocks = pd.DataFrame({
+        "code": ["2330", "2303", "1101", "1102"],
+        "turnover": [5.0, 4.0, 3.0, 2.0],
+        "chg_pct": [1.0, -1.0, 2.0, None],
+    })
+    old = _catalog([("半導體", ["2330", "2303"]), ("水泥", ["1101"]), ("航運", ["2603"])])
+    new = _catalog([("半導體", ["2330", "2303"]), ("水泥", ["1101", "1102"]), ("航運", ["2603", "2609"])])
+    accumulator = ThemeHeatAccumulator(stocks, old)
+    unchanged = accumulator._stats["半導體"]
+
+    # 航運的成分股有變動，但都不在 stocks 中，熱度不變
+    assert accumulator.apply_catalog_change(new) == {"水泥"}
+    assert accumulator._stats["半導體"] is unchanged
+    assert accumulator.apply_catalog_change(new) == set()
+
+    heat = accumulator.heat_frame()
+    assert heat["theme_name"].tolist() == ["半導體", "水泥"]
+    assert heat.iloc[1]["count_in_topN"] == 2
+    assert heat.iloc[1]["avg_turnover"] == 2.5 and heat.iloc[1]["avg_chg_pct"] == 2.0
+
+
+def test_accumulator_without_themes_or_columns():
+    stocks = pd.DataFrame({"code": ["1101"], "name": ["台泥"]})
+    catalog = _catalog([("水泥", ["1101"])])
+    pd.testing.assert_frame_equal(
+        ThemeHeatAccumulator(stocks, catalog).heat_frame(),
+        calc_theme_heat(stocks, map_stock_to_themes(stocks, catalog)),
+    )
+    assert ThemeHeatAccumulator(stocks, _catalog([("航運", ["2603"])])).heat_frame().empty
+    assert ThemeHeatAccumulator(pd.DataFrame(), catalog).market_heat_frame().empty
+
+
+def test_accumulator_cache_reuses_same_rows():
+    stocks = pd.DataFrame({"code": ["1101"], "turnover": [3.0], "chg_pct": [1.0]})
+    catalog = _catalog([("水泥", ["1101"])])
+    cache = ThemeHeatAccumulatorCache(max_entries=1)
+    builds = []
+
+    def build(df):
+        builds.append(df)
+        return ThemeHeatAccumulator(df, catalog)
+
+    first = cache.get_or_build("2026-10-08", stocks, lambda: build(stocks))
+    assert cache.get_or_build("2026-10-08", stocks.copy(), lambda: build(stocks)) is first
+    # 同一個鍵的資料已被取代時重新建立
+    replaced = stocks.assign(turnover=[4.0])
+    assert cache.get_or_build("2026-10-08", replaced, lambda: build(replaced)) is not first
+    assert len(builds) == 2
+    cache.get_or_build("2026-10-09", stocks, lambda: build(stocks))
+    assert cache.get("2026-10-08") is None
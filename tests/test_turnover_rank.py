@@ -0,0 +1,81 @@
+"""
+週轉率排名測試
+排名欄位在快照更新時計算一次；argpartition 路徑與完整排序的結果相同（同值依原順序，缺值在最後）。
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.turnover_rank import (
+    ARGPARTITION_RATIO,
+    RANK_COLUMNS,
+    add_rank_columns,
+    market_positions,
+    sort_by_turnover,
+    turnover_order,
+)
+
+UNIVERSE = pd.DataFrame({
+    "code": ["1101", "2330", "6488", "3105", "2603", "8069"],
+    "turnover": [1.0, 4.0, 2.0, 8.0, np.nan, 2.0],
+    "market": ["上市", "上市", "上櫃", "上櫃", "上市", "上櫃"],
+})
+
+
+def test_add_rank_columns():
+    df = add_rank_columns(UNIVERSE)
+    assert list(df.columns) == ["code", "turnover", "market"] + RANK_COLUMNS
+    # 由高到低，同值（6488、8069）依原順序，缺值在最後
+    assert df["code"].tolist() == ["3105", "2330", "6488", "8069", "1101", "2603"]
+    assert df["turnover_rank"].tolist() == [1, 2, 3, 4, 5, 6]
+    assert df["turnover_pct"].tolist()[:5] == [100.0, 80.0, 50.0, 50.0, 20.0]
+    assert np.isnan(df["turnover_pct"].iloc[5])
+
+    assert df["market_rank"].tolist() == [1, 1, 2, 3, 2, 3]
+    assert df["market_pct"].tolist()[:5] == [100.0, 100.0, 50.0, 50.0, 50.0]
+    # 上櫃中位數 2.0、上市中位數 2.5
+    assert df["turnover_vs_market"].tolist()[:5] == [4.0, 1.6, 1.0, 1.0, 0.4]
+    # 不修改傳入的資料
+    assert "turnover_rank" not in UNIVERSE.columns
+
+
+def test_add_rank_columns_without_market():
+    df = add_rank_columns(UNIVERSE.drop(columns="market"))
+    assert df["market_rank"].tolist() == df["turnover_rank"].tolist()
+    assert df["market_pct"].tolist()[:5] == df["turnover_pct"].tolist()[:5]
+
+
+def test_market_positions_follow_rank_order():
+    df = add_rank_columns(UNIVERSE)
+    positions = market_positions(df)
+    assert set(positions) == {"上市", "上櫃"}
+    assert df.iloc[positions["上市"]]["code"].tolist() == ["2330", "1101", "2603"]
+    assert df.iloc[positions["上櫃"]]["code"].tolist() == ["3105", "6488", "8069"]
+
+    # 沒有市場資訊的列不屬於任何市場
+    with_missing = df.assign(market=["上櫃", None, "上櫃", "上櫃", "上市", "上市"])
+    positions = market_positions(with_missing)
+    assert positions["上市"].tolist() == [4, 5]
+    assert positions["上櫃"].tolist() == [0, 2, 3]
+    assert market_positions(df.drop(columns="market")) == {}
+    assert market_positions(df.iloc[:0]) == {}
+
+
+def test_argpartition_matches_full_sort():
+    rng = np.random.default_rng(1)
+    n = 2000
+    # 取整數讓同值很多，並加入缺值
+    df = pd.DataFrame({"turnover": rng.integers(0, 50, n).astype(float)})
+    df.loc[rng.random(n) < 0.05, "turnover"] = np.nan
+    full = turnover_order(df)
+
+    for top_n in (1, 5, 37, n // ARGPARTITION_RATIO - 1, n // ARGPARTITION_RATIO + 1, n, n + 10):
+        assert turnover_order(df, top_n).tolist() == full[:top_n].tolist()
+
+    expected = df.sort_values("turnover", ascending=False, kind="mergesort").head(10).reset_index(drop=True)
+    pd.testing.assert_frame_equal(sort_by_turnover(df, 10), expected)
+    assert sort_by_turnover(df.iloc[:0]).empty
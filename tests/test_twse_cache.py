@@ -0,0 +1,154 @@
+"""
+證交所逐月快取測試
+已結束的月份（在月份結束後抓取）永不過期；當月資料超過 current_month_ttl 秒即過期。
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import twse_cache
+from modules.twse_cache import TwseMonthCache
+
+ROWS = [{"Date": datetime(2026, 9, 1), "Open": 10.0, "High": 11.0, "Low": 9.0, "Close": 10.5, "Volume": 1000}]
+
+
+def test_connections_are_closed(tmp_path, sqlite_connections):
+    cache = TwseMonthCache(cache_dir=str(tmp_path))
+    cache.put("2330", datetime(2026, 9, 1), ROWS)
+    assert cache.get("2330", datetime(2026, 9, 1)) is not None
+
+    assert len(sqlite_connections) == 3
+    assert all(conn.closed for conn in sqlite_connections)
+
+
+class _Clock:
+    """取代 twse_cache 模組中的 time（只提供 time()）"""
+
+    def __init__(self, when: datetime):
+        self.now = when.timestamp()
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock(datetime(2026, 10, 10, 14, 0))
+    monkeypatch.setattr(twse_cache, "time", fake)
+    return fake
+
+
+def test_closed_month_never_expires(tmp_path, clock):
+    cache = TwseMonthCache(cache_dir=str(tmp_path), current_month_ttl=900)
+    # 10 月抓取 9 月的資料：月份已結束，資料完整
+    cache.put("2330", datetime(2026, 9, 1), ROWS)
+
+    clock.now += 365 * 86400
+    rows = cache.get("2330", datetime(2026, 9, 1))
+    assert rows is not None and rows[0]["Date"] == datetime(2026, 9, 1)
+    assert cache.stats()["expired"] == 0
+
+
+def test_current_month_expires_after_ttl(tmp_path, clock):
+    cache = TwseMonthCache(cache_dir=str(tmp_path), current_month_ttl=900)
+    cache.put("2330", datetime(2026, 10, 1), ROWS)
+
+    clock.now += 899
+    assert cache.get("2330", datetime(2026, 10, 1)) is not None
+    clock.now += 2
+    assert cache.get("2330", datetime(2026, 10, 1)) is None
+    # 月份結束前抓取的資料，在月份結束後仍依 TTL 過期
+    clock.now = datetime(2026, 11, 5).timestamp()
+    assert cache.get("2330", datetime(2026, 10, 1)) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"]) == (1, 2, 2)
+
+
+def test_stats_counters_and_hit_rate(tmp_path, clock):
+    cache = TwseMonthCache(cache_dir=str(tmp_path), current_month_ttl=900)
+    assert cache.stats()["hit_rate"] is None
+
+    assert cache.get("2330", datetime(2026, 8, 1)) is None
+    cache.put("2330", datetime(2026, 8, 1), ROWS)
+    cache.put("2330", datetime(2026, 9, 1), [])
+    assert cache.get("2330", datetime(2026, 8, 1)) is not None
+    assert cache.get("2330", datetime(2026, 9, 1)) == []
+    assert cache.get("2317", datetime(2026, 9, 1)) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["expired"] == 0
+    assert stats["writes"] == 2
+    assert stats["hit_rate"] == 0.5
+    assert stats["enabled"] is True
+
+
+class _FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+class _FakeClient:
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = 0
+
+    def get(self, *args, **kwargs):
+        self.calls += 1
+        return _FakeResponse(self.payload)
+
+
+@pytest.fixture
+def month_cache(tmp_path):
+    return TwseMonthCache(cache_dir=str(tmp_path))
+
+
+@pytest.fixture
+def signals(month_cache, monkeypatch):
+    import routes.stock_signals_routes as signals
+
+    monkeypatch.setattr(signals, "get_twse_month_cache", lambda: month_cache)
+    monkeypatch.setattr(signals._TWSE_LIMITER, "acquire", lambda *args, **kwargs: None)
+    monkeypatch.setattr(signals.time, "sleep", lambda seconds: None)
+    return signals
+
+
+def _use_payload(monkeypatch, signals, payload):
+    client = _FakeClient(payload)
+    monkeypatch.setattr(signals, "get_http_client", lambda: client)
+    return client
+
+
+def test_no_data_month_is_cached_empty(signals, month_cache, monkeypatch):
+    client = _use_payload(monkeypatch, signals, {"stat": "很抱歉，沒有符合條件的資料!"})
+    assert signals._fetch_twse_month("2330", datetime(2020, 1, 1)) == []
+    assert client.calls == 1
+
+    signals.get_twse_stock_data("2330", days=10)
+    month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    assert month_cache.get("2330", month) == []
+
+
+def test_generic_error_is_not_cached(signals, month_cache, monkeypatch):
+    client = _use_payload(monkeypatch, signals, {"stat": "很抱歉，目前線上人數過多，請您稍候再試"})
+    assert signals._fetch_twse_month("2330", datetime(2020, 1, 1)) is None
+    assert client.calls == 3
+
+    signals.get_twse_stock_data("2330", days=10)
+    month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    assert month_cache.get("2330", month) is None
+    assert month_cache.stats()["writes"] == 0